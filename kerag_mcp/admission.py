@@ -0,0 +1,305 @@
+"""
+Admission control and fair scheduling of tool calls across clients.
+
+With the HTTP transports several MCP clients share one server, and a client
+looping on ``knowledge_search`` can starve the others. ``AdmissionController``
+sits in front of the tool handlers:
+
+- every tool has a cost (``TOOL_COSTS``; loads and searches cost more than
+  breadcrumbs), and every client a token bucket refilled at
+  ``KERAG_MCP_CLIENT_RATE`` cost units per second up to
+  ``KERAG_MCP_CLIENT_BURST``. A call the bucket cannot pay for is rejected
+  right away;
+- at most ``KERAG_MCP_MAX_CONCURRENT`` admitted calls run at once. Calls
+  beyond that wait in a start-time fair queue: each call is tagged with its
+  client's virtual finish time (the previous tag plus cost), and the lowest
+  tag runs next, so a client with many queued calls only delays itself;
+- the queue is bounded (``KERAG_MCP_MAX_QUEUE``) and so is the wait
+  (``KERAG_MCP_MAX_QUEUE_WAIT_MS``). When full, the call with the highest tag
+  (from the client furthest ahead of its share) is shed with an "overloaded"
+  error, which keeps the queueing delay of well-behaved clients bounded.
+
+Enabled by default for the sse/streamable-http transports only
+(``KERAG_MCP_ADMISSION`` overrides).
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Cost of a call in token bucket units; tools not listed cost DEFAULT_COST
+TOOL_COSTS: Dict[str, float] = {
+    "knowledge_connect": 8,
+    "knowledge_load": 8,
+    "knowledge_search": 4,
+    "knowledge_search_many": 6,
+    "knowledge_list": 2,
+    "knowledge_view": 2,
+    "knowledge_related": 2,
+    "knowledge_children_preview": 2,
+    "knowledge_to": 2,
+    # Monitoring and polling: never rejected or queued
+    "knowledge_load_status": 0,
+    "knowledge_metrics": 0,
+    "knowledge_profile": 0,
+}
+DEFAULT_COST = 1.0
+
+# Idle clients are forgotten once more than this many are known
+_MAX_CLIENTS = 256
+_CLIENT_IDLE_S = 300.0
+
+
+class Overloaded(Exception):
+    """A call was rejected (rate limit) or shed (queue full or wait too long)"""
+
+
+class _Client:
+    __slots__ = ("tokens", "refilled_at", "finish_tag", "weight", "in_flight", "queued",
+                 "admitted", "rate_limited", "shed", "last_seen")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.refilled_at = now
+        self.finish_tag = 0.0
+        self.weight = 1.0
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.last_seen = now
+
+
+class _Waiter:
+    __slots__ = ("client", "tool_name", "future", "tag")
+
+    def __init__(self, client: _Client, tool_name: str, future: "asyncio.Future", tag: float):
+        self.client = client
+        self.tool_name = tool_name
+        self.future = future
+        self.tag = tag
+
+
+class AdmissionController:
+    """Per-client token buckets in front of a start-time fair queue
+
+    Args:
+        max_concurrent: Admitted calls running at once.
+        rate: Cost units per second credited to every client's bucket.
+        burst: Bucket size (cost units a client can spend at once).
+        max_queue: Calls waiting for a slot before the queue sheds load.
+        max_wait_ms: Longest wait for a slot before a call is shed.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        rate: float = 40.0,
+        burst: float = 80.0,
+        max_queue: int = 64,
+        max_wait_ms: float = 2000.0
+    ):
+        self.enabled = False
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait_ms = max_wait_ms
+        self.costs = dict(TOOL_COSTS)
+        self._clients: Dict[Hashable, _Client] = {}
+        self._queue: List[Tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.max_queue_wait_ms = 0.0
+
+    def configure_from_env(self, default_enabled: bool = False) -> None:
+        """Apply KERAG_MCP_ADMISSION, KERAG_MCP_MAX_CONCURRENT, KERAG_MCP_CLIENT_RATE,
+        KERAG_MCP_CLIENT_BURST, KERAG_MCP_MAX_QUEUE and KERAG_MCP_MAX_QUEUE_WAIT_MS"""
+        enabled = os.environ.get("KERAG_MCP_ADMISSION")
+        self.enabled = default_enabled if not enabled else enabled not in ("0", "false", "no")
+        self.max_concurrent = int(os.environ.get("KERAG_MCP_MAX_CONCURRENT") or self.max_concurrent)
+        self.rate = float(os.environ.get("KERAG_MCP_CLIENT_RATE") or self.rate)
+        self.burst = float(os.environ.get("KERAG_MCP_CLIENT_BURST") or self.burst)
+        self.max_queue = int(os.environ.get("KERAG_MCP_MAX_QUEUE") or self.max_queue)
+        self.max_wait_ms = float(os.environ.get("KERAG_MCP_MAX_QUEUE_WAIT_MS") or self.max_wait_ms)
+
+    def cost(self, tool_name: str) -> float:
+        return self.costs.get(tool_name, DEFAULT_COST)
+
+    # --- admission ---
+
+    async def admit(self, client_key: Hashable, tool_name: str) -> Optional[_Client]:
+        """Wait for a slot for ``tool_name`` called by ``client_key``
+
+        Returns:
+            The ticket to pass to release(), or None for tools that cost nothing
+
+        Raises:
+            Overloaded: If the client is over its rate or the call was shed.
+        """
+        cost = self.cost(tool_name)
+        if cost <= 0:
+            return None
+        now = time.monotonic()
+        client = self._client(client_key, now)
+
+        # Token bucket: refill, then pay for the call or reject it
+        client.tokens = min(self.burst, client.tokens + (now - client.refilled_at) * self.rate)
+        client.refilled_at = now
+        if client.tokens < cost:
+            client.rate_limited += 1
+            with self._lock:
+                self.rate_limited += 1
+            retry_s = (cost - client.tokens) / self.rate
+            raise Overloaded(f"Rate limit exceeded: {tool_name} costs {cost:g} and this client's budget "
+                             f"refills at {self.rate:g} per second; retry in {retry_s:.2f} s")
+        client.tokens -= cost
+
+        # Start-time fair queueing: the tag advances by cost / weight per call of the client
+        start_tag = max(self._virtual_time, client.finish_tag)
+        client.finish_tag = start_tag + cost / client.weight
+
+        if self._in_flight < self.max_concurrent and not self._queue:
+            self._virtual_time = start_tag
+            self._start(client)
+            return client
+
+        waiter = _Waiter(client, tool_name, asyncio.get_running_loop().create_future(), start_tag)
+        if len(self._queue) >= self.max_queue:
+            victim = max((entry[2] for entry in self._queue), key=lambda w: w.tag)
+            if victim.tag <= start_tag:
+                client.finish_tag = start_tag
+                raise self._overloaded(client, tool_name)
+            # The waiting call whose client is furthest ahead of its share makes room
+            self._remove(victim)
+            victim.future.set_exception(self._overloaded(victim.client, victim.tool_name))
+
+        heapq.heappush(self._queue, (start_tag, next(self._seq), waiter))
+        client.queued += 1
+        with self._lock:
+            self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            if self._remove(waiter) or waiter.future.exception() is not None:
+                raise self._overloaded(client, tool_name, waited=True) from None
+            # Admitted just as the wait ran out
+        except asyncio.CancelledError:
+            if not self._remove(waiter) and waiter.future.done() and waiter.future.exception() is None:
+                # Admitted just as the call was cancelled: hand the slot on
+                self.release(client)
+            raise
+        waited_ms = (time.monotonic() - now) * 1000
+        with self._lock:
+            self.max_queue_wait_ms = max(self.max_queue_wait_ms, waited_ms)
+        return client
+
+    def release(self, ticket: Optional[_Client]) -> None:
+        """End an admitted call and admit the next queued one"""
+        if ticket is None:
+            return
+        ticket.in_flight -= 1
+        self._in_flight -= 1
+        while self._queue and self._in_flight < self.max_concurrent:
+            tag, _, waiter = heapq.heappop(self._queue)
+            waiter.client.queued -= 1
+            if waiter.future.done():
+                continue
+            self._virtual_time = tag
+            self._start(waiter.client)
+            waiter.future.set_result(None)
+
+    def _start(self, client: _Client) -> None:
+        client.in_flight += 1
+        client.admitted += 1
+        self._in_flight += 1
+        with self._lock:
+            self.admitted += 1
+
+    def _remove(self, waiter: _Waiter) -> bool:
+        """Take a waiter out of the queue; False if it was no longer queued"""
+        for i, entry in enumerate(self._queue):
+            if entry[2] is waiter:
+                self._queue.pop(i)
+                heapq.heapify(self._queue)
+                waiter.client.queued -= 1
+                return True
+        return False
+
+    def _overloaded(self, client: _Client, tool_name: str, waited: bool = False) -> Overloaded:
+        client.shed += 1
+        # The call never ran: give its client the tokens back
+        client.tokens = min(self.burst, client.tokens + self.cost(tool_name))
+        with self._lock:
+            self.shed += 1
+        reason = f"waited {self.max_wait_ms:.0f} ms for a slot" if waited else f"{self.max_queue} calls already queued"
+        return Overloaded(f"Server overloaded: {tool_name} was shed ({reason}); retry later")
+
+    def _client(self, client_key: Hashable, now: float) -> _Client:
+        client = self._clients.get(client_key)
+        if client is None:
+            if len(self._clients) >= _MAX_CLIENTS:
+                for key, idle in list(self._clients.items()):
+                    if not idle.in_flight and not idle.queued and now - idle.last_seen > _CLIENT_IDLE_S:
+                        del self._clients[key]
+            client = self._clients[client_key] = _Client(self.burst, now)
+        client.last_seen = now
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_concurrent": self.max_concurrent,
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._clients),
+                "in_flight": self._in_flight,
+                "queue": len(self._queue),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rate_limited": self.rate_limited,
+                "shed": self.shed,
+                "max_queue_wait_ms": self.max_queue_wait_ms,
+            }
+
+    def prometheus_samples(self) -> List[Tuple[str, str, str, float]]:
+        """(name, type, help, value) samples for MetricsRegistry.add_collector"""
+        stats = self.stats()
+        return [
+            ("kerag_mcp_admitted_calls_total", "counter", "Tool calls admitted by the admission controller.",
+             stats["admitted"]),
+            ("kerag_mcp_rate_limited_calls_total", "counter", "Tool calls rejected by a client's token bucket.",
+             stats["rate_limited"]),
+            ("kerag_mcp_shed_calls_total", "counter", "Tool calls shed because the queue was full or too slow.",
+             stats["shed"]),
+            ("kerag_mcp_admission_queue_length", "gauge", "Tool calls waiting for a slot.", stats["queue"]),
+        ]
+
+
+# Global admission controller instance
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the global admission controller (disabled until configured for a transport)"""
+    global _admission_controller
+
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+
+    return _admission_controller
@@ -0,0 +1,187 @@
+"""
+Serialized access to a session's KERAGAPI instance.
+
+A KERAGAPI instance is not thread-safe, and the navigation tools move its
+cursor, so calls against a session's instance must never overlap. The
+session's ``ApiLock`` is taken by every user of the instance:
+
+- a tool call holds it for its whole run (see ``instrumented_tool``). It
+  waits for the lock on the event loop without blocking the loop, and at
+  most until its deadline, then fails with "session busy";
+- background work (prefetching, background loads, hot reloads, index and
+  vector builds) holds it around its own KERAGAPI calls, in short stretches
+  between which tool calls get their turn.
+
+A KERAGAPI call still running in a worker when its tool call's deadline
+passes keeps the lock until it returns (``defer_release``), so the next
+call waits for it instead of overlapping it.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+# Longest sleep between two attempts of a waiter on the event loop
+_MAX_POLL_S = 0.02
+
+# The lock held by the tool call being served, if any
+_current_hold: contextvars.ContextVar = contextvars.ContextVar("kerag_mcp_api_hold", default=None)
+
+
+class SessionBusy(Exception):
+    """The session's KERAGAPI instance stayed in use until the tool call's deadline"""
+
+
+class _Hold:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self, lock: "ApiLock"):
+        self.lock = lock
+        # Abandoned worker call that keeps the lock until it returns
+        self.pending: Optional[Future] = None
+
+
+class ApiLock:
+    """Lock serializing the KERAGAPI calls of one session
+
+    A plain ``threading.Lock`` underneath, so the lock can be released by
+    the worker thread that finishes an abandoned call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # What holds the lock, for "session busy" errors and knowledge_status
+        self.holder: Optional[str] = None
+        # Callers waiting for the lock; background work yields to them
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _wait(self, delta: int) -> None:
+        with self._waiting_lock:
+            self.waiting += delta
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def acquire(self, holder: str, timeout: Optional[float] = None) -> bool:
+        """Take the lock from a background thread; False if ``timeout`` seconds passed"""
+        self._wait(1)
+        try:
+            acquired = self._lock.acquire(timeout=-1 if timeout is None else timeout)
+        finally:
+            self._wait(-1)
+        if acquired:
+            self.holder = holder
+        return acquired
+
+    async def acquire_async(self, holder: str, timeout: Optional[float] = None) -> bool:
+        """Take the lock from the event loop without blocking it; False if ``timeout`` seconds passed"""
+        if self._lock.acquire(blocking=False):
+            self.holder = holder
+            return True
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        delay = 0.001
+        self._wait(1)
+        try:
+            while not self._lock.acquire(blocking=False):
+                if expires_at is not None and time.monotonic() >= expires_at:
+                    return False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _MAX_POLL_S)
+        finally:
+            self._wait(-1)
+        self.holder = holder
+        return True
+
+    def release(self) -> None:
+        self.holder = None
+        self._lock.release()
+
+    @contextlib.contextmanager
+    def held(self, holder: str) -> Iterator[None]:
+        """Hold the lock in a background thread, then let waiting callers go first"""
+        self.acquire(holder)
+        try:
+            yield
+        finally:
+            self.release()
+        self.yield_to_waiters()
+
+    def yield_to_waiters(self) -> None:
+        """Give callers waiting on the event loop, which poll, the chance to take the lock"""
+        expires_at = time.monotonic() + 2 * _MAX_POLL_S
+        while self.waiting and not self._lock.locked() and time.monotonic() < expires_at:
+            time.sleep(0.001)
+
+    async def yield_to_waiters_async(self) -> None:
+        """``yield_to_waiters`` for background tasks of the event loop"""
+        expires_at = time.monotonic() + 2 * _MAX_POLL_S
+        await asyncio.sleep(0)
+        while self.waiting and not self._lock.locked() and time.monotonic() < expires_at:
+            await asyncio.sleep(0.001)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, holder: str, timeout: Optional[float] = None):
+        """Hold the lock for a tool call (a no-op if the call holds it already)
+
+        Raises:
+            SessionBusy: If the lock is not free within ``timeout`` seconds.
+        """
+        current = _current_hold.get()
+        if current is not None and current.lock is self:
+            yield
+            return
+        if not await self.acquire_async(holder, timeout):
+            raise SessionBusy(f"Session busy: {self.holder or 'another call'} is still using the knowledge base")
+        hold = _Hold(self)
+        token = _current_hold.set(hold)
+        try:
+            yield
+        finally:
+            _current_hold.reset(token)
+            if hold.pending is not None:
+                hold.pending.add_done_callback(lambda future: self.release())
+            else:
+                self.release()
+
+    async def run(self, holder: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Take the lock from the event loop and run a blocking call in a thread
+
+        The lock is released when the call returns, even if the caller was
+        cancelled in the meantime.
+        """
+        await self.acquire_async(holder)
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda future: self.release())
+        return await asyncio.wrap_future(future)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Calls under the lock never overlap: one thread is enough
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kerag-mcp-session")
+        return self._executor
+
+
+def defer_release(future: Future) -> bool:
+    """Keep the current tool call's lock until ``future``, a call it abandoned, is done
+
+    Returns:
+        False if the current call holds no lock.
+    """
+    hold = _current_hold.get()
+    if hold is None:
+        return False
+    hold.pending = future
+    return True
@@ -0,0 +1,359 @@
+"""
+Modules installed as ``.tar`` archives in a module root.
+
+Modules are distributed as ``.tar`` files, which ``kerag install`` extracts
+into the module root. KERAGAPI only loads extracted module directories, so
+an archive copied into a module root as ``<root>/<module>.tar`` cannot be
+loaded as it is; the server still lists it, with its file count, and
+tells the agent to install it:
+
+- on first open, the 512-byte member headers are walked once with
+  positioned reads, skipping the member data, into an offset table: member
+  path -> (data offset, size), plus the set of directories. Formats the
+  walk does not handle are read with ``tarfile`` instead. An archive cut
+  short (e.g. still being copied) fails the walk and is listed as
+  unreadable;
+- members can be read from the offsets without extracting anything.
+
+Only uncompressed archives have member offsets; compressed ones are listed
+as unreadable. Archives whose members all sit below one top-level directory
+are rooted there.
+"""
+
+import logging
+import os
+import posixpath
+import tarfile
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("kerag_mcp")
+
+ARCHIVE_SUFFIX = ".tar"
+
+
+def module_name_of(entry_name: str) -> str:
+    """Module name of an entry of a module root ('name' or 'name.tar')"""
+    if entry_name.endswith(ARCHIVE_SUFFIX):
+        return entry_name[:-len(ARCHIVE_SUFFIX)]
+    return entry_name
+
+
+def _member_name(name: str) -> str:
+    """Normalized member path ('' for the archive root)"""
+    name = posixpath.normpath(name).lstrip("/")
+    return "" if name == "." else name
+
+
+# (member path, is directory, data offset, size) of the files and directories of an archive
+_Entry = Tuple[str, bool, int, int]
+
+_BLOCK = 512
+_FILE_TYPES = (b"0", b"\x00", b"7")
+_DIRECTORY_TYPE = b"5"
+
+
+def _header_field(header: bytes, start: int, end: int) -> str:
+    return header[start:end].split(b"\x00", 1)[0].decode("utf-8", "surrogateescape")
+
+
+def _pax_records(data: bytes) -> Dict[str, str]:
+    """Records of a pax extended header ('<length> <key>=<value>\\n' each)"""
+    records = {}
+    pos = 0
+    while pos < len(data):
+        space = data.find(b" ", pos)
+        if space < 0:
+            break
+        length = int(data[pos:space])
+        if length <= 0:
+            break
+        key, _, value = data[space + 1:pos + length - 1].partition(b"=")
+        records[key.decode("utf-8", "surrogateescape")] = value.decode("utf-8", "surrogateescape")
+        pos += length
+    return records
+
+
+def _scan_headers(read: Callable[[int, int], bytes], end: int) -> Optional[List[_Entry]]:
+    """Walk the 512-byte headers of an uncompressed tar archive of ``end`` bytes
+
+    ``read(offset, size)`` returns bytes of the archive. Handles ustar, GNU
+    long names and pax path/size records, which covers the archives of ``tar``
+    and ``tarfile``; returns None for anything else (such as pre-POSIX
+    headers), which is then read with ``tarfile``.
+
+    Raises:
+        tarfile.ReadError: If the data does not start with a tar header, or
+            ends in the middle of a header or of a member.
+    """
+    entries: List[_Entry] = []
+    pos = 0
+    long_name: Optional[str] = None
+    pax: Dict[str, str] = {}
+    while pos + _BLOCK <= end:
+        header = read(pos, _BLOCK)
+        if len(header) < _BLOCK:
+            raise tarfile.ReadError("truncated archive: the file shrank while it was read")
+        if header.count(0) == _BLOCK:
+            break
+        if pos == 0:
+            # The checksum of the first header tells a tar archive from anything else
+            try:
+                checksum = int(header[148:156].split(b"\x00", 1)[0].strip() or b"0", 8)
+            except ValueError:
+                checksum = -1
+            if checksum != sum(header[:148]) + 256 + sum(header[156:]):
+                raise tarfile.ReadError("invalid header")
+        elif header[257:262] != b"ustar":
+            return None
+        if header[124] & 0x80:
+            # Base-256 sizes (members over 8 GiB) are left to tarfile
+            return None
+        size = int(header[124:136].split(b"\x00", 1)[0].strip() or b"0", 8)
+        kind = header[156:157]
+        offset = pos + _BLOCK
+        pos = offset + (size + _BLOCK - 1) // _BLOCK * _BLOCK
+        if offset + size > end:
+            raise tarfile.ReadError(f"truncated archive: member at offset {offset} needs {size} bytes")
+        if kind == b"L":
+            long_name = read(offset, size).split(b"\x00", 1)[0].decode("utf-8", "surrogateescape")
+            continue
+        if kind == b"x":
+            pax = _pax_records(read(offset, size))
+            continue
+        if kind in (b"g", b"K"):
+            continue
+        name = _header_field(header, 0, 100)
+        if header[257:263] == b"ustar\x00":
+            prefix = _header_field(header, 345, 500)
+            if prefix:
+                name = f"{prefix}/{name}"
+        name = pax.get("path") or long_name or name
+        if "size" in pax:
+            size = int(pax["size"])
+            pos = offset + (size + _BLOCK - 1) // _BLOCK * _BLOCK
+            if offset + size > end:
+                raise tarfile.ReadError(f"truncated archive: {name} needs {size} bytes")
+        long_name, pax = None, {}
+        if kind in _FILE_TYPES:
+            entries.append((name, False, offset, size))
+        elif kind == _DIRECTORY_TYPE:
+            entries.append((name, True, offset, 0))
+    if pos < end and pos + _BLOCK > end and any(read(pos, end - pos)):
+        raise tarfile.ReadError("truncated archive: partial header at the end")
+    return entries
+
+
+def _scan_tarfile(path: str) -> List[_Entry]:
+    """The entries of an archive as read by ``tarfile`` (slower, but handles every format)"""
+    with tarfile.open(path, "r:") as tar:
+        return [(info.name, info.isdir(), info.offset_data, info.size)
+                for info in tar if info.isfile() or info.isdir()]
+
+
+class ModuleArchive:
+    """Offset table of one uncompressed ``.tar`` archive, read through an open file
+
+    Members are read with positioned reads of the file opened here, so an
+    archive replaced on disk (renamed over) keeps reading the old file for as
+    long as this object lives.
+
+    Raises:
+        tarfile.ReadError: If the file is not an uncompressed tar archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        start = time.perf_counter()
+        self._file = open(path, "rb")
+        # Closes the file once the archive is unreachable
+        self._finalizer = weakref.finalize(self, self._file.close)
+        self.size = os.fstat(self._file.fileno()).st_size
+        # member path -> (data offset, size); directories are implied by member paths too
+        self.members: Dict[str, Tuple[int, int]] = {}
+        self.directories = {""}
+        try:
+            entries = _scan_headers(self._pread, self.size) if self.size else []
+            if entries is None:
+                entries = _scan_tarfile(path)
+        except Exception:
+            self.close()
+            raise
+        for name, is_dir, offset, length in entries:
+            name = _member_name(name)
+            if not name or name.startswith(".."):
+                continue
+            if is_dir:
+                self.directories.add(name)
+            else:
+                self.members[name] = (offset, length)
+            parent = posixpath.dirname(name)
+            while parent and parent not in self.directories:
+                self.directories.add(parent)
+                parent = posixpath.dirname(parent)
+        self._root_single_directory()
+        self.open_ms = (time.perf_counter() - start) * 1000
+
+    def _pread(self, offset: int, size: int) -> bytes:
+        return os.pread(self._file.fileno(), size, offset)
+
+    def _root_single_directory(self) -> None:
+        """Drop a common top-level directory (archives of 'module/...')"""
+        tops = {name.split("/", 1)[0] for name in list(self.members) + list(self.directories) if name}
+        if len(tops) != 1:
+            return
+        top = tops.pop()
+        if top not in self.directories:
+            return
+        cut = len(top) + 1
+        self.members = {name[cut:]: entry for name, entry in self.members.items()}
+        self.directories = {name[cut:] for name in self.directories if name.startswith(top + "/")} | {""}
+
+    def read(self, member: str) -> bytes:
+        """Content of a member file
+
+        Raises:
+            FileNotFoundError: If the archive has no such file.
+            tarfile.ReadError: If the file was cut short since it was opened
+                (rewritten in place rather than replaced).
+        """
+        entry = self.members.get(member)
+        if entry is None:
+            raise FileNotFoundError(f"{self.path}: no member {member!r}")
+        offset, size = entry
+        data = self._pread(offset, size) if size else b""
+        if len(data) < size:
+            raise tarfile.ReadError(f"{self.path} changed since it was opened")
+        return data
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+class ArchiveStore:
+    """Open module archives, reopened when the file on disk changes"""
+
+    def __init__(self):
+        self.enabled = True
+        # path -> ((mtime_ns, size), archive)
+        self._archives: Dict[str, Tuple[Tuple[int, int], ModuleArchive]] = {}
+        self._lock = threading.Lock()
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_ARCHIVES"""
+        enabled = os.environ.get("KERAG_MCP_ARCHIVES")
+        if enabled:
+            self.enabled = enabled not in ("0", "false", "no")
+
+    def open(self, path: str) -> ModuleArchive:
+        """The archive at ``path``, building its offset table on first open"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._archives.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        archive = ModuleArchive(path)
+        logger.info("archive: %s opened, %d members in %.1f ms", path, len(archive.members), archive.open_ms)
+        with self._lock:
+            # The replaced archive is not closed here: it may still be in use,
+            # and its file closes when the last reference goes away
+            self._archives[path] = (signature, archive)
+        return archive
+
+    @staticmethod
+    def find(roots: List[str], module_name: str) -> Optional[str]:
+        """Path of the archive of a module installed only as ``<root>/<module>.tar``"""
+        for root in roots:
+            if os.path.isdir(os.path.join(root, module_name)):
+                return None
+            path = os.path.join(root, module_name + ARCHIVE_SUFFIX)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    @staticmethod
+    def scan(root: str) -> Dict[str, str]:
+        """module name -> archive path of the modules installed only as archives in ``root``"""
+        archives = {}
+        try:
+            with os.scandir(root) as it:
+                entries = {entry.name: entry.is_file() for entry in it if not entry.name.startswith(".")}
+        except OSError:
+            return archives
+        for name, is_file in entries.items():
+            module_name = module_name_of(name)
+            if is_file and name.endswith(ARCHIVE_SUFFIX) and module_name not in entries:
+                archives[module_name] = os.path.join(root, name)
+        return archives
+
+    @staticmethod
+    def roots(api) -> List[str]:
+        """Module roots of an API instance, local first"""
+        res = api.get_status()
+        data = (res.get("data") or {}) if res.get("success") else {}
+        return [root for root in (data.get("local_root"), data.get("global_root")) if root]
+
+    def describe(self, path: str) -> Dict[str, Any]:
+        """Listing entry of a module installed only as the archive at ``path``"""
+        name = os.path.basename(path)
+        try:
+            archive = self.open(path)
+        except (OSError, tarfile.TarError) as e:
+            return {"description": f"(archive {name}, unreadable: {e})", "archive": path, "needs_install": True}
+        return {
+            "description": f"(archive {name}, {len(archive.members)} files, needs `kerag install {path}`)",
+            "archive": path,
+            "files": len(archive.members),
+            "needs_install": True,
+        }
+
+    def load_module(self, api, module_name: str) -> Dict[str, Any]:
+        """``api.load_module``, explaining how to install a module found only as an archive"""
+        result = api.load_module(module_name)
+        if result.get("success") or not self.enabled:
+            return result
+        path = self.find(self.roots(api), module_name)
+        if path is None:
+            return result
+        return {"success": False, "error": f"Module {module_name} is installed as the archive {path}, "
+                                           f"which KERAG cannot load as it is; "
+                                           f"install it with `kerag install {path}`"}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            archives = [archive for _, archive in self._archives.values()]
+        return {
+            "enabled": self.enabled,
+            "archives": [
+                {
+                    "path": archive.path,
+                    "members": len(archive.members),
+                    "size": archive.size,
+                    "open_ms": archive.open_ms,
+                }
+                for archive in archives
+            ],
+        }
+
+
+# Global archive store instance
+_archive_store: Optional[ArchiveStore] = None
+_archive_store_lock = threading.Lock()
+
+
+def get_archive_store() -> ArchiveStore:
+    """Get the global archive store (configured from the environment on first use)"""
+    global _archive_store
+
+    if _archive_store is None:
+        with _archive_store_lock:
+            if _archive_store is None:
+                archive_store = ArchiveStore()
+                archive_store.configure_from_env()
+                _archive_store = archive_store
+
+    return _archive_store
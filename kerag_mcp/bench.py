@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+KERAG MCP Benchmark - reproducible performance measurements
+
+Generates synthetic knowledge modules (see ``synthetic.py``) and drives the
+real ``knowledge_*`` tool functions with N concurrent simulated agents, either
+in-process or over a local streamable-http transport. Results (throughput,
+latency percentiles, peak RSS) are printed as JSON together with the
+configuration, seed and git commit, so runs are comparable across commits.
+Optionally measures cold-spawn time of the stdio server to its first
+``tools/list`` response.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+from . import compact, format_response
+from .synthetic import SyntheticForest, SyntheticKERAGAPI
+
+# Format version of the JSON report
+REPORT_SCHEMA = 1
+
+# Relative weights of the operations issued by a simulated agent
+OPERATION_WEIGHTS = {
+    "knowledge_search": 30,
+    "knowledge_view": 25,
+    "knowledge_children_preview": 15,
+    "knowledge_to": 10,
+    "knowledge_parent": 5,
+    "knowledge_breadcrumb": 5,
+    "knowledge_up": 4,
+    "knowledge_back": 3,
+    "knowledge_forward": 3,
+}
+
+CallTool = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+
+
+def _percentile(sorted_values: List[float], quantile: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(quantile * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50": _percentile(values, 0.50) * 1000,
+        "p95": _percentile(values, 0.95) * 1000,
+        "p99": _percentile(values, 0.99) * 1000,
+        "max": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+class AgentScript:
+    """Deterministic sequence of tool calls issued by one simulated agent"""
+
+    def __init__(self, forest: SyntheticForest, seed: int):
+        self._rng = random.Random(seed)
+        self._forest = forest
+        self._node_ids = sorted(forest.nodes)
+        self._names = list(OPERATION_WEIGHTS)
+        self._weights = list(OPERATION_WEIGHTS.values())
+
+    def next_call(self) -> Tuple[str, Dict[str, Any]]:
+        rng = self._rng
+        name = rng.choices(self._names, self._weights)[0]
+        if name == "knowledge_search":
+            return name, {"query": rng.choice(self._forest.vocabulary), "max_results": 20}
+        if name == "knowledge_view":
+            return name, {"node_id": rng.choice(self._node_ids), "depth": rng.choice((0, 1, 1, 2))}
+        if name == "knowledge_children_preview":
+            return name, {"node_id": rng.choice(self._node_ids)}
+        if name == "knowledge_to":
+            if rng.random() < 0.5:
+                return name, {"target": str(rng.randint(1, self._forest.config["fanout"]))}
+            return name, {"target": rng.choice(self._node_ids)}
+        if name == "knowledge_parent":
+            return name, {"node_id": rng.choice(self._node_ids)}
+        if name in ("knowledge_back", "knowledge_forward"):
+            return name, {"steps": 1}
+        if name == "knowledge_up":
+            return name, {"levels": 1}
+        return name, {}
+
+
+async def _run_agents(
+    call_tools: List[CallTool],
+    forest: SyntheticForest,
+    ops_per_agent: int,
+    seed: int
+) -> Dict[str, Any]:
+    """Run one agent per entry of ``call_tools`` concurrently and aggregate latencies"""
+    per_tool: Dict[str, List[float]] = {}
+    latencies: List[float] = []
+    errors = 0
+
+    async def agent(index: int, call_tool: CallTool) -> None:
+        nonlocal errors
+        script = AgentScript(forest, seed + index)
+        for _ in range(ops_per_agent):
+            name, arguments = script.next_call()
+            start = time.perf_counter()
+            ok = await call_tool(name, arguments)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            per_tool.setdefault(name, []).append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(agent(i, call) for i, call in enumerate(call_tools)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "agents": len(call_tools),
+        "operations": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_ops_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": _latency_summary(latencies),
+        "per_tool_latency_ms": {name: _latency_summary(values) for name, values in sorted(per_tool.items())},
+    }
+
+
+async def _connect(mcp, forest: SyntheticForest) -> float:
+    start = time.perf_counter()
+    await mcp.call_tool("knowledge_connect", {"init_with": " ".join(forest.module_names)})
+    return time.perf_counter() - start
+
+
+async def bench_inprocess(mcp, forest: SyntheticForest, agents: int, ops: int, seed: int) -> Dict[str, Any]:
+    """Drive the tool functions through FastMCP.call_tool in this process"""
+    connect_s = await _connect(mcp, forest)
+
+    async def call_tool(name: str, arguments: Dict[str, Any]) -> bool:
+        try:
+            await mcp.call_tool(name, arguments)
+        except Exception:
+            return False
+        return True
+
+    result = await _run_agents([call_tool] * agents, forest, ops, seed)
+    result["connect_s"] = connect_s
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def bench_http(mcp, forest: SyntheticForest, agents: int, ops: int, seed: int) -> Dict[str, Any]:
+    """Drive the tools over a local streamable-http transport with one client per agent"""
+    import uvicorn
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    port = _free_port()
+    config = uvicorn.Config(mcp.streamable_http_app(), host="127.0.0.1", port=port, log_level="warning")
+    http_server = uvicorn.Server(config)
+    thread = threading.Thread(target=http_server.run, daemon=True)
+    thread.start()
+    while not http_server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}{mcp.settings.streamable_http_path}"
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            sessions = []
+            for _ in range(agents):
+                read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                sessions.append(session)
+
+            start = time.perf_counter()
+            await sessions[0].call_tool("knowledge_connect", {"init_with": " ".join(forest.module_names)})
+            connect_s = time.perf_counter() - start
+
+            def make_call(session) -> CallTool:
+                async def call_tool(name: str, arguments: Dict[str, Any]) -> bool:
+                    result = await session.call_tool(name, arguments)
+                    return not result.isError
+                return call_tool
+
+            result = await _run_agents([make_call(s) for s in sessions], forest, ops, seed)
+            result["connect_s"] = connect_s
+            return result
+    finally:
+        http_server.should_exit = True
+        thread.join(timeout=10)
+
+
+def _median(values: List[float]) -> float:
+    values = sorted(values)
+    return values[len(values) // 2] if values else 0.0
+
+
+def _spawn_ms(argv: List[str], env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(argv, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def _first_tools_list_ms(env: Dict[str, str]) -> Tuple[float, int]:
+    """Spawn a stdio server and time it until the tools/list response arrives"""
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "kerag-mcp-bench", "version": "1"},
+        }},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    ]
+    payload = "".join(json.dumps(m) + "\n" for m in messages).encode("utf-8")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "kerag_mcp.kerag_mcp_server", "--transport", "stdio"],
+        env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        proc.stdin.write(payload)
+        proc.stdin.flush()
+        for line in proc.stdout:
+            message = json.loads(line)
+            if message.get("id") == 2:
+                elapsed = (time.perf_counter() - start) * 1000
+                return elapsed, len(message.get("result", {}).get("tools", []))
+        raise RuntimeError("Server exited before answering tools/list")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def bench_startup(runs: int) -> Dict[str, Any]:
+    """Measure cold-spawn cost of the stdio server
+
+    Reports medians over ``runs`` spawns of: a bare interpreter, an
+    interpreter importing the server module, and a full stdio server
+    answering its first tools/list request.
+    """
+    env = dict(os.environ)
+    package_parent = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_parent, env.get("PYTHONPATH")]))
+
+    baseline, imports, tools_list = [], [], []
+    tool_count = 0
+    for _ in range(runs):
+        baseline.append(_spawn_ms([sys.executable, "-c", "pass"], env))
+        imports.append(_spawn_ms([sys.executable, "-c", "import kerag_mcp.kerag_mcp_server"], env))
+        elapsed, tool_count = _first_tools_list_ms(env)
+        tools_list.append(elapsed)
+
+    return {
+        "runs": runs,
+        "python_baseline_ms": _median(baseline),
+        "import_ms": _median(imports),
+        "first_tools_list_ms": _median(tools_list),
+        "first_tools_list_max_ms": max(tools_list) if tools_list else 0.0,
+        "tools": tool_count,
+    }
+
+
+# --- rendering ---
+
+def _render_inputs(forest: SyntheticForest, count: int, seed: int) -> Dict[str, List[Any]]:
+    """Representative formatter inputs: 50-result searches, wide sections, node views"""
+    rng = random.Random(seed)
+    api = SyntheticKERAGAPI(forest)
+    for name in forest.module_names:
+        api.load_module(name)
+    sections = [nid for nid, node in forest.nodes.items() if node["children"]]
+
+    searches = []
+    for _ in range(count):
+        res = api.search(rng.choice(forest.vocabulary)[:3], max_results=50)
+        for item in res["data"]:
+            parent = api.get_parent(item["node_id"])
+            if parent.get("success"):
+                item["parent"] = parent["data"]
+        searches.append(res)
+    previews = [api.preview_children(rng.choice(sections))["data"] for _ in range(count)]
+    nodes = [api.navigate_to(rng.choice(list(forest.nodes)))["data"] for _ in range(count)]
+    return {"search": searches, "preview": previews, "node": nodes}
+
+
+def bench_render(forest: SyntheticForest, rounds: int, seed: int) -> Dict[str, Any]:
+    """Throughput of the text and compact formatters on representative inputs
+
+    Reports the fastest of ``rounds`` passes, per call and per rendered item,
+    so formatter regressions show up independently of KERAGAPI latency.
+    """
+    inputs = _render_inputs(forest, 50, seed)
+    formatters = {
+        "search": (format_response.format_search_results, lambda res: len(res["data"])),
+        "preview": (format_response.format_children_preview, len),
+        "node": (format_response.format_node_info, lambda node: 1),
+        "search_compact": (compact.search_results, lambda res: len(res["data"])),
+        "preview_compact": (lambda data: compact.children_preview({"success": True, "data": data}), len),
+        "node_compact": (lambda node: compact.navigation_result({"success": True, "data": node}), lambda node: 1),
+    }
+
+    report = {}
+    for name, (formatter, size) in formatters.items():
+        items = inputs[name.replace("_compact", "")]
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for item in items:
+                formatter(item)
+            best = min(best, time.perf_counter() - start)
+        rendered = sum(size(item) for item in items)
+        report[name] = {
+            "calls_per_s": len(items) / best,
+            "us_per_call": best / len(items) * 1e6,
+            "us_per_item": best / max(rendered, 1) * 1e6,
+            "output_bytes_per_call": sum(len(formatter(item).encode("utf-8")) for item in items) / len(items),
+        }
+    return report
+
+
+def run_benchmark(
+    forest: SyntheticForest,
+    transports: List[str],
+    agents: int,
+    ops: int,
+    seed: int,
+    startup_runs: int = 0,
+    render_rounds: int = 0
+) -> Dict[str, Any]:
+    """Run the benchmark for the given transports and return the JSON-able report"""
+    from . import kerag_mcp_server
+
+    kerag_mcp_server.session_manager.set_api_factory(
+        lambda **kwargs: SyntheticKERAGAPI(forest, **kwargs)
+    )
+    mcp = kerag_mcp_server.create_server(host="127.0.0.1", log_level="WARNING")
+
+    results = {}
+    for transport in transports:
+        if transport == "inprocess":
+            results[transport] = asyncio.run(bench_inprocess(mcp, forest, agents, ops, seed))
+        elif transport == "http":
+            results[transport] = asyncio.run(bench_http(mcp, forest, agents, ops, seed))
+
+    return {
+        "schema": REPORT_SCHEMA,
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "config": {
+            "forest": forest.config,
+            "agents": agents,
+            "ops_per_agent": ops,
+            "seed": seed,
+            "transports": transports,
+        },
+        "forest": forest.stats(),
+        "results": results,
+        "startup": bench_startup(startup_runs) if startup_runs else None,
+        "render": bench_render(forest, render_rounds, seed) if render_rounds else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    """Entry point of kerag-mcp-bench"""
+    parser = argparse.ArgumentParser(description="Benchmark the KERAG MCP server on synthetic modules")
+    parser.add_argument("--modules", type=int, default=4, help="Number of synthetic modules (default: 4)")
+    parser.add_argument("--depth", type=int, default=3, help="Depth of every module tree (default: 3)")
+    parser.add_argument("--fanout", type=int, default=6, help="Children per section node (default: 6)")
+    parser.add_argument("--words", type=int, default=120, help="Words per node body (default: 120)")
+    parser.add_argument("--vocabulary", type=int, default=2000, help="Vocabulary size (default: 2000)")
+    parser.add_argument("--agents", type=int, default=8, help="Concurrent simulated agents (default: 8)")
+    parser.add_argument("--ops", type=int, default=200, help="Tool calls per agent (default: 200)")
+    parser.add_argument(
+        "--transport",
+        choices=["inprocess", "http", "both"],
+        default="inprocess",
+        help="Where to drive the tools (default: inprocess)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument(
+        "--startup",
+        type=int,
+        default=0,
+        metavar="RUNS",
+        help="Also measure cold-spawn time to the first tools/list response over RUNS spawns (default: 0, skip)"
+    )
+    parser.add_argument(
+        "--render",
+        type=int,
+        default=0,
+        metavar="ROUNDS",
+        help="Also measure text and compact formatter throughput, fastest of ROUNDS passes (default: 0, skip)"
+    )
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    logging.getLogger("kerag_mcp").setLevel(logging.WARNING)
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    forest = SyntheticForest(
+        modules=args.modules,
+        depth=args.depth,
+        fanout=args.fanout,
+        words=args.words,
+        vocabulary=args.vocabulary,
+        seed=args.seed
+    )
+    transports = ["inprocess", "http"] if args.transport == "both" else [args.transport]
+    report = run_benchmark(forest, transports, args.agents, args.ops, args.seed, args.startup, args.render)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
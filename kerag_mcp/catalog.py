@@ -0,0 +1,310 @@
+"""
+Cached catalog of installed modules.
+
+``api.list_modules()`` rescans the module roots and re-reads every module's
+metadata. ``ModuleCatalog`` keeps the last result per root configuration and
+a background thread polls the module roots for changes: the entries of each
+root and the files directly in each module, plus the whole tree of the
+modules some session has loaded (``watch_modules``), whose edits trigger
+hot reloads. Until something changes, knowledge_list and
+knowledge_connect are served from memory, including the pre-rendered tables.
+Modules installed only as ``<root>/<module>.tar`` archives (see
+``archive.py``) are listed along with the module directories, marked as
+needing ``kerag install``.
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .archive import ArchiveStore, get_archive_store, module_name_of
+
+logger = logging.getLogger("kerag_mcp")
+
+# (local_root, global_root) as configured for the session (None = KERAG default)
+CatalogKey = Tuple[Optional[str], Optional[str]]
+
+
+# (path relative to the entry, mtime, size) of the entry ('') and of the files below it
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def _entry_signature(path: str, deep: bool = False) -> Signature:
+    """Stats of a module entry and of the files directly in it (everything below it if ``deep``)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ()
+    signature = [("", stat.st_mtime_ns, stat.st_size)]
+    if os.path.isdir(path):
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            try:
+                with os.scandir(os.path.join(path, relative)) as it:
+                    for entry in it:
+                        try:
+                            entry_stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        name = os.path.join(relative, entry.name) if relative else entry.name
+                        signature.append((name, entry_stat.st_mtime_ns, entry_stat.st_size))
+                        if deep and entry.is_dir(follow_symlinks=False):
+                            pending.append(name)
+            except OSError:
+                continue
+        signature.sort()
+    return tuple(signature)
+
+
+def _shallow(signature: Signature) -> Signature:
+    return tuple(item for item in signature if os.sep not in item[0])
+
+
+def changed_files(previous: Signature, current: Signature) -> List[str]:
+    """Paths (relative to the entry) added, removed or modified between two signatures"""
+    before = {name: stats for name, *stats in previous}
+    after = {name: stats for name, *stats in current}
+    return sorted(name or "." for name in set(before) | set(after) if before.get(name) != after.get(name))
+
+
+def scan_root(root: str, deep: Iterable[str] = ()) -> Dict[str, Tuple[bool, Signature]]:
+    """Signature of every entry (module) directly under a module root
+
+    Returns:
+        entry name -> (deep, signature); entries of the modules in ``deep``
+        are scanned to the bottom, the others only one level down.
+    """
+    deep = set(deep)
+    signatures = {}
+    try:
+        with os.scandir(root) as it:
+            names = [entry.name for entry in it if not entry.name.startswith(".")]
+    except OSError:
+        return signatures
+    for name in names:
+        is_deep = module_name_of(name) in deep
+        signatures[name] = (is_deep, _entry_signature(os.path.join(root, name), is_deep))
+    return signatures
+
+
+def _entry_changes(previous: Optional[Tuple[bool, Signature]],
+                   current: Optional[Tuple[bool, Signature]]) -> Optional[List[str]]:
+    """Files that changed in an entry between two scans, or None if it did not change"""
+    if previous == current:
+        return None
+    if previous is None or current is None:
+        return ["."]
+    (was_deep, before), (is_deep, after) = previous, current
+    if was_deep != is_deep:
+        # The module was loaded or unloaded in between: compare what both scans saw
+        before, after = _shallow(before), _shallow(after)
+    return changed_files(before, after) or None
+
+
+def _add_archives(data: Dict[str, Any], store: ArchiveStore) -> None:
+    """Add the modules installed only as archives to list_modules data, marked as needing ``kerag install``"""
+    modules = data["modules"] = {scope: dict(entries) for scope, entries in (data.get("modules") or {}).items()}
+    for scope in ("local", "global"):
+        root = data.get(f"{scope}_root")
+        if not root or modules.get(scope) is None:
+            continue
+        for module_name, path in ArchiveStore.scan(root).items():
+            modules[scope].setdefault(module_name, store.describe(path))
+
+
+class _CatalogEntry:
+    """Cached list_modules data of one root configuration"""
+
+    def __init__(self, data: Dict[str, Any], roots: List[str]):
+        self.data = data
+        self.roots = roots
+        self.rendered: Dict[Tuple, str] = {}
+
+
+class ModuleCatalog:
+    """Module metadata cache invalidated by polling the module roots
+
+    Args:
+        poll_interval: Seconds between two scans of the watched roots.
+        archive_store: Reader of modules installed as archives (the global one by default).
+    """
+
+    def __init__(self, poll_interval: float = 5.0, archive_store: Optional[ArchiveStore] = None):
+        self.poll_interval = poll_interval
+        self._archive_store = archive_store or get_archive_store()
+        self._entries: Dict[CatalogKey, _CatalogEntry] = {}
+        self._signatures: Dict[str, Dict[str, Tuple[bool, Signature]]] = {}
+        self._listeners: List[Callable[[str, Set[str]], None]] = []
+        self._deep_sources: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- cache ---
+
+    def list_modules(self, api, key: CatalogKey, scope: str = "both") -> Dict[str, Any]:
+        """Return ``api.list_modules`` data for ``scope``, scanning only on a cache miss
+
+        Returns:
+            Response dictionary in the ``api.list_modules`` format. ``loaded_modules``
+            is only present on a cache miss; callers track loaded modules themselves.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        loaded_modules = None
+        if entry is None:
+            result = api.list_modules(scope="both")
+            if not result.get("success"):
+                return result
+            data = dict(result.get("data", {}))
+            # The loaded set belongs to the API instance, not to the installed modules
+            loaded_modules = data.pop("loaded_modules", [])
+            if self._archive_store.enabled:
+                _add_archives(data, self._archive_store)
+            roots = [os.path.abspath(r) for r in (data.get("local_root"), data.get("global_root")) if r]
+            entry = _CatalogEntry(data, roots)
+            for root in roots:
+                self.watch(root)
+            with self._lock:
+                self._entries[key] = entry
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+
+        data = dict(entry.data)
+        if loaded_modules is not None:
+            data["loaded_modules"] = loaded_modules
+        if scope in ("local", "global"):
+            data["modules"] = {k: v for k, v in entry.data.get("modules", {}).items() if k == scope}
+        return {"success": True, "data": data}
+
+    def rendered(self, key: CatalogKey, render_key: Tuple, render: Callable[[], str]) -> str:
+        """Return a rendered string cached until the catalog of ``key`` changes"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and render_key in entry.rendered:
+                return entry.rendered[render_key]
+        text = render()
+        with self._lock:
+            if self._entries.get(key) is entry and entry is not None:
+                entry.rendered[render_key] = text
+        return text
+
+    def invalidate(self, roots: Optional[Iterable[str]] = None) -> None:
+        """Drop cached entries using any of ``roots`` (all entries if None)"""
+        with self._lock:
+            if roots is None:
+                self._entries.clear()
+                return
+            roots = set(roots)
+            for key in [k for k, e in self._entries.items() if roots.intersection(e.roots)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "watched_roots": sorted(self._signatures),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # --- watching ---
+
+    def add_listener(self, listener: Callable[[str, Set[str]], None]) -> None:
+        """Call ``listener(root, changed_entry_names)`` whenever a watched root changes"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def watch_modules(self, modules: Callable[[], Iterable[str]]) -> None:
+        """Also watch every file of the modules ``modules()`` returns on each scan (e.g. the loaded ones)"""
+        with self._lock:
+            self._deep_sources.append(modules)
+
+    def _deep_modules(self) -> Set[str]:
+        with self._lock:
+            sources = list(self._deep_sources)
+        modules: Set[str] = set()
+        for source in sources:
+            try:
+                modules.update(source())
+            except Exception:
+                logger.exception("catalog: module source failed")
+        return modules
+
+    def watch(self, root: str) -> None:
+        """Start watching a module root (idempotent)"""
+        root = os.path.abspath(root)
+        with self._lock:
+            if root in self._signatures:
+                return
+        signatures = scan_root(root, self._deep_modules())
+        with self._lock:
+            self._signatures.setdefault(root, signatures)
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch_loop, name="kerag-mcp-catalog", daemon=True)
+                self._watcher.start()
+
+    def check(self) -> Dict[str, Set[str]]:
+        """Scan all watched roots once; returns the changed entry names per root"""
+        with self._lock:
+            roots = list(self._signatures)
+        deep = self._deep_modules()
+        changes = {}
+        details = {}
+        for root in roots:
+            current = scan_root(root, deep)
+            with self._lock:
+                previous = self._signatures.get(root, {})
+                self._signatures[root] = current
+            changed = {}
+            for name in set(previous) | set(current):
+                files = _entry_changes(previous.get(name), current.get(name))
+                if files is not None:
+                    changed[name] = files
+            if changed:
+                changes[root] = set(changed)
+                details[root] = changed
+
+        for root, changed in changes.items():
+            logger.info("catalog: %s changed (%s), invalidating", root, "; ".join(
+                f"{name}: {', '.join(files[:3])}{' ...' if len(files) > 3 else ''}"
+                for name, files in sorted(details[root].items())))
+            self.invalidate([root])
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                try:
+                    listener(root, changed)
+                except Exception:
+                    logger.exception("catalog: change listener failed")
+        return changes
+
+    def _watch_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Global module catalog instance
+_module_catalog: Optional[ModuleCatalog] = None
+_module_catalog_lock = threading.Lock()
+
+
+def get_module_catalog() -> ModuleCatalog:
+    """Get the global module catalog (poll interval from KERAG_MCP_CATALOG_POLL_S)"""
+    global _module_catalog
+
+    if _module_catalog is None:
+        with _module_catalog_lock:
+            if _module_catalog is None:
+                _module_catalog = ModuleCatalog(float(os.environ.get("KERAG_MCP_CATALOG_POLL_S") or 5.0))
+
+    return _module_catalog
@@ -0,0 +1,314 @@
+"""
+Compact structured output (``format="compact"``).
+
+The functions here turn KERAGAPI responses directly into minified JSON for
+programmatic clients, one function per tool output (each docstring lists the
+fields of its payload), with no headers, padding or emoji, and with empty
+fields left out (``type`` is only given for nodes that are not ``content``
+nodes). The payloads
+only contain dicts, lists, strings, numbers and booleans, so they can be
+re-encoded as MessagePack as-is.
+
+Errors are ``{"error": "..."}`` objects (recognized by
+``format_response.is_error``).
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+COMPACT = "compact"
+
+
+def dumps(payload: Any) -> str:
+    """Minified JSON"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def error(message: str, **extra) -> str:
+    return dumps(dict(error=message, **extra))
+
+
+def _node_id(item: Any) -> Optional[str]:
+    if isinstance(item, str):
+        return item
+    return item.get("id") or item.get("node_id")
+
+
+def node_record(node: Dict[str, Any], with_title: bool = True) -> Dict[str, Any]:
+    """Compact record of a node dict: id, type (omitted for content nodes) and title"""
+    record = {"id": _node_id(node)}
+    node_type = node.get("type") or node.get("node_type")
+    if node_type and node_type != "content":
+        record["type"] = node_type
+    title = with_title and (node.get("title") or node.get("label"))
+    if title:
+        record["title"] = title
+    return record
+
+
+def _ids(nodes: Iterable[Any]) -> List[Optional[str]]:
+    return [_node_id(node) for node in nodes]
+
+
+def _titles(nodes: Iterable[Any]) -> Dict[str, str]:
+    """Ordered {node_id: title} map (the JSON form of the text "- title [@id]" lists)"""
+    titles = {}
+    for node in nodes:
+        if isinstance(node, dict):
+            titles[_node_id(node)] = node.get("title") or node.get("label") or ""
+        else:
+            titles[node] = ""
+    return titles
+
+
+def _truncate(text: str) -> str:
+    # Same limit as the text previews
+    return text[:77] + "..." if len(text) > 80 else text
+
+
+def _result(response: Dict[str, Any], default_error: str) -> Optional[str]:
+    """Compact error for a failed response, None if it succeeded"""
+    if response.get("success"):
+        return None
+    return error(response.get("error") or default_error)
+
+
+def _node_body(node: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """Add what the text output shows of a node: children of sections, content of the rest"""
+    if record.get("type") == "section":
+        children = node.get("children_preview") or node.get("children")
+        if isinstance(children, list) and children:
+            record["children"] = _titles(children)
+    else:
+        record.pop("title", None)
+        content = node.get("content") or node.get("content_preview")
+        if content:
+            record["content"] = content
+    return record
+
+
+def search_results(response: Dict[str, Any]) -> str:
+    """knowledge_search: query, total and one record per match with parent id and excerpt"""
+    failed = _result(response, "Search failed")
+    if failed:
+        return failed
+
+    meta = response.get("metadata", {})
+    results = [_search_record(res) for res in response.get("data", [])]
+    payload = {"query": meta.get("query", ""), "total": meta.get("total", len(results)), "results": results}
+    if meta.get("mode"):
+        payload["mode"] = meta["mode"]
+    if meta.get("retrievers"):
+        payload["retrievers"] = meta["retrievers"]
+    if meta.get("failed"):
+        payload["failed"] = meta["failed"]
+    if meta.get("truncated"):
+        payload["truncated"] = meta["truncated"]
+    return dumps(payload)
+
+
+def _search_record(res: Dict[str, Any]) -> Dict[str, Any]:
+    is_section = res.get("type") == "section"
+    record = node_record(res, with_title=is_section)
+    parent = res.get("parent")
+    if parent:
+        record["parent"] = parent.get("node_id")
+    if res.get("score") is not None:
+        record["score"] = res["score"]
+    if res.get("ranks"):
+        record["ranks"] = res["ranks"]
+    if not is_section:
+        excerpt = res.get("excerpt") or res.get("match_context") or res.get("content_preview")
+        if excerpt:
+            record["excerpt"] = excerpt.replace("\n", " ").strip()
+    return record
+
+
+def search_many_results(response: Dict[str, Any]) -> str:
+    """knowledge_search_many: per query its total and result ids, then the merged records
+    (with the indexes of the queries that matched them)"""
+    failed = _result(response, "Search failed")
+    if failed:
+        return failed
+
+    data = response.get("data") or {}
+    meta = response.get("metadata", {})
+    queries = []
+    for entry in data.get("queries", []):
+        if entry.get("error"):
+            queries.append({"query": entry["query"], "error": entry["error"]})
+        else:
+            queries.append({"query": entry["query"], "total": entry.get("total", 0),
+                            "ids": _ids(entry.get("results", []))})
+    merged = []
+    for res in data.get("merged", []):
+        record = _search_record(res)
+        record["queries"] = res.get("queries", [])
+        merged.append(record)
+    payload = {"queries": queries, "total": meta.get("total", len(merged)), "merged": merged}
+    if meta.get("truncated"):
+        payload["truncated"] = meta["truncated"]
+    return dumps(payload)
+
+
+def related(response: Dict[str, Any]) -> str:
+    """knowledge_related: start node id, total and one record per reached node with its hop,
+    direction ('out': referenced, 'in': referencing) and the node it was reached from"""
+    failed = _result(response, "Failed to find related nodes")
+    if failed:
+        return failed
+
+    data = response.get("data") or {}
+    meta = response.get("metadata", {})
+    records = []
+    for item in data.get("related", []):
+        record = node_record(item)
+        record.update(hop=item.get("hop"), dir=item.get("direction"), via=item.get("via"))
+        records.append(record)
+    payload = {"node": _node_id(data.get("node") or {}), "total": meta.get("total", len(records)),
+               "related": records}
+    if meta.get("truncated"):
+        payload["truncated"] = meta["truncated"]
+    return dumps(payload)
+
+
+def node_view(response: Dict[str, Any]) -> str:
+    """knowledge_view / knowledge_parent: node id, type, title, content, see_also and children"""
+    failed = _result(response, "Failed to view node")
+    if failed:
+        return failed
+
+    data = response.get("data") or {}
+    node = data.get("node", data)
+    record = node_record(node)
+    content = node.get("content")
+    if content:
+        record["content"] = content
+    see_also = node.get("see_also")
+    if see_also:
+        record["see_also"] = _ids(see_also)
+    children = node.get("children_preview") or node.get("children")
+    if isinstance(children, list) and children:
+        record["children"] = _titles(children)
+
+    # APIs that only return rendered views: pass the JSON rendering through
+    formatted = data.get("formatted_content") or {}
+    if "json" in formatted and not content:
+        view = formatted["json"]
+        if isinstance(view, str):
+            try:
+                view = json.loads(view)
+            except ValueError:
+                pass
+        record["view"] = view
+    truncated = response.get("metadata", {}).get("truncated")
+    if truncated:
+        record["truncated"] = truncated
+    return dumps(record)
+
+
+def navigation_result(response: Dict[str, Any]) -> str:
+    """knowledge_to/back/forward/up: the new node, its parent id and children or content,
+    and for back/forward the history steps moved"""
+    if not response.get("success"):
+        if response.get("error") == "Ambiguous target":
+            return error("Ambiguous target", candidates=response.get("metadata", {}).get("candidates", []))
+        return error(response.get("error") or "Navigation failed")
+
+    data = response.get("data") or {}
+    meta = response.get("metadata", {})
+    if data.get("already_at_target"):
+        return dumps({"id": meta.get("node_id"), "already_at_target": True})
+
+    record = node_record(data)
+    if not record["id"]:
+        record["id"] = meta.get("node_id")
+    breadcrumb = meta.get("breadcrumb")
+    if breadcrumb and len(breadcrumb) > 1:
+        record["parent"] = _node_id(breadcrumb[-2])
+    if meta.get("steps"):
+        record["steps"] = meta["steps"]
+    return dumps(_node_body(data, record))
+
+
+def children_preview(response: Dict[str, Any]) -> str:
+    """knowledge_children_preview: one record per child with its (truncated) preview"""
+    failed = _result(response, "Failed to get preview")
+    if failed:
+        return failed
+
+    records = []
+    for child in response.get("data", []):
+        is_section = child.get("type") == "section"
+        record = node_record(child, with_title=is_section)
+        preview = child.get("content_preview") or ("" if is_section else child.get("label"))
+        if preview:
+            record["preview"] = _truncate(preview)
+        records.append(record)
+    return dumps(records)
+
+
+def node_ids(response: Dict[str, Any], default_error: str) -> str:
+    """knowledge_children / knowledge_breadcrumb: list of node ids"""
+    failed = _result(response, default_error)
+    if failed:
+        return failed
+    return dumps(_ids(response.get("data", [])))
+
+
+def node_titles(response: Dict[str, Any], default_error: str) -> str:
+    """knowledge_roots: {node_id: title} of the listed nodes"""
+    failed = _result(response, default_error)
+    if failed:
+        return failed
+    return dumps(_titles(response.get("data", [])))
+
+
+def module_list(data: Dict[str, Any], loaded_modules: Iterable[str]) -> str:
+    """knowledge_list: one row per installed module and scope, field names given once"""
+    loaded = set(loaded_modules)
+    payload: Dict[str, Any] = {"fields": ["name", "version", "loaded", "description"]}
+    for scope in ("local", "global"):
+        modules = data.get("modules", {}).get(scope)
+        if modules:
+            payload[scope] = [
+                [name, info.get("version"), name in loaded, info.get("description")]
+                for name, info in sorted(modules.items())
+            ]
+    payload["local_root"] = data.get("local_root")
+    payload["global_root"] = data.get("global_root")
+    return dumps(payload)
+
+
+def loaded_modules(modules: List[Dict[str, Any]]) -> str:
+    """knowledge_modules: loaded modules with their file counts"""
+    return dumps([{"name": mod.get("name"), "files": mod.get("file_count", 0)} for mod in modules])
+
+
+def load_result(response: Dict[str, Any], root_ids: List[str]) -> str:
+    """knowledge_load: module name, file and node counts and its root ids"""
+    failed = _result(response, "Unknown error")
+    if failed:
+        return failed
+    data = response.get("data", {})
+    record = {"loaded": data.get("name"), "files": data.get("file_count")}
+    nodes = response.get("metadata", {}).get("loaded_nodes")
+    if nodes:
+        record["nodes"] = nodes
+    record["roots"] = root_ids
+    return dumps(record)
+
+
+def load_job(job: Dict[str, Any], root_ids: Optional[List[str]] = None) -> str:
+    """knowledge_load(background=True) / knowledge_load_status: job counters, then the root ids once loaded"""
+    record = {key: value for key, value in job.items() if value is not None and key != "message"}
+    if root_ids:
+        record["roots"] = root_ids
+    return dumps(record)
+
+
+def status(data: Dict[str, Any], **extra) -> str:
+    """knowledge_status: the API status fields plus any extra sections that are not empty"""
+    payload = dict(data)
+    payload.update({key: value for key, value in extra.items() if value})
+    return dumps(payload)
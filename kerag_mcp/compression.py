@@ -0,0 +1,298 @@
+"""
+Compressed node content in the module snapshots.
+
+The snapshots of ``index.py`` keep the content of every node of the loaded
+modules in memory for search, snippets and vectors. Textbook-sized modules
+are mostly prose, which compresses 4-6x, so the content can optionally be
+stored compressed (``KERAG_MCP_COMPRESS=zlib`` or ``zstd``):
+
+- the node contents of a module are packed in document order into blocks
+  of about ``KERAG_MCP_COMPRESS_BLOCK_KB`` and each block is compressed on
+  its own; a node keeps only (block, start, end). After a snapshot update,
+  blocks whose nodes are all unchanged are kept as they are and only the
+  contents of changed and added nodes are compressed again;
+- reading a node's content decompresses its block into a small LRU of
+  decompressed blocks shared by all modules (``KERAG_MCP_BLOCK_CACHE``
+  blocks). Searches and index walks visit nodes in document order, so
+  consecutive nodes are served from the same cached block.
+
+zstd needs the ``zstandard`` package and falls back to zlib without it.
+``knowledge_status`` reports the memory saved and the cost of cache misses.
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("kerag_mcp")
+
+CODECS = ("zlib", "zstd")
+
+_ZLIB_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+
+class BlockCache:
+    """LRU of decompressed content blocks
+
+    Args:
+        max_blocks: Decompressed blocks kept.
+    """
+
+    def __init__(self, max_blocks: int = 32):
+        self.max_blocks = max_blocks
+        self._blocks: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.decompress_ms = 0.0
+
+    def get(self, key: Tuple[int, int]) -> Optional[str]:
+        with self._lock:
+            text = self._blocks.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: Tuple[int, int], text: str, duration_ms: float) -> None:
+        with self._lock:
+            self.decompress_ms += duration_ms
+            self._blocks[key] = text
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+    def drop(self, store_id: int) -> None:
+        """Forget the blocks of a replaced ContentBlocks"""
+        with self._lock:
+            for key in [key for key in self._blocks if key[0] == store_id]:
+                del self._blocks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_blocks": self.max_blocks,
+                "blocks": len(self._blocks),
+                "chars": sum(len(text) for text in self._blocks.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "decompress_ms": self.decompress_ms,
+            }
+
+
+class ContentBlocks:
+    """The compressed node contents of one module snapshot
+
+    Packing replaces the content of each record by a reference into the
+    blocks (see ``NodeRecord.content``). With ``previous``, the blocks of the
+    module's previous packing, blocks whose records are all unchanged
+    (same handle and content hash) are reused without recompressing them.
+    """
+
+    _ids = itertools.count(1)
+    _ids_lock = threading.Lock()
+
+    def __init__(self, module_name: str, records: List[Any], codec: str, block_size: int, cache: BlockCache,
+                 previous: Optional["ContentBlocks"] = None):
+        with ContentBlocks._ids_lock:
+            self.id = next(ContentBlocks._ids)
+        self.module_name = module_name
+        self.codec = codec
+        self._cache = cache
+        self._blocks: List[bytes] = []
+        # Per block: its raw size and the (handle, content hash, start, end) of its records
+        self._raw_sizes: List[int] = []
+        self._members: List[List[Tuple[int, bytes, int, int]]] = []
+        self.raw_bytes = 0
+        self.reused_blocks = 0
+        start = time.perf_counter()
+        compress = _compressor(codec)
+
+        packed = self._reuse(previous, records) if previous is not None and previous.codec == codec else set()
+        parts: List[str] = []
+        pending: List[Any] = []
+        length = 0
+        for record in records:
+            if record.handle in packed:
+                continue
+            content = record.content
+            if not content:
+                continue
+            pending.append((record, length, length + len(content)))
+            parts.append(content)
+            length += len(content)
+            if length >= block_size:
+                self._seal(parts, pending, compress)
+                parts, pending, length = [], [], 0
+        if parts:
+            self._seal(parts, pending, compress)
+        self.compressed_bytes = sum(len(block) for block in self._blocks)
+        self.pack_ms = (time.perf_counter() - start) * 1000
+
+    def _reuse(self, previous: "ContentBlocks", records: List[Any]) -> Set[int]:
+        """Take over the blocks of ``previous`` whose records are all unchanged; returns their handles"""
+        by_handle = {record.handle: record for record in records}
+        packed: Set[int] = set()
+        for block, members in enumerate(previous._members):
+            matched = []
+            for handle, digest, start, end in members:
+                record = by_handle.get(handle)
+                if record is None or record.content_hash != digest:
+                    break
+                matched.append((record, start, end))
+            if len(matched) < len(members):
+                continue
+            index = len(self._blocks)
+            self._blocks.append(previous._blocks[block])
+            self._raw_sizes.append(previous._raw_sizes[block])
+            self._members.append(members)
+            self.raw_bytes += previous._raw_sizes[block]
+            self.reused_blocks += 1
+            for record, start, end in matched:
+                record.pack(self, index, start, end)
+                packed.add(record.handle)
+        return packed
+
+    def _seal(self, parts: List[str], pending: List[Any], compress) -> None:
+        data = "".join(parts).encode("utf-8", "surrogatepass")
+        self.raw_bytes += len(data)
+        block = len(self._blocks)
+        self._blocks.append(compress(data))
+        self._raw_sizes.append(len(data))
+        self._members.append([(record.handle, record.content_hash, start, end) for record, start, end in pending])
+        for record, start, end in pending:
+            record.pack(self, block, start, end)
+
+    def read(self, block: int, start: int, end: int) -> str:
+        """Content of a node: characters ``start:end`` of a block"""
+        key = (self.id, block)
+        text = self._cache.get(key)
+        if text is None:
+            begin = time.perf_counter()
+            text = _decompress(self.codec, self._blocks[block]).decode("utf-8", "surrogatepass")
+            self._cache.put(key, text, (time.perf_counter() - begin) * 1000)
+        return text[start:end]
+
+    def release(self) -> None:
+        self._cache.drop(self.id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "module": self.module_name,
+            "blocks": len(self._blocks),
+            "reused_blocks": self.reused_blocks,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "pack_ms": self.pack_ms,
+        }
+
+
+def _compressor(codec: str):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress
+    return lambda data: zlib.compress(data, _ZLIB_LEVEL)
+
+
+_zstd_decompressors = threading.local()
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        # ZstdDecompressor instances are not thread-safe
+        decompressor = getattr(_zstd_decompressors, "instance", None)
+        if decompressor is None:
+            decompressor = _zstd_decompressors.instance = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+    return zlib.decompress(data)
+
+
+class ContentCompression:
+    """Compression settings of the module snapshots and their shared block cache
+
+    Args:
+        codec: 'zlib' or 'zstd'; None keeps node content uncompressed.
+        block_size: Characters of content per compressed block.
+        cache_blocks: Decompressed blocks kept in the LRU.
+    """
+
+    def __init__(self, codec: Optional[str] = None, block_size: int = 32 * 1024, cache_blocks: int = 32):
+        self.codec = codec
+        self.block_size = block_size
+        self.cache = BlockCache(cache_blocks)
+
+    @property
+    def enabled(self) -> bool:
+        return self.codec is not None
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_COMPRESS, KERAG_MCP_COMPRESS_BLOCK_KB and KERAG_MCP_BLOCK_CACHE"""
+        codec = (os.environ.get("KERAG_MCP_COMPRESS") or "").lower()
+        if codec in ("", "0", "off", "no", "none"):
+            self.codec = None
+        elif codec in CODECS:
+            if codec == "zstd" and zstandard is None:
+                logger.warning("compression: zstandard is not installed, using zlib")
+                codec = "zlib"
+            self.codec = codec
+        else:
+            logger.warning("compression: unknown codec %r, node content stays uncompressed", codec)
+            self.codec = None
+        self.block_size = int(float(os.environ.get("KERAG_MCP_COMPRESS_BLOCK_KB") or self.block_size / 1024) * 1024)
+        self.cache.max_blocks = int(os.environ.get("KERAG_MCP_BLOCK_CACHE") or self.cache.max_blocks)
+
+    def pack(self, module_name: str, records: List[Any],
+             previous: Optional[ContentBlocks] = None) -> Optional[ContentBlocks]:
+        """Compress the contents of a snapshot (None when compression is off)
+
+        Args:
+            previous: Blocks of the module's previous snapshot, whose unchanged blocks are reused.
+        """
+        if not self.enabled:
+            return None
+        blocks = ContentBlocks(module_name, records, self.codec, self.block_size, self.cache, previous)
+        logger.info("compression: %s packed into %d %s blocks (%d reused), %d -> %d bytes in %.1f ms",
+                    module_name, len(blocks._blocks), self.codec, blocks.reused_blocks, blocks.raw_bytes,
+                    blocks.compressed_bytes, blocks.pack_ms)
+        return blocks
+
+    def stats(self, modules: Iterable[ContentBlocks]) -> Dict[str, Any]:
+        modules = [blocks.stats() for blocks in modules]
+        return {
+            "codec": self.codec,
+            "block_size": self.block_size,
+            "modules": modules,
+            "raw_bytes": sum(module["raw_bytes"] for module in modules),
+            "compressed_bytes": sum(module["compressed_bytes"] for module in modules),
+            "cache": self.cache.stats(),
+        }
+
+
+# Global content compression instance
+_content_compression: Optional[ContentCompression] = None
+_content_compression_lock = threading.Lock()
+
+
+def get_content_compression() -> ContentCompression:
+    """Get the global content compression settings (configured from the environment on first use)"""
+    global _content_compression
+
+    if _content_compression is None:
+        with _content_compression_lock:
+            if _content_compression is None:
+                content_compression = ContentCompression()
+                content_compression.configure_from_env()
+                _content_compression = content_compression
+
+    return _content_compression
@@ -0,0 +1,252 @@
+"""
+Per-call deadlines and cooperative cancellation.
+
+Every tool call gets a deadline (``KERAG_MCP_DEADLINE_MS``, default 30000;
+0 disables). The deadline is carried in a context variable, like the
+profiler's current call:
+
+- loops over results check ``expired()`` and stop early, marking the
+  response as truncated;
+- the potentially long KERAGAPI calls (search, node views) go through
+  ``DeadlineManager.call``.
+
+``call`` runs the call in a pool of ``KERAG_MCP_API_WORKERS`` threads
+(default 2) and waits at most the remaining budget. The event loop is then
+free while the call runs, so other sessions' calls and an MCP cancellation
+(``notifications/cancelled``) are served too. Calls against one session's
+instance still never overlap: the tool call holds the session's API lock
+(see apilock.py) while it waits. A KERAGAPI call cannot be interrupted once
+it runs: when its deadline passes, the tool returns what it has with a
+"truncated by deadline" marker, and the worker finishes the call in the
+background and discards the result, keeping the session's lock until then.
+Calls still waiting for a worker are dropped.
+
+Work that checks ``expired()`` itself (searches over the module indexes)
+gets a short grace period past the deadline to hand back its partial
+results. With ``KERAG_MCP_API_WORKERS=0`` the calls run inline on the event
+loop, and a call that runs past the deadline returns late rather than being
+cut short: deadlines are then advisory for KERAGAPI calls.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .apilock import defer_release
+from .profiling import is_profiled
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("kerag_mcp_deadline", default=None)
+
+# Seconds past the deadline a call is waited for, so work that stops at the
+# deadline by itself returns its partial results instead of being abandoned
+_GRACE_S = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """The deadline of the current tool call passed before a KERAGAPI call returned
+
+    Attributes:
+        running: The KERAGAPI call still runs in a worker, so the API
+            instance is in use until it returns.
+    """
+
+    def __init__(self, running: bool = False):
+        super().__init__()
+        self.running = running
+
+
+class Deadline:
+    """Deadline of one tool call"""
+
+    __slots__ = ("tool_name", "budget_ms", "expires_at", "truncated", "token")
+
+    def __init__(self, tool_name: str, budget_ms: float):
+        self.tool_name = tool_name
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+        self.truncated = False
+        self.token: Optional[contextvars.Token] = None
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the tool call being served, or None"""
+    return _current_deadline.get()
+
+
+def expired() -> bool:
+    """True if the current tool call ran out of time (always False without a deadline)"""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+def truncate(reason: str) -> str:
+    """Record that the current call returns partial results; returns ``reason`` for the response"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.truncated = True
+    return reason
+
+
+class _ToolCounters:
+    __slots__ = ("truncated", "cancelled")
+
+    def __init__(self):
+        self.truncated = 0
+        self.cancelled = 0
+
+
+class DeadlineManager:
+    """Hands out per-call deadlines and runs KERAGAPI calls against them
+
+    Args:
+        budget_ms: Deadline of every tool call; 0 disables deadlines.
+        workers: Threads running KERAGAPI calls; 0 runs them inline.
+    """
+
+    def __init__(self, budget_ms: float = 30000, workers: int = 2):
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counters: Dict[str, _ToolCounters] = {}
+        self._lock = threading.Lock()
+        self.abandoned = 0
+        self._running_abandoned = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_ms > 0
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_DEADLINE_MS and KERAG_MCP_API_WORKERS"""
+        self.budget_ms = float(os.environ.get("KERAG_MCP_DEADLINE_MS") or self.budget_ms)
+        self.workers = int(os.environ.get("KERAG_MCP_API_WORKERS") or self.workers)
+
+    # --- call lifecycle ---
+
+    def start(self, tool_name: str) -> Optional[Deadline]:
+        """Set the deadline of a tool call; returns None when deadlines are disabled"""
+        if not self.enabled:
+            return None
+        deadline = Deadline(tool_name, self.budget_ms)
+        deadline.token = _current_deadline.set(deadline)
+        return deadline
+
+    def finish(self, deadline: Deadline, cancelled: bool = False) -> None:
+        _current_deadline.reset(deadline.token)
+        if deadline.truncated or cancelled:
+            with self._lock:
+                counters = self._get(deadline.tool_name)
+                counters.truncated += deadline.truncated
+                counters.cancelled += cancelled
+
+    def _get(self, tool_name: str) -> _ToolCounters:
+        counters = self._counters.get(tool_name)
+        if counters is None:
+            counters = self._counters.setdefault(tool_name, _ToolCounters())
+        return counters
+
+    # --- KERAGAPI calls ---
+
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking KERAGAPI call within the current call's deadline
+
+        Without a deadline, without workers, and for profiled calls (whose
+        stacks must stay on the calling thread), the call runs inline.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before the call returns.
+        """
+        deadline = _current_deadline.get()
+        if deadline is None:
+            return fn(*args, **kwargs)
+        if deadline.expired():
+            raise DeadlineExceeded()
+        if not self.workers or is_profiled():
+            return fn(*args, **kwargs)
+
+        context = contextvars.copy_context()
+        future = self._get_executor().submit(context.run, fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline.remaining() + _GRACE_S)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(running=not future.done()) from None
+        finally:
+            if not future.done():
+                # Not started yet: dropped; running: finishes in the background
+                if not future.cancel():
+                    with self._lock:
+                        self.abandoned += 1
+                        self._running_abandoned += 1
+                    future.add_done_callback(self._abandoned_done)
+                    # The next call on the session's instance waits for this one
+                    defer_release(future)
+
+    def _abandoned_done(self, future) -> None:
+        with self._lock:
+            self._running_abandoned -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kerag-mcp-api")
+        return self._executor
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "budget_ms": self.budget_ms,
+                "workers": self.workers,
+                "abandoned": self.abandoned,
+                "abandoned_running": self._running_abandoned,
+                "tools": [
+                    {"tool": tool_name, "truncated": counters.truncated, "cancelled": counters.cancelled}
+                    for tool_name, counters in sorted(self._counters.items())
+                ],
+            }
+
+    def prometheus_samples(self) -> List[Tuple[str, str, str, float]]:
+        """(name, type, help, value) samples for MetricsRegistry.add_collector"""
+        stats = self.stats()
+        return [
+            ("kerag_mcp_truncated_calls_total", "counter",
+             "Tool calls that returned partial results because their deadline passed.",
+             sum(item["truncated"] for item in stats["tools"])),
+            ("kerag_mcp_cancelled_calls_total", "counter",
+             "Tool calls cancelled by the client.",
+             sum(item["cancelled"] for item in stats["tools"])),
+            ("kerag_mcp_abandoned_api_calls_total", "counter",
+             "KERAGAPI calls left to finish in the background after their deadline.",
+             stats["abandoned"]),
+        ]
+
+
+# Global deadline manager instance
+_deadline_manager: Optional[DeadlineManager] = None
+_deadline_manager_lock = threading.Lock()
+
+
+def get_deadline_manager() -> DeadlineManager:
+    """Get the global deadline manager (configured from the environment on first use)"""
+    global _deadline_manager
+
+    if _deadline_manager is None:
+        with _deadline_manager_lock:
+            if _deadline_manager is None:
+                deadline_manager = DeadlineManager()
+                deadline_manager.configure_from_env()
+                _deadline_manager = deadline_manager
+
+    return _deadline_manager
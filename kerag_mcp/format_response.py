@@ -1,4 +1,7 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable
+
+ERROR_PREFIX = "❌ Error: "
+TRUNCATED_PREFIX = "⚠️ Truncated by deadline: "
 
 def _format_header(title: str) -> str:
     """Internal helper: format header"""
@@ -6,7 +9,16 @@ def _format_header(title: str) -> str:
 
 def format_error(error: str) -> str:
     """Format error message"""
-    return f"❌ Error: {error}"
+    return f"{ERROR_PREFIX}{error}"
+
+def format_truncated(response: Dict[str, Any]) -> str:
+    """Marker appended to partial results ('' unless the response was cut short by the call's deadline)"""
+    reason = response.get("metadata", {}).get("truncated")
+    return f"\n\n{TRUNCATED_PREFIX}{reason}" if reason else ""
+
+def is_error(text: Any) -> bool:
+    """Check whether a tool result is a formatted error message (text or compact)"""
+    return isinstance(text, str) and (text.startswith(ERROR_PREFIX) or text.startswith('{"error":'))
 
 def format_connect_response(data: Dict[str, Any]) -> str:
     """Format connection response"""
@@ -43,6 +55,33 @@ def format_modules_list(modules: List[Dict[str, Any]]) -> str:
 
     return "\n".join(lines)
 
+def format_module_table(modules: Dict[str, Dict[str, Any]], loaded_modules: Iterable[str], title: str) -> List[str]:
+    """Format one table of installed modules (knowledge_list / knowledge_connect)"""
+    if not modules:
+        return []
+
+    loaded = set(loaded_modules)
+    # Header - use Y/N format
+    rows = [["Name", "Version", "Loaded (Y/N)", "Description"]]
+    for name in sorted(modules):
+        info = modules[name]
+        rows.append([
+            name,
+            str(info.get("version", "-") or "-"),
+            "Y" if name in loaded else "N",
+            str(info.get("description", "-") or "-"),
+        ])
+
+    # Column widths plus spacing
+    widths = [max(len(row[i]) for row in rows) + 4 for i in range(3)]
+
+    lines = [title]
+    for row in rows:
+        lines.append(f"{row[0]:<{widths[0]}}{row[1]:<{widths[1]}}{row[2]:<{widths[2]}}{row[3]}")
+
+    lines.append("")
+    return lines
+
 def format_roots_list(roots: List[Dict[str, Any]]) -> str:
     """Format roots list (knowledge_roots)"""
     if not roots:
@@ -72,6 +111,37 @@ def format_load_result(response: Dict[str, Any]) -> str:
 
     return "\n".join(lines)
 
+def format_load_job(job: Dict[str, Any]) -> str:
+    """Format the state of a background load job"""
+    lines = [_format_header(f"Load Job {job['job_id']}")]
+    lines.append(f"Module: {job['module']}")
+    state = job["state"]
+    if job.get("message") and job["message"] != state:
+        state += f" - {job['message']}"
+    lines.append(f"State: {state}")
+    if job.get("files") is not None:
+        lines.append(f"Files: {job['files']}")
+    if job.get("nodes_total") is not None or job.get("nodes_indexed"):
+        total = f"/{job['nodes_total']}" if job.get("nodes_total") is not None else ""
+        lines.append(f"Nodes Indexed: {job['nodes_indexed']}{total}")
+    if job.get("duration_ms") is not None:
+        lines.append(f"Duration: {job['duration_ms']:.0f} ms")
+    else:
+        lines.append(f"\nFollow with knowledge_load_status(job_id=\"{job['job_id']}\", wait_s=30)")
+
+    return "\n".join(lines)
+
+def format_load_jobs(jobs: List[Dict[str, Any]]) -> str:
+    """Format the list of background load jobs (most recent first)"""
+    if not jobs:
+        return "No background loads."
+
+    lines = [_format_header(f"Load Jobs ({len(jobs)})")]
+    for job in jobs:
+        lines.append(f"- {job['job_id']}: {job['module']} - {job['message']}")
+
+    return "\n".join(lines)
+
 def format_search_results(response: Dict[str, Any]) -> str:
     """Format search results"""
     if not response.get("success"):
@@ -84,42 +154,124 @@ def format_search_results(response: Dict[str, Any]) -> str:
     total = meta.get("total", count)
     query = meta.get("query", "")
 
-    lines = [_format_header(f"Search Results for '{query}'")]
+    mode = f" ({meta['mode']})" if meta.get("mode") else ""
+    lines = [_format_header(f"Search Results for '{query}'{mode}")]
     lines.append(f"Showing {count} of {total} matches\n")
+    retrievers = meta.get("retrievers")
+    if retrievers:
+        timings = []
+        for name, stats in retrievers.items():
+            if stats.get("error"):
+                took = f" (failed: {stats['error']})"
+            elif stats.get("ms") is not None:
+                took = f" in {stats['ms']:.1f} ms"
+            else:
+                took = " (timed out)"
+            timings.append(f"{name} {stats['returned']} of {stats['total']}{took}")
+        lines.append(f"Fused from {', '.join(timings)}\n")
 
     if not results:
         lines.append("No matches found.")
-        return "\n".join(lines)
+        return "\n".join(lines) + format_truncated(response)
 
     for i, res in enumerate(results, 1):
-        node_id = res.get('id') or res.get('node_id')
-        node_type = res.get('type', 'unknown')
+        lines.extend(_format_search_hit(i, res))
+        lines.append("")
 
-        # 1. Header Line (Section vs Content)
-        if node_type == 'section':
-            title = res.get('title') or res.get('label') or "Untitled Section"
-            lines.append(f"{i}. [{node_type}] {title} [@{node_id}]")
-        else:
-            lines.append(f"{i}. [{node_type}] [@{node_id}]")
-
-        # 2. Parent Info (if available)
-        parent = res.get('parent')
-        if parent:
-            p_title = parent.get('title') or parent.get('label') or "Untitled"
-            p_id = parent.get('node_id')
-            lines.append(f"   Parent: {p_title} [@{p_id}]")
-
-        # 3. Match Context / Excerpt (only for non-section nodes)
-        if node_type != 'section':
-            excerpt = res.get('excerpt') or res.get('match_context') or res.get('content_preview')
-            if excerpt:
-                # Clean up newlines for display
-                excerpt = excerpt.replace('\n', ' ').strip()
-                lines.append(f"   > {excerpt}")
+    return "\n".join(lines) + format_truncated(response)
+
+def _format_search_hit(i: int, res: Dict[str, Any]) -> List[str]:
+    """Internal helper: lines of one search result"""
+    lines = []
+    node_id = res.get('id') or res.get('node_id')
+    node_type = res.get('type', 'unknown')
+
+    # 1. Header Line (Section vs Content)
+    score = f" (similarity {res['score']:.2f})" if res.get('score') is not None else ""
+    if res.get('ranks'):
+        score = " (" + ", ".join(f"{name} #{rank}" for name, rank in res['ranks'].items()) + ")"
+    if node_type == 'section':
+        title = res.get('title') or res.get('label') or "Untitled Section"
+        lines.append(f"{i}. [{node_type}] {title} [@{node_id}]{score}")
+    else:
+        lines.append(f"{i}. [{node_type}] [@{node_id}]{score}")
+
+    # 2. Parent Info (if available)
+    parent = res.get('parent')
+    if parent:
+        p_title = parent.get('title') or parent.get('label') or "Untitled"
+        p_id = parent.get('node_id')
+        lines.append(f"   Parent: {p_title} [@{p_id}]")
+
+    # 3. Match Context / Excerpt (only for non-section nodes)
+    if node_type != 'section':
+        excerpt = res.get('excerpt') or res.get('match_context') or res.get('content_preview')
+        if excerpt:
+            # Clean up newlines for display
+            excerpt = excerpt.replace('\n', ' ').strip()
+            lines.append(f"   > {excerpt}")
+    return lines
+
+def format_search_many_results(response: Dict[str, Any]) -> str:
+    """Format batched search results: per-query hits, then the merged ranking"""
+    if not response.get("success"):
+        return format_error(response.get("error", "Search failed"))
+
+    data = response.get("data", {})
+    queries = data.get("queries", [])
+    merged = data.get("merged", [])
+    meta = response.get("metadata", {})
 
+    lines = [_format_header(f"Search Results for {len(queries)} Queries")]
+    for entry in queries:
+        if entry.get("error"):
+            lines.append(f"'{entry['query']}': {entry['error']}")
+            continue
+        results = entry.get("results", [])
+        lines.append(f"'{entry['query']}': showing {len(results)} of {entry.get('total', len(results))} matches")
+        for res in results:
+            node_id = res.get('id') or res.get('node_id')
+            title = res.get('title') or res.get('label') or ""
+            lines.append(f"   - [{res.get('type', 'unknown')}] {title} [@{node_id}]")
+    lines.append("")
+
+    names = [entry["query"] for entry in queries]
+    lines.append(_format_header("Merged Results"))
+    lines.append(f"Showing {len(merged)} of {meta.get('total', len(merged))} distinct matches\n")
+    if not merged:
+        lines.append("No matches found.")
+    for i, res in enumerate(merged, 1):
+        lines.extend(_format_search_hit(i, res))
+        lines.append(f"   Matched: {', '.join(repr(names[qi]) for qi in res.get('queries', []))}")
         lines.append("")
 
-    return "\n".join(lines)
+    return "\n".join(lines) + format_truncated(response)
+
+def format_related(response: Dict[str, Any]) -> str:
+    """Format the nodes reached from a node over see-also references, nearest first"""
+    if not response.get("success"):
+        return format_error(response.get("error", "Failed to find related nodes"))
+
+    data = response.get("data", {})
+    node = data.get("node", {})
+    related = data.get("related", [])
+    meta = response.get("metadata", {})
+
+    title = node.get("title") or node.get("label") or "Untitled"
+    lines = [_format_header(f"Related to {title} [@{node.get('node_id')}]")]
+    hops = meta.get("hops", 1)
+    lines.append(f"Showing {len(related)} of {meta.get('total', len(related))} nodes within "
+                 f"{hops} hop{'s' if hops != 1 else ''} ({meta.get('direction', 'both')})\n")
+    if not related:
+        lines.append("No cross-references found.")
+    for i, item in enumerate(related, 1):
+        node_id = item.get("node_id")
+        name = item.get("title") or item.get("label") or ""
+        kind = item.get("type", "not loaded" if item.get("loaded") is False else "unknown")
+        edge = "referenced by" if item.get("direction") == "out" else "references"
+        lines.append(f"{i}. [{kind}] {name + ' ' if name else ''}[@{node_id}]")
+        lines.append(f"   Hop {item.get('hop')}: {edge} @{item.get('via')}")
+    return "\n".join(lines) + format_truncated(response)
 
 def format_node_info(node: Dict[str, Any]) -> str:
     """Format raw node information (from explorer or manual dict)"""
@@ -183,7 +335,12 @@ def format_navigation_result(response: Dict[str, Any]) -> str:
     if isinstance(data, dict) and data.get("already_at_target"):
         return f"{header}\n(Already at target node: {meta.get('node_id')})".strip()
 
-    # 3. Node Info
+    # 3. Steps moved through the history (back/forward)
+    steps = meta.get("steps")
+    if steps:
+        header += f"↩️ Moved {steps} step{'s' if steps != 1 else ''} through history\n"
+
+    # 4. Node Info
     node_text = format_node_info(data)
 
     return f"{header}\n{node_text}".strip()
@@ -197,15 +354,15 @@ def format_node_view(response: Dict[str, Any]) -> str:
     # Check for formatted_content (from KERAGAPI.get_node_view)
     formatted = data.get("formatted_content", {})
     if "markdown" in formatted:
-        return formatted["markdown"]
+        return formatted["markdown"] + format_truncated(response)
     elif "text" in formatted:
-        return formatted["text"]
+        return formatted["text"] + format_truncated(response)
     elif "tree" in formatted:
-        return formatted["tree"]
+        return formatted["tree"] + format_truncated(response)
 
     # Fallback to node info if no formatted content (or if data is the node)
     node = data.get("node", data)
-    return format_node_info(node)
+    return format_node_info(node) + format_truncated(response)
 
 def format_children_list(children: List[str]) -> str:
     """Format children node ID list"""
@@ -284,3 +441,181 @@ def format_status(status: Dict[str, Any]) -> str:
         lines.append(f"\nCurrent Location: {curr}")
 
     return "\n".join(lines)
+
+def format_reload_status(status: Dict[str, Any]) -> str:
+    """Format hot reload status as a suffix of format_status ('' if nothing happened)"""
+    if not (status.get("reloads") or status.get("failures") or status.get("pending")):
+        return ""
+
+    lines = ["", "\nHot Reload:"]
+    lines.append(f"- Reloads: {status.get('reloads', 0)} (failed: {status.get('failures', 0)})")
+    if status.get("pending"):
+        lines.append(f"- Pending: {', '.join(status['pending'])}")
+    last = status.get("last_reload")
+    if last:
+        lines.append(f"- Last: {', '.join(last['modules'])} in {last['duration_ms']:.0f} ms "
+                     f"(cursor {last['cursor']} -> {last['remapped_to'] or 'ROOT'})")
+    return "\n".join(lines)
+
+def format_index_status(indexes: List[Dict[str, Any]]) -> str:
+    """Format module index stats as a suffix of format_status ('' if nothing is indexed)"""
+    if not indexes:
+        return ""
+
+    lines = ["", "\nIndexes:"]
+    for index in indexes:
+        line = f"- {index['module']}: {index['nodes']} nodes, {index['terms']} terms, {index['ngrams']} trigrams"
+        if index.get("links"):
+            line += f", {index['links']} links"
+        update = index.get("last_update")
+        if update:
+            line += (f"; last update +{update['added']} -{update['removed']} ~{update['changed']}"
+                     f" ({update['unchanged']} unchanged) in {update['duration_ms']:.1f} ms")
+        if index.get("stale"):
+            line += " [stale]"
+        lines.append(line)
+    return "\n".join(lines)
+
+def format_vector_status(stats: Dict[str, Any]) -> str:
+    """Format semantic search vector stats as a suffix of format_status ('' if none are built)"""
+    if not stats.get("modules"):
+        return ""
+
+    lines = ["", f"\nVectors ({stats['backend']}):"]
+    for module in stats["modules"]:
+        lsa = f", LSA {module['lsa']} dims" if module.get("lsa") else ""
+        lines.append(f"- {module['module']}: {module['nodes']} nodes, {module['features']} features, "
+                     f"{module['weights']} weights{lsa}; {module['bytes'] / 1024:.0f} KiB mapped")
+    lines.append(f"- {stats['built']} built in {stats['build_ms']:.0f} ms, {stats['mapped']} mapped from "
+                 f"{stats['directory']}, {stats['searches']} searches")
+    return "\n".join(lines)
+
+def format_compression_status(stats: Dict[str, Any]) -> str:
+    """Format compressed node content stats as a suffix of format_status ('' if compression is off)"""
+    if not stats.get("codec") or not stats.get("modules"):
+        return ""
+
+    raw, compressed = stats["raw_bytes"], stats["compressed_bytes"]
+    cache = stats["cache"]
+    ratio = raw / compressed if compressed else 0.0
+    lookups = cache["hits"] + cache["misses"]
+    hit_rate = f"{cache['hits'] / lookups * 100:.0f}%" if lookups else "-"
+    per_miss = cache["decompress_ms"] / cache["misses"] if cache["misses"] else 0.0
+    lines = ["", f"\nContent Compression ({stats['codec']}):"]
+    for module in stats["modules"]:
+        lines.append(f"- {module['module']}: {module['raw_bytes'] / 1024:.0f} KiB -> "
+                     f"{module['compressed_bytes'] / 1024:.0f} KiB in {module['blocks']} blocks")
+    lines.append(f"- Memory: {raw / 1024:.0f} KiB of content held in {compressed / 1024:.0f} KiB ({ratio:.1f}x) "
+                 f"plus {cache['chars'] / 1024:.0f} KiB in {cache['blocks']} of {cache['max_blocks']} cached blocks "
+                 f"of {stats['block_size'] // 1024} KiB")
+    lines.append(f"- Latency: block cache hit rate {hit_rate} ({cache['hits']} hits, {cache['misses']} misses), "
+                 f"{per_miss:.2f} ms per miss")
+    return "\n".join(lines)
+
+def format_archive_status(stats: Dict[str, Any]) -> str:
+    """Format module archive stats as a suffix of format_status ('' if no archive is open)"""
+    if not stats.get("archives"):
+        return ""
+
+    lines = ["", "\nArchives:"]
+    for archive in stats["archives"]:
+        lines.append(f"- {archive['path']}: {archive['members']} members, {archive['size'] / 1024:.0f} KiB; "
+                     f"offset table built in {archive['open_ms']:.1f} ms; needs `kerag install`")
+    return "\n".join(lines)
+
+def format_prefetch_status(stats: Dict[str, Any]) -> str:
+    """Format view cache / prefetch stats as a suffix of format_status ('' if disabled)"""
+    if not stats.get("enabled"):
+        return ""
+
+    lines = ["", "\nView Cache:"]
+    lines.append(f"- Hit rate: {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses, {stats['cached']} cached)")
+    lines.append(f"- Prefetched: {stats['prefetched']} views, {stats['prefetch_hits']} used "
+                 f"(budget {stats['budget']}; {stats['dropped']} batches dropped, {stats['abandoned']} abandoned)")
+    return "\n".join(lines)
+
+def format_history_status(stats: Dict[str, Any]) -> str:
+    """Format navigation history size as a suffix of format_status"""
+    lines = ["", "\nNavigation History:"]
+    lines.append(f"- Entries: {stats['entries']} of {stats['capacity']} (at {stats['position'] + 1}, "
+                 f"{stats['dropped']} oldest dropped)")
+    lines.append(f"- Memory: {stats['bytes'] / 1024:.1f} KB ring buffer, "
+                 f"{stats['handles']} interned node ids ({stats['handle_bytes'] / 1024:.1f} KB, shared)")
+    return "\n".join(lines)
+
+def format_metrics(tools: List[Dict[str, Any]]) -> str:
+    """Format per-tool metrics snapshot (knowledge_metrics)"""
+    if not tools:
+        return "No tool calls recorded yet."
+
+    lines = [_format_header(f"Tool Metrics ({len(tools)} tools)")]
+    lines.append(f"{'Tool':<28}{'Calls':>8}{'Errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Max ms':>10}{'Avg bytes':>11}")
+    for tool in tools:
+        latency = tool["latency_ms"]
+        quantiles = latency["quantiles"]
+        lines.append(
+            f"{tool['name']:<28}{tool['calls']:>8}{tool['errors']:>8}"
+            f"{quantiles.get(0.5, 0):>10.2f}{quantiles.get(0.95, 0):>10.2f}{quantiles.get(0.99, 0):>10.2f}"
+            f"{latency['max']:>10.2f}{tool['response_bytes']['mean']:>11.0f}"
+        )
+
+    return "\n".join(lines)
+
+def format_coalescing_stats(stats: List[Dict[str, Any]]) -> str:
+    """Format single-flight counters as a suffix of format_metrics ('' if nothing was coalesced)"""
+    if not any(item["coalesced"] for item in stats):
+        return ""
+
+    lines = ["", "\nCoalesced Calls:"]
+    for item in stats:
+        if item["coalesced"]:
+            lines.append(f"- {item['tool']}: {item['coalesced']} calls shared the result of "
+                         f"{item['executed']} executions, {item['saved_ms']:.1f} ms of work avoided")
+    return "\n".join(lines)
+
+def format_deadline_stats(stats: Dict[str, Any]) -> str:
+    """Format deadline counters as a suffix of format_metrics ('' if no call was cut short)"""
+    if not any(item["truncated"] or item["cancelled"] for item in stats["tools"]):
+        return ""
+
+    lines = ["", f"\nDeadlines ({stats['budget_ms']:.0f} ms per call):"]
+    for item in stats["tools"]:
+        lines.append(f"- {item['tool']}: {item['truncated']} truncated, {item['cancelled']} cancelled by the client")
+    if stats["abandoned"]:
+        lines.append(f"- KERAGAPI calls left to finish in the background: {stats['abandoned']} "
+                     f"({stats['abandoned_running']} still running, {stats['workers']} workers)")
+    return "\n".join(lines)
+
+def format_admission_stats(stats: Dict[str, Any]) -> str:
+    """Format admission control counters as a suffix of format_metrics ('' if disabled)"""
+    if not stats.get("enabled"):
+        return ""
+
+    lines = ["", "\nAdmission Control:"]
+    lines.append(f"- Limits: {stats['max_concurrent']} concurrent calls, {stats['rate']:g} cost units/s per client "
+                 f"(burst {stats['burst']:g})")
+    lines.append(f"- Calls: {stats['admitted']} admitted ({stats['queued']} queued, longest wait "
+                 f"{stats['max_queue_wait_ms']:.0f} ms), {stats['rate_limited']} rate limited, {stats['shed']} shed")
+    lines.append(f"- Now: {stats['in_flight']} running, {stats['queue']} queued, {stats['clients']} clients")
+    return "\n".join(lines)
+
+def format_profile_status(status: Dict[str, Any]) -> str:
+    """Format profiler settings and recent slow calls (knowledge_profile)"""
+    lines = [_format_header("Profiler")]
+    lines.append(f"- Mode: {status.get('mode')}")
+    lines.append(f"- Threshold: {status.get('threshold_ms')} ms")
+    lines.append(f"- Sample Interval: {status.get('interval_ms')} ms")
+    lines.append(f"- Output Dir: {status.get('output_dir')}")
+
+    recent = status.get("recent", [])
+    if not recent:
+        lines.append("\nNo slow calls recorded.")
+        return "\n".join(lines)
+
+    lines.append(f"\nRecent Slow Calls ({len(recent)}):")
+    for item in reversed(recent):
+        phases = ", ".join(f"{name}={ms:.1f}ms" for name, ms in item.get("phases_ms", {}).items())
+        lines.append(f"- {item['tool']}: {item['duration_ms']:.1f} ms ({phases})")
+        lines.append(f"  {item['path']}")
+
+    return "\n".join(lines)
@@ -0,0 +1,67 @@
+"""
+Hybrid search: lexical and semantic results fused into one ranking.
+
+``knowledge_search(mode="hybrid")`` runs the text search and the vector
+search of ``vectors.py`` one after the other, as both use the session's
+KERAGAPI instance, and merges their rankings with reciprocal rank fusion: a
+node scores ``sum(1 / (RRF_K + rank))`` over the retrievers that returned
+it, so nodes found by both rise to the top while a strong hit of either
+retriever is kept. Fusion only needs ranks, which sidesteps the
+incomparable scores of the two retrievers.
+
+Both retrievers return at most ``max_results`` nodes and the fused ranking
+is cut to the same budget. The response metadata reports how long each
+retriever took.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+# Rank offset of reciprocal rank fusion (the usual value from the RRF paper)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[Dict[str, Any]]],
+    max_results: int,
+    k: int = RRF_K
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Fuse the result lists of several retrievers
+
+    Args:
+        rankings: Retriever name -> its results, best first. The first
+            retriever that returned a node provides its record (excerpt,
+            type, title), so the lexical list should come first.
+        max_results: Length of the fused ranking.
+        k: Rank offset; larger values flatten the weight of the top ranks.
+
+    Returns:
+        The fused results (each with ``ranks``: retriever name -> 1-based
+        rank, and ``fused_score``) and the number of distinct nodes fused
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, int] = {}
+    for name, results in rankings.items():
+        for rank, res in enumerate(results, 1):
+            node_id = res.get("node_id") or res.get("id")
+            if not node_id:
+                continue
+            item = fused.get(node_id)
+            if item is None:
+                item = fused[node_id] = dict(res)
+                # Similarities of one retriever are meaningless next to another's ranks
+                item.pop("score", None)
+                item["ranks"] = {}
+                first_seen[node_id] = len(first_seen)
+                scores[node_id] = 0.0
+            if name not in item["ranks"]:
+                item["ranks"][name] = rank
+                scores[node_id] += 1.0 / (k + rank)
+
+    ranked = sorted(fused, key=lambda node_id: (-scores[node_id], first_seen[node_id]))
+    results = []
+    for node_id in ranked[:max_results]:
+        item = fused[node_id]
+        item["fused_score"] = round(scores[node_id], 6)
+        results.append(item)
+    return results, len(fused)
@@ -0,0 +1,156 @@
+"""
+See-also traversal over the cross-reference arrays of the module indexes.
+
+``knowledge_view(include_see_also=True)`` lists the references of one node,
+so following them costs a view call per link, and nothing lists the nodes
+referencing a node. ``RelatedFinder`` answers both from the ``links`` and
+``backlinks`` CSR arrays of ``index.py`` (built when a module is indexed):
+a breadth-first search from a node, following references forward,
+backward or both, bounded by a number of hops and a number of nodes.
+
+References into modules that are not loaded are reported with their id
+only; the search does not expand them.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .deadline import expired, truncate
+from .handles import module_of
+from .index import IndexStore, ModuleIndex, get_index_store
+
+# Edge directions of a traversal
+DIRECTIONS = ("out", "in", "both")
+
+
+class RelatedFinder:
+    """Bounded breadth-first search over see-also references
+
+    Args:
+        index_store: Store providing the module indexes.
+        max_hops: Largest accepted number of hops.
+        max_limit: Largest accepted number of returned nodes.
+    """
+
+    def __init__(self, index_store: IndexStore, max_hops: int = 4, max_limit: int = 200):
+        self.max_hops = max_hops
+        self.max_limit = max_limit
+        self._index_store = index_store
+
+    def related(
+        self,
+        api,
+        module_names: Iterable[str],
+        node_id: str,
+        hops: int = 1,
+        limit: int = 30,
+        direction: str = "both"
+    ) -> Dict[str, Any]:
+        """Nodes within ``hops`` references of ``node_id``, nearest first
+
+        Returns:
+            A response whose data holds the start ``node`` and ``related``:
+            per node its id, type, title, label, ``hop`` (distance),
+            ``direction`` ('out': referenced, 'in': referencing) and ``via``
+            (the node it was reached from)
+        """
+        if direction not in DIRECTIONS:
+            return {"success": False, "error": f"Invalid direction '{direction}', expected one of {', '.join(DIRECTIONS)}"}
+        hops = max(1, min(hops, self.max_hops))
+        limit = max(1, min(limit, self.max_limit))
+        if "::" not in node_id:
+            node_id = f"{node_id}::{node_id}"
+
+        indexes = {module_name: self._index_store.get(api, module_name) for module_name in module_names}
+        start_index = indexes.get(module_of(node_id))
+        start = self._record(start_index, node_id)
+        if start is None:
+            return {"success": False, "error": f"Node not found: {node_id}"}
+        handles = start_index.handles
+
+        related: List[Dict[str, Any]] = []
+        seen = {start.handle}
+        queue = deque([(start.handle, 0)])
+        truncated = None
+        total = 0
+        while queue:
+            if expired():
+                truncated = truncate(f"searched {len(seen)} nodes before the deadline")
+                break
+            handle, hop = queue.popleft()
+            if hop == hops:
+                continue
+            for target, edge in self._neighbours(indexes, handles.module_name(handle), handle, direction):
+                if target in seen:
+                    continue
+                seen.add(target)
+                total += 1
+                if len(related) < limit:
+                    related.append(self._item(indexes, handles.node_id(target), hop + 1, edge,
+                                              handles.node_id(handle)))
+                queue.append((target, hop + 1))
+
+        metadata: Dict[str, Any] = {"node_id": node_id, "hops": hops, "direction": direction, "total": total}
+        if truncated:
+            metadata["truncated"] = truncated
+        return {
+            "success": True,
+            "data": {"node": self._item(indexes, start.node_id), "related": related},
+            "metadata": metadata,
+        }
+
+    @staticmethod
+    def _record(index: Optional[ModuleIndex], node_id: str):
+        if index is None:
+            return None
+        with index.lock:
+            return index.record(node_id)
+
+    @staticmethod
+    def _neighbours(indexes: Dict[str, ModuleIndex], module_name: str, handle: int,
+                    direction: str) -> List[Tuple[int, str]]:
+        """(handle, 'out' | 'in') of the nodes one reference away"""
+        neighbours: List[Tuple[int, str]] = []
+        if direction in ("out", "both"):
+            index = indexes.get(module_name)
+            if index is not None:
+                with index.lock:
+                    neighbours.extend((target, "out") for target in index.links.neighbours(handle))
+        if direction in ("in", "both"):
+            # Any loaded module may reference the node
+            for index in indexes.values():
+                with index.lock:
+                    neighbours.extend((source, "in") for source in index.backlinks.neighbours(handle))
+        return neighbours
+
+    @staticmethod
+    def _item(indexes: Dict[str, ModuleIndex], node_id: str, hop: int = 0, direction: Optional[str] = None,
+              via: Optional[str] = None) -> Dict[str, Any]:
+        item: Dict[str, Any] = {"node_id": node_id, "id": node_id}
+        index = indexes.get(module_of(node_id))
+        record = RelatedFinder._record(index, node_id)
+        if record is not None:
+            item.update(type=record.type, title=record.title, label=record.label)
+        else:
+            item["loaded"] = False
+        if hop:
+            item.update(hop=hop, direction=direction, via=via)
+        return item
+
+
+# Global related-node finder instance
+_related_finder: Optional[RelatedFinder] = None
+_related_finder_lock = threading.Lock()
+
+
+def get_related_finder() -> RelatedFinder:
+    """Get the global related-node finder instance"""
+    global _related_finder
+
+    if _related_finder is None:
+        with _related_finder_lock:
+            if _related_finder is None:
+                _related_finder = RelatedFinder(get_index_store())
+
+    return _related_finder
@@ -0,0 +1,113 @@
+"""
+Interned node ids and integer node handles.
+
+Node ids (``module::label``) are long strings that get hashed, split and
+compared on every lookup. ``HandleTable`` assigns every node id it sees an
+integer handle, once, and maps handles back to the (interned) id string.
+
+Handles are allocated in per-module blocks: the high bits hold the module
+number and the low ``MODULE_SHIFT`` bits a dense index within the module.
+Which module a node belongs to is therefore a shift, and "all nodes of
+module m" is the handle range ``module_range(m)`` -- no string prefix tests.
+"""
+
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Low bits of a handle: index of the node within its module
+MODULE_SHIFT = 32
+
+ROOT_ID = "::ROOT"
+
+
+def module_of(node_id: str) -> str:
+    """Module name of a node id ('module::label' or 'module/path'; '' for ROOT)"""
+    if "::" in node_id:
+        return node_id.split("::", 1)[0]
+    return node_id.split("/", 1)[0]
+
+
+class HandleTable:
+    """Bidirectional node id <-> integer handle table (handles are never reused)"""
+
+    def __init__(self):
+        self._handles: Dict[str, int] = {}
+        self._modules: Dict[str, int] = {}
+        self._module_names: List[str] = []
+        # Per module: node ids by index within the module
+        self._ids: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def intern(self, node_id: str) -> int:
+        """Handle of ``node_id``, assigning the next free one of its module on first sight"""
+        handle = self._handles.get(node_id)
+        if handle is not None:
+            return handle
+        with self._lock:
+            handle = self._handles.get(node_id)
+            if handle is None:
+                module_no = self._module_number(module_of(node_id))
+                ids = self._ids[module_no]
+                handle = (module_no << MODULE_SHIFT) | len(ids)
+                node_id = sys.intern(node_id)
+                ids.append(node_id)
+                self._handles[node_id] = handle
+            return handle
+
+    def _module_number(self, module_name: str) -> int:
+        # Called with the lock held
+        module_no = self._modules.get(module_name)
+        if module_no is None:
+            module_no = len(self._module_names)
+            self._modules[module_name] = module_no
+            self._module_names.append(module_name)
+            self._ids.append([])
+        return module_no
+
+    def handle(self, node_id: str) -> Optional[int]:
+        """Handle of ``node_id`` if it has one"""
+        return self._handles.get(node_id)
+
+    def node_id(self, handle: int) -> str:
+        return self._ids[handle >> MODULE_SHIFT][handle & ((1 << MODULE_SHIFT) - 1)]
+
+    def module_name(self, handle: int) -> str:
+        return self._module_names[handle >> MODULE_SHIFT]
+
+    def module_range(self, module_name: str) -> Tuple[int, int]:
+        """Half-open handle range [lo, hi) of a module's nodes"""
+        with self._lock:
+            module_no = self._module_number(module_name)
+        return module_no << MODULE_SHIFT, (module_no + 1) << MODULE_SHIFT
+
+    def in_module(self, node_id: str, module_name: str) -> bool:
+        """True if ``node_id`` belongs to ``module_name`` (a range check on its handle)"""
+        lo, hi = self.module_range(module_name)
+        return lo <= self.intern(node_id) < hi
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the table, including the id strings"""
+        with self._lock:
+            return (sys.getsizeof(self._handles) + sys.getsizeof(self._ids)
+                    + sum(sys.getsizeof(ids) + sum(sys.getsizeof(node_id) for node_id in ids) for ids in self._ids))
+
+
+# Global handle table instance
+_handle_table: Optional[HandleTable] = None
+_handle_table_lock = threading.Lock()
+
+
+def get_handle_table() -> HandleTable:
+    """Get the global handle table instance"""
+    global _handle_table
+
+    if _handle_table is None:
+        with _handle_table_lock:
+            if _handle_table is None:
+                _handle_table = HandleTable()
+
+    return _handle_table
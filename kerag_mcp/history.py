@@ -0,0 +1,90 @@
+"""
+Bounded navigation history of a session.
+
+``NavigationHistory`` keeps the nodes a session navigated to as integer
+handles (see ``handles.py``) in a fixed-size ring buffer, like a browser's
+back/forward list: navigating to a new node drops the forward entries, and
+once the buffer is full the oldest entry is overwritten. Moving any number
+of steps back or forward is index arithmetic, and memory per session is
+fixed by the capacity (``KERAG_MCP_HISTORY_SIZE``, default 256).
+"""
+
+from array import array
+from typing import Any, Dict, Optional, Tuple
+
+from .handles import HandleTable
+
+
+class NavigationHistory:
+    """Back/forward list of node handles in a ring buffer
+
+    Entries are addressed by absolute position; position ``p`` lives in slot
+    ``p % capacity`` and the live entries are positions ``[start, end)``.
+
+    Args:
+        handles: Table the node ids are interned in.
+        capacity: Maximum number of entries kept.
+    """
+
+    def __init__(self, handles: HandleTable, capacity: int = 256):
+        self.capacity = max(int(capacity), 2)
+        self._handles = handles
+        self._ring = array("q", [0]) * self.capacity
+        self._start = 0
+        self._end = 0
+        self._pos = -1
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def position(self) -> int:
+        """Absolute position of the current entry"""
+        return self._pos
+
+    def current(self) -> Optional[str]:
+        if self._pos < self._start:
+            return None
+        return self._handles.node_id(self._ring[self._pos % self.capacity])
+
+    def visit(self, node_id: str) -> None:
+        """Record a navigation to ``node_id``, dropping the forward entries"""
+        handle = self._handles.intern(node_id)
+        if self._pos >= self._start and self._ring[self._pos % self.capacity] == handle:
+            return
+        self._end = self._pos + 1
+        self._ring[self._end % self.capacity] = handle
+        self._end += 1
+        self._pos = self._end - 1
+        if self._end - self._start > self.capacity:
+            self._start = self._end - self.capacity
+            self.dropped += 1
+
+    def step(self, offset: int) -> Optional[Tuple[int, str]]:
+        """Entry ``offset`` steps from the current one (negative is back), clamped to the list
+
+        Returns:
+            (position, node_id), or None if there is nothing in that direction.
+            The current position is unchanged until ``seek(position)``.
+        """
+        if offset < 0 and self._pos <= self._start:
+            return None
+        if offset > 0 and self._pos >= self._end - 1:
+            return None
+        position = min(max(self._pos + offset, self._start), self._end - 1)
+        return position, self._handles.node_id(self._ring[position % self.capacity])
+
+    def seek(self, position: int) -> None:
+        """Make the entry at ``position`` (from ``step``) the current one"""
+        if self._start <= position < self._end:
+            self._pos = position
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "position": self._pos - self._start,
+            "dropped": self.dropped,
+            "bytes": self._ring.buffer_info()[1] * self._ring.itemsize,
+        }
@@ -0,0 +1,656 @@
+"""
+Per-module node snapshots and search indexes, maintained incrementally.
+
+A ``ModuleIndex`` holds a snapshot of every node of one loaded module
+(``NodeRecord``: parent, type, title, label, content and a content hash) and
+the structures derived from it:
+
+- ``postings``: term -> {handle: start offsets of the term in the node text}
+- ``ngrams``: character trigram -> array of handles (substring candidates)
+- ``ancestors``: handle -> handles from the module root down to the parent
+- ``links`` / ``backlinks``: see-also references of the module's nodes,
+  forward (source -> targets) and reverse (target -> sources), as CSR
+  adjacency arrays. Targets may lie in other modules, so the referrers of
+  a node are the union of the ``backlinks`` of every loaded module
+
+Nodes are keyed by their integer handle (see ``handles.py``) rather than
+by id string; ids are only resolved at the API boundary.
+
+When a module is reloaded, the new tree is diffed against the snapshot by
+node id and content hash and only added, removed and changed nodes touch the
+postings and n-gram tables; ancestor arrays are recomputed only below nodes
+that were added or moved. The link arrays are rebuilt on every update, in
+time proportional to the number of links. Fetching the new tree still walks
+every node through the API, but index maintenance is proportional to the
+delta. With ``KERAG_MCP_COMPRESS`` set, the node contents are then packed
+into compressed blocks (see ``compression.py``); only the blocks holding
+changed nodes are compressed again.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .apilock import ApiLock
+from .compression import ContentBlocks, ContentCompression, get_content_compression
+from .handles import HandleTable, get_handle_table
+from .session_manager import get_session_manager
+
+logger = logging.getLogger("kerag_mcp")
+
+NGRAM_SIZE = 3
+
+# Nodes walked between two progress callbacks of build_snapshot
+SNAPSHOT_PROGRESS_EVERY = 256
+
+# Nodes walked between two yields to the event loop of build_snapshot_async,
+# and per stretch of the session's API lock
+SNAPSHOT_YIELD_EVERY = 16
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of ``text``"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def token_offsets(text: str) -> Dict[str, List[int]]:
+    """Start offsets of every lowercased word token of ``text``"""
+    offsets: Dict[str, List[int]] = {}
+    for match in _TOKEN_RE.finditer(text.lower()):
+        offsets.setdefault(match.group(), []).append(match.start())
+    return offsets
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """Distinct lowercased character n-grams of ``text``"""
+    text = text.lower()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NodeRecord:
+    """Snapshot of one node"""
+
+    __slots__ = ("node_id", "parent_id", "handle", "parent", "type", "title", "label", "_content", "_blocks",
+                 "_span", "see_also", "children", "content_hash")
+
+    def __init__(
+        self,
+        node_id: str,
+        parent_id: Optional[str],
+        type: str,
+        title: str,
+        label: str,
+        content: str,
+        see_also: Tuple[str, ...] = (),
+        children: Tuple[str, ...] = (),
+        handles: Optional[HandleTable] = None
+    ):
+        handles = handles if handles is not None else get_handle_table()
+        self.node_id = node_id
+        self.parent_id = parent_id
+        self.handle = handles.intern(node_id)
+        self.parent = handles.intern(parent_id) if parent_id else -1
+        self.type = type
+        self.title = title
+        self.label = label
+        self._content: Optional[str] = content
+        # Set by pack() when the content is moved into compressed blocks
+        self._blocks: Optional["ContentBlocks"] = None
+        self._span: Tuple[int, int, int] = (0, 0, 0)
+        self.see_also = see_also
+        self.children = children
+        digest = hashlib.blake2b(digest_size=8)
+        for part in (type, title, label, content, "\x1f".join(see_also)):
+            digest.update(part.encode("utf-8", "surrogatepass"))
+            digest.update(b"\x00")
+        self.content_hash = digest.digest()
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        return self._blocks.read(*self._span)
+
+    def pack(self, blocks: "ContentBlocks", block: int, start: int, end: int) -> None:
+        """Serve the content from characters ``start:end`` of a compressed block from now on"""
+        self._blocks = blocks
+        self._span = (block, start, end)
+        self._content = None
+
+    @property
+    def text(self) -> str:
+        """Indexed text: title, label and content"""
+        return f"{self.title}\n{self.label}\n{self.content}"
+
+    @property
+    def content_offset(self) -> int:
+        """Offset of ``content`` within ``text``"""
+        return len(self.title) + len(self.label) + 2
+
+
+def _node_id_of(item: Any) -> Optional[str]:
+    if isinstance(item, str):
+        return item
+    return item.get("node_id") or item.get("id")
+
+
+class Adjacency:
+    """Directed edges between handles in compressed sparse row form
+
+    ``keys`` holds the sorted distinct source handles, and the targets of
+    ``keys[i]`` are ``values[indptr[i]:indptr[i + 1]]`` (in insertion order,
+    without duplicates).
+    """
+
+    __slots__ = ("keys", "indptr", "values")
+
+    def __init__(self, edges: Iterable[Tuple[int, int]] = ()):
+        rows: Dict[int, Dict[int, None]] = {}
+        for source, target in edges:
+            rows.setdefault(source, {})[target] = None
+        self.keys = array("q", sorted(rows))
+        self.indptr = array("q", [0])
+        self.values = array("q")
+        for source in self.keys:
+            self.values.extend(rows[source])
+            self.indptr.append(len(self.values))
+
+    def neighbours(self, handle: int) -> array:
+        """Targets of the edges leaving ``handle``"""
+        i = bisect_left(self.keys, handle)
+        if i == len(self.keys) or self.keys[i] != handle:
+            return array("q")
+        return self.values[self.indptr[i]:self.indptr[i + 1]]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.keys, self.indptr, self.values))
+
+
+def filter_module_roots(roots: List[Dict[str, Any]], module_name: str) -> List[Dict[str, Any]]:
+    """The entries of a get_loaded_roots() list that belong to ``module_name``"""
+    handles = get_handle_table()
+    lo, hi = handles.module_range(module_name)
+    return [root for root in roots if root.get("id") and lo <= handles.intern(root["id"]) < hi]
+
+
+def module_root_ids(api, module_name: str) -> List[str]:
+    """Root node ids of a loaded module"""
+    res = api.get_loaded_roots()
+    if not res.get("success"):
+        return []
+    return [root["id"] for root in filter_module_roots(res["data"], module_name)]
+
+
+def _walk_snapshot(api, module_name: str, records: List[NodeRecord]) -> Iterator[None]:
+    """Walk a loaded module through the API into ``records``, yielding after every node"""
+    stack: List[Tuple[str, Optional[str], Dict[str, Any]]] = [
+        (root_id, None, {}) for root_id in reversed(module_root_ids(api, module_name))
+    ]
+    while stack:
+        node_id, parent_id, summary = stack.pop()
+        view = api.get_node_view(node_id=node_id, depth=0, include_content=True, include_see_also=True)
+        if not view.get("success"):
+            continue
+        data = view.get("data") or {}
+        node = dict(summary, **(data.get("node") or {}))
+        content = node.get("content")
+        if content is None:
+            formatted = data.get("formatted_content") or {}
+            content = next(iter(formatted.values()), "") if isinstance(formatted, dict) else str(formatted)
+
+        children_res = api.preview_children(node_id=node_id)
+        children = children_res.get("data", []) if children_res.get("success") else []
+        child_ids = tuple(cid for cid in (_node_id_of(child) for child in children) if cid)
+
+        records.append(NodeRecord(
+            node_id=node_id,
+            parent_id=parent_id,
+            type=node.get("type") or "unknown",
+            title=node.get("title") or "",
+            label=node.get("label") or "",
+            content=content or "",
+            see_also=tuple(_node_id_of(ref) for ref in node.get("see_also") or () if _node_id_of(ref)),
+            children=child_ids,
+        ))
+        yield
+        for child in reversed(children):
+            child_id = _node_id_of(child)
+            if child_id:
+                stack.append((child_id, node_id, child if isinstance(child, dict) else {}))
+
+
+def build_snapshot(api, module_name: str, progress: Optional[Callable[[int], None]] = None,
+                   api_lock: Optional[ApiLock] = None) -> List[NodeRecord]:
+    """Walk a loaded module through the API and return its nodes in document order
+
+    ``progress(nodes_walked)`` is called every ``SNAPSHOT_PROGRESS_EVERY`` nodes.
+    With ``api_lock``, the walk holds it for stretches of ``SNAPSHOT_YIELD_EVERY``
+    nodes, and tool calls are served in between.
+    """
+    records: List[NodeRecord] = []
+    walk = _walk_snapshot(api, module_name, records)
+    walking = True
+    while walking:
+        with api_lock.held(f"indexing {module_name}") if api_lock is not None else contextlib.nullcontext():
+            for _ in range(SNAPSHOT_YIELD_EVERY):
+                if next(walk, walk) is walk:
+                    walking = False
+                    break
+                if progress is not None and len(records) % SNAPSHOT_PROGRESS_EVERY == 0:
+                    progress(len(records))
+    return records
+
+
+async def build_snapshot_async(api, module_name: str, api_lock: Optional[ApiLock] = None) -> List[NodeRecord]:
+    """``build_snapshot`` on the event loop, yielding to it every ``SNAPSHOT_YIELD_EVERY`` nodes
+
+    With ``api_lock``, each stretch of nodes is walked holding it.
+    """
+    records: List[NodeRecord] = []
+    walk = _walk_snapshot(api, module_name, records)
+    walking = True
+    while walking:
+        if api_lock is not None:
+            await api_lock.acquire_async(f"indexing {module_name}")
+        try:
+            for _ in range(SNAPSHOT_YIELD_EVERY):
+                if next(walk, walk) is walk:
+                    walking = False
+                    break
+        finally:
+            if api_lock is not None:
+                api_lock.release()
+        if api_lock is not None:
+            await api_lock.yield_to_waiters_async()
+        else:
+            await asyncio.sleep(0)
+    return records
+
+
+class ModuleIndex:
+    """Snapshot and search structures of one module
+
+    Readers must hold ``lock`` while using the structures; ``apply`` holds it
+    while patching them.
+    """
+
+    def __init__(self, module_name: str, handles: Optional[HandleTable] = None,
+                 compression: Optional[ContentCompression] = None):
+        self.module_name = module_name
+        self.handles = handles if handles is not None else get_handle_table()
+        self.compression = compression or get_content_compression()
+        self.content_blocks: Optional[ContentBlocks] = None
+        self.nodes: Dict[int, NodeRecord] = {}
+        self.order = array("q")
+        self.postings: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+        self.ngrams: Dict[str, array] = {}
+        self.ancestors: Dict[int, Tuple[int, ...]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.links = Adjacency()
+        self.backlinks = Adjacency()
+        self.version = 0
+        self.last_update: Optional[Dict[str, Any]] = None
+        self.lock = threading.RLock()
+
+    # --- maintenance ---
+
+    def apply(self, records: List[NodeRecord]) -> Dict[str, Any]:
+        """Bring the index in line with a new snapshot, touching only what changed
+
+        Returns:
+            Counts of added, removed, changed, moved and unchanged nodes
+        """
+        start = time.perf_counter()
+        new_nodes = {record.handle: record for record in records}
+        with self.lock:
+            old_nodes = self.nodes
+            removed = [nid for nid in old_nodes if nid not in new_nodes]
+            added = [nid for nid in new_nodes if nid not in old_nodes]
+            changed = [
+                nid for nid, record in new_nodes.items()
+                if nid in old_nodes and old_nodes[nid].content_hash != record.content_hash
+            ]
+            moved = [
+                nid for nid, record in new_nodes.items()
+                if nid in old_nodes and old_nodes[nid].parent != record.parent
+            ]
+
+            dropped: Dict[str, Set[int]] = {}
+            for nid in removed + changed:
+                self._unindex(old_nodes[nid], dropped)
+            self._drop_ngrams(dropped)
+            for nid in added + changed:
+                self._index(new_nodes[nid])
+            for nid in removed:
+                self.ancestors.pop(nid, None)
+
+            self.nodes = new_nodes
+            self.order = array("q", (record.handle for record in records))
+            self._update_ancestors(added + moved)
+            self._update_links(records)
+            # Blocks holding only unchanged nodes are reused, the others are recompressed
+            previous = self.content_blocks
+            self.content_blocks = self.compression.pack(self.module_name, records, previous)
+            if previous is not None:
+                previous.release()
+            self.version += 1
+
+            delta = {
+                "added": len(added),
+                "removed": len(removed),
+                "changed": len(changed),
+                "moved": len(moved),
+                "unchanged": len(new_nodes) - len(added) - len(changed),
+                "duration_ms": (time.perf_counter() - start) * 1000,
+            }
+            self.last_update = delta
+        return delta
+
+    def _index(self, record: NodeRecord) -> None:
+        # Offsets are recorded here so snippets never rescan the node text
+        length = 0
+        for term, offsets in token_offsets(record.text).items():
+            self.postings.setdefault(term, {})[record.handle] = tuple(offsets)
+            length += len(offsets)
+        for gram in ngrams(record.text):
+            posting = self.ngrams.get(gram)
+            if posting is None:
+                self.ngrams[gram] = array("q", (record.handle,))
+            else:
+                posting.append(record.handle)
+        self.doc_lengths[record.handle] = length
+
+    def _unindex(self, record: NodeRecord, dropped: Dict[str, Set[int]]) -> None:
+        """Remove a node from the postings; its n-grams are collected in ``dropped`` for ``_drop_ngrams``"""
+        for term in set(tokenize(record.text)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(record.handle, None)
+                if not posting:
+                    del self.postings[term]
+        for gram in ngrams(record.text):
+            dropped.setdefault(gram, set()).add(record.handle)
+        self.doc_lengths.pop(record.handle, None)
+
+    def _drop_ngrams(self, dropped: Dict[str, Set[int]]) -> None:
+        # One pass per n-gram for all the nodes leaving it, instead of one scan per node
+        for gram, gone in dropped.items():
+            handles = self.ngrams.get(gram)
+            if handles is None:
+                continue
+            kept = array("q", (handle for handle in handles if handle not in gone))
+            if kept:
+                self.ngrams[gram] = kept
+            else:
+                del self.ngrams[gram]
+
+    def _update_ancestors(self, handles: Iterable[int]) -> None:
+        # Each subtree is rewritten once, from its topmost affected node
+        affected = set(handles)
+        intern = self.handles.intern
+        for handle in affected:
+            record = self.nodes[handle]
+            if record.parent in affected:
+                continue
+            parent = record.parent
+            base = (self.ancestors.get(parent, ()) + (parent,)) if parent in self.nodes else ()
+            stack = [(handle, base)]
+            while stack:
+                current, ancestors = stack.pop()
+                self.ancestors[current] = ancestors
+                child_ancestors = ancestors + (current,)
+                for child in self.nodes[current].children:
+                    child_handle = intern(child)
+                    if child_handle in self.nodes:
+                        stack.append((child_handle, child_ancestors))
+
+    def _update_links(self, records: List[NodeRecord]) -> None:
+        intern = self.handles.intern
+        edges = [(record.handle, intern(ref)) for record in records for ref in record.see_also]
+        self.links = Adjacency(edges)
+        self.backlinks = Adjacency((target, source) for source, target in edges)
+
+    # --- queries ---
+
+    def record(self, node_id: str) -> Optional[NodeRecord]:
+        """Snapshot of a node of this module by id"""
+        handle = self.handles.handle(node_id)
+        return self.nodes.get(handle) if handle is not None else None
+
+    def term_offsets(self, handle: int, term: str) -> Tuple[int, ...]:
+        """Start offsets of a (lowercased) token in the text of a node"""
+        return self.postings.get(term, {}).get(handle, ())
+
+    def is_under(self, node_id: str, ancestor_id: str) -> bool:
+        """True if ``node_id`` is ``ancestor_id`` or one of its descendants"""
+        handle, ancestor = self.handles.handle(node_id), self.handles.handle(ancestor_id)
+        if handle is None or ancestor is None:
+            return False
+        return handle == ancestor or ancestor in self.ancestors.get(handle, ())
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "module": self.module_name,
+                "nodes": len(self.nodes),
+                "terms": len(self.postings),
+                "ngrams": len(self.ngrams),
+                "links": len(self.links),
+                "version": self.version,
+                "last_update": dict(self.last_update) if self.last_update else None,
+            }
+
+
+class IndexStore:
+    """Module indexes of the current session, built on first use and patched on reload
+
+    ``get`` builds a missing or stale index on the spot. Callers on the
+    request path that can do without an index (snippets) use ``ready`` and
+    ``schedule`` instead, so the first use of a module does not walk it
+    while the client waits.
+
+    Args:
+        api_lock: Lock serializing the calls against the session's API instance,
+            taken by the walks that do not run within a tool call.
+    """
+
+    def __init__(self, api_lock: Optional[ApiLock] = None):
+        self._api_lock = api_lock or ApiLock()
+        self._indexes: Dict[str, ModuleIndex] = {}
+        self._stale: Set[str] = set()
+        # Bumped by invalidate(), so a build that started before it does not mark the index fresh
+        self._epochs: Dict[str, int] = {}
+        self._scheduled: Dict[str, "asyncio.Task"] = {}
+        # One snapshot walk per module at a time (background threads and the event loop)
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api, module_name: str) -> ModuleIndex:
+        """Return the index of a loaded module, (re)building it from ``api`` if needed"""
+        index = self.ready(module_name)
+        if index is not None:
+            return index
+        self._build(api, module_name, force=False)
+        return self._indexes[module_name]
+
+    def peek(self, module_name: str) -> Optional[ModuleIndex]:
+        """Return the index of a module if one exists, without building it"""
+        with self._lock:
+            return self._indexes.get(module_name)
+
+    def ready(self, module_name: str) -> Optional[ModuleIndex]:
+        """Return the index of a module if it exists and is up to date, without building it"""
+        with self._lock:
+            if module_name in self._stale:
+                return None
+            return self._indexes.get(module_name)
+
+    def refresh(self, api, module_name: str, progress: Optional[Callable[[int], None]] = None,
+                api_lock: Optional[ApiLock] = None) -> Dict[str, Any]:
+        """Snapshot a module from ``api`` and apply the difference to its index
+
+        Background threads pass the session's ``api_lock``: the walk then takes
+        it for stretches of nodes, and does not hold the module's build lock,
+        which a tool call holding the API lock may be waiting for.
+        """
+        if api_lock is None:
+            return self._build(api, module_name, progress, force=True)
+        self._cancel_scheduled(module_name)
+        epoch = self._epoch(module_name)
+        records = build_snapshot(api, module_name, progress, api_lock)
+        with self._build_lock(module_name):
+            return self._apply(module_name, records, epoch)
+
+    def prepare(self, api, module_name: str) -> ModuleIndex:
+        """``get`` for background threads: a walk takes the session's API lock in stretches"""
+        index = self.ready(module_name)
+        if index is not None:
+            return index
+        self.refresh(api, module_name, api_lock=self._api_lock)
+        return self.peek(module_name)
+
+    def _build(self, api, module_name: str, progress: Optional[Callable[[int], None]] = None,
+               force: bool = True) -> Optional[Dict[str, Any]]:
+        """Walk and apply a snapshot, one build per module at a time
+
+        A caller that waited for another build of the module returns without
+        walking again, unless ``force`` (a new API instance to diff against).
+        """
+        # A background walk of the module stops at its next yield; this build supersedes it
+        self._cancel_scheduled(module_name)
+        with self._build_lock(module_name):
+            if not force and self.ready(module_name) is not None:
+                return None
+            epoch = self._epoch(module_name)
+            records = build_snapshot(api, module_name, progress)
+            return self._apply(module_name, records, epoch)
+
+    def _build_lock(self, module_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._build_locks.get(module_name)
+            if lock is None:
+                lock = self._build_locks[module_name] = threading.Lock()
+            return lock
+
+    def schedule(self, api, module_name: str) -> None:
+        """Build or refresh the index of a module in the background, unless already under way
+
+        Must be called from the event loop. The snapshot is walked by a task of
+        the loop in stretches of ``SNAPSHOT_YIELD_EVERY`` nodes, each holding the
+        session's API lock, so tool calls are served in between and never
+        overlap with the walk. The patch of the index, which needs no API,
+        runs in a thread.
+        """
+        with self._lock:
+            if module_name in self._scheduled:
+                return
+            task = asyncio.get_running_loop().create_task(self._refresh_async(api, module_name))
+            self._scheduled[module_name] = task
+        task.add_done_callback(lambda task: self._scheduled_done(module_name, task))
+
+    async def _refresh_async(self, api, module_name: str) -> None:
+        # The walk does not hold the build lock: a synchronous build on the loop
+        # thread would wait for it forever. Such builds cancel this task instead.
+        epoch = self._epoch(module_name)
+        records = await build_snapshot_async(api, module_name, self._api_lock)
+        await asyncio.to_thread(self._apply_scheduled, module_name, records, epoch)
+
+    def _apply_scheduled(self, module_name: str, records: List[NodeRecord], epoch: int) -> None:
+        with self._build_lock(module_name):
+            if self.ready(module_name) is None:
+                self._apply(module_name, records, epoch)
+
+    def _cancel_scheduled(self, module_name: str) -> None:
+        with self._lock:
+            task = self._scheduled.get(module_name)
+        if task is not None:
+            try:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # Its loop is closed
+                pass
+
+    def _scheduled_done(self, module_name: str, task: "asyncio.Task") -> None:
+        with self._lock:
+            self._scheduled.pop(module_name, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("index: background build of %s failed: %s", module_name, task.exception())
+
+    def _epoch(self, module_name: str) -> int:
+        with self._lock:
+            return self._epochs.get(module_name, 0)
+
+    def _apply(self, module_name: str, records: List[NodeRecord], epoch: int) -> Dict[str, Any]:
+        with self._lock:
+            index = self._indexes.get(module_name)
+        # A new index is published once built, so readers do not wait on its lock meanwhile
+        new = index is None
+        if new:
+            index = ModuleIndex(module_name)
+        delta = index.apply(records)
+        with self._lock:
+            if new:
+                self._indexes[module_name] = index
+            if self._epochs.get(module_name, 0) == epoch:
+                self._stale.discard(module_name)
+        logger.info("index: %s updated (+%d -%d ~%d moved %d, %d unchanged) in %.1f ms",
+                    module_name, delta["added"], delta["removed"], delta["changed"],
+                    delta["moved"], delta["unchanged"], delta["duration_ms"])
+        return delta
+
+    def invalidate(self, module_names: Optional[Iterable[str]] = None) -> None:
+        """Mark indexes as stale; they are diffed against a new snapshot on next use"""
+        with self._lock:
+            names = list({**self._indexes, **self._scheduled} if module_names is None else module_names)
+            self._stale.update(names)
+            for module_name in names:
+                self._epochs[module_name] = self._epochs.get(module_name, 0) + 1
+
+    def on_module_reload(self, session_id: Any, module_names: Set[str], api) -> None:
+        """ModuleReloader listener: patch the indexes of reloaded modules right away"""
+        for module_name in module_names:
+            if self.peek(module_name) is not None:
+                self.refresh(api, module_name, api_lock=self._api_lock)
+
+    def compression_stats(self) -> Dict[str, Any]:
+        """Memory and cache stats of the compressed node contents"""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        compression = get_content_compression()
+        return compression.stats(index.content_blocks for index in indexes if index.content_blocks is not None)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            indexes = list(self._indexes.values())
+            stale = set(self._stale)
+        return [dict(index.stats(), stale=index.module_name in stale) for index in indexes]
+
+
+# Global index store instance
+_index_store: Optional[IndexStore] = None
+_index_store_lock = threading.Lock()
+
+
+def get_index_store() -> IndexStore:
+    """Get the global index store instance"""
+    global _index_store
+
+    if _index_store is None:
+        with _index_store_lock:
+            if _index_store is None:
+                _index_store = IndexStore(api_lock=get_session_manager().get_api_lock(0))
+
+    return _index_store
@@ -9,73 +9,262 @@ allowing access to the KERAG knowledge base via the MCP protocol.
 import os
 import sys
 import argparse
+import asyncio
+import functools
 import logging
+import re
+import time
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
-from mcp.server.fastmcp import FastMCP
 from .session_manager import get_session_manager
-from . import format_response
-
-# Configure global logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
+from . import compact, format_response
+from .metrics import get_metrics_registry
+from .profiling import get_profiler, phase
+from .request_log import configure_logging, get_request_log
+from .admission import Overloaded, get_admission_controller
+from .apilock import SessionBusy
+from .archive import get_archive_store
+from .catalog import get_module_catalog
+from .deadline import DeadlineExceeded, current_deadline, expired, get_deadline_manager, truncate
+from .fusion import reciprocal_rank_fusion
+from .graph import get_related_finder
+from .reload import get_module_reloader
+from .handles import get_handle_table
+from .index import filter_module_roots, get_index_store
+from .loadjobs import get_load_jobs
+from .multisearch import get_multi_searcher
+from .prefetch import get_prefetcher
+from .resolve import get_target_resolver
+from .singleflight import get_single_flight
+from .snippets import get_snippet_engine
+from .vectors import get_vector_store
+
+# Handlers are attached by configure_logging() in main()
 logger = logging.getLogger("kerag_mcp")
 
-# Parse command line arguments (needs to be before FastMCP initialization)
-parser = argparse.ArgumentParser(description="Start KERAG MCP Server", add_help=False)
-parser.add_argument(
-    "--port",
-    type=int,
-    default=5669,
-    help="Server port (default: 5669(K-N-O-W))"
-)
-parser.add_argument(
-    "--host",
-    type=str,
-    default="0.0.0.0",
-    help="Server host (default: 0.0.0.0)"
-)
-parser.add_argument(
-    "--transport",
-    type=str,
-    choices=["stdio", "sse", "streamable-http"],
-    default="stdio",
-    help="Transport protocol to use (default: stdio)"
-)
-# Keep -h option for help
-parser.add_argument(
-    "-h", "--help",
-    action="store_true",
-    help="Show this help message and exit"
-)
-
-# Parse only known args, ignore unknown ones (used internally by mcp.run)
-args, unknown = parser.parse_known_args()
-
-# Show help message and exit
-if args.help:
-    parser.print_help()
-    sys.exit(0)
-
-# Initialize FastMCP server (using command line arguments)
-mcp = FastMCP("KERAG - Knowledge Explorer Retrieval Augmented Generation", port=args.port, host=args.host)
+SERVER_NAME = "KERAG - Knowledge Explorer Retrieval Augmented Generation"
+
+# Tool functions collected by instrumented_tool(), registered by create_server()
+_tools: List[Any] = []
 
 # Global session manager
 session_manager = get_session_manager()
 
-print(f"Starting KERAG MCP Server...")
-print(f"Host: {args.host}")
-print(f"Port: {args.port}")
+# Serializes the KERAGAPI calls of session 0 across tools and background work
+api_lock = session_manager.get_api_lock(0)
+
+# Tools that never call KERAGAPI while serving, and must not wait for background work
+_UNLOCKED_TOOLS = frozenset(("knowledge_load_status", "knowledge_metrics", "knowledge_profile"))
+
+# Global per-tool metrics
+metrics_registry = get_metrics_registry()
+
+# Global slow-call profiler (off unless KERAG_MCP_PROFILE is set or knowledge_profile enables it)
+profiler = get_profiler()
+
+# Global structured request log (off unless KERAG_MCP_REQUEST_LOG is set)
+request_log = get_request_log()
+
+# Global cache of installed module metadata
+module_catalog = get_module_catalog()
+
+# Global reader of modules installed as .tar archives (KERAG_MCP_ARCHIVES=0 disables it)
+archive_store = get_archive_store()
+
+# Global hot reloader of modules updated on disk (KERAG_MCP_HOT_RELOAD=0 disables it)
+module_reloader = get_module_reloader()
+
+# Global per-module snapshots and search indexes, patched when modules are reloaded
+index_store = get_index_store()
+module_reloader.add_listener(index_store.on_module_reload)
+snippet_engine = get_snippet_engine()
+multi_searcher = get_multi_searcher()
+related_finder = get_related_finder()
+prefetcher = get_prefetcher()
+handle_table = get_handle_table()
+target_resolver = get_target_resolver()
+single_flight = get_single_flight()
+metrics_registry.add_collector(single_flight.prometheus_samples)
+module_reloader.add_listener(prefetcher.on_module_reload)
+metrics_registry.add_collector(prefetcher.prometheus_samples)
+
+# Global admission control across MCP clients (on for the HTTP transports, see main())
+admission = get_admission_controller()
+metrics_registry.add_collector(admission.prometheus_samples)
+
+# Global per-call deadlines (KERAG_MCP_DEADLINE_MS=0 disables them)
+deadlines = get_deadline_manager()
+metrics_registry.add_collector(deadlines.prometheus_samples)
+
+# Global background module loads (knowledge_load(background=True))
+load_jobs = get_load_jobs()
+load_jobs.add_listener(prefetcher.on_module_reload)
+
+# Global vectors for knowledge_search(mode="semantic"), built when modules are loaded
+vector_store = get_vector_store()
+module_reloader.add_listener(vector_store.on_module_reload)
+load_jobs.add_listener(vector_store.on_module_reload)
+
+# Seconds between two progress checks while knowledge_load_status waits for a job
+LOAD_STATUS_POLL_S = 0.1
+
+# knowledge_search modes
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser"""
+    parser = argparse.ArgumentParser(description="Start KERAG MCP Server", add_help=False)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=5669,
+        help="Server port (default: 5669(K-N-O-W))"
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="0.0.0.0",
+        help="Server host (default: 0.0.0.0)"
+    )
+    parser.add_argument(
+        "--transport",
+        type=str,
+        choices=["stdio", "sse", "streamable-http"],
+        default="stdio",
+        help="Transport protocol to use (default: stdio)"
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default=os.environ.get("KERAG_MCP_LOG_LEVEL"),
+        help="Log level (default: WARNING for stdio, INFO otherwise; env KERAG_MCP_LOG_LEVEL)"
+    )
+    # Keep -h option for help
+    parser.add_argument(
+        "-h", "--help",
+        action="store_true",
+        help="Show this help message and exit"
+    )
+    return parser
+
+
+def instrumented_tool():
+    """Collect a tool for create_server(), recording latency, response size and errors
+
+    Calls first pass the admission controller (when enabled), which may
+    reject them with an "overloaded" error. Slow calls are also profiled when
+    the profiler is enabled, identical concurrent calls of the coalesced
+    tools share one execution, and every call runs under a deadline (see
+    deadline.py). The tool itself runs holding the session's API lock (see
+    apilock.py), or fails with "session busy" if it is not free in time.
+    """
+    def decorator(fn):
+        tool_name = fn.__name__
+        run = fn if tool_name in _UNLOCKED_TOOLS else _serialized(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            request_id = request_log.next_request_id() if request_log.enabled else None
+            ticket = deadline = profiled = None
+            result = None
+            error = False
+            cancelled = False
+            try:
+                if admission.enabled:
+                    ticket = await admission.admit(_client_key(), tool_name)
+                deadline = deadlines.start(tool_name) if deadlines.enabled else None
+                profiled = profiler.start(tool_name, kwargs) if profiler.enabled else None
+                if single_flight.covers(tool_name):
+                    result = await single_flight.run(run, args, kwargs)
+                else:
+                    result = await run(*args, **kwargs)
+                error = format_response.is_error(result)
+                return result
+            except (Overloaded, SessionBusy) as e:
+                error = True
+                if kwargs.get("format") == compact.COMPACT:
+                    result = compact.error(str(e))
+                else:
+                    result = format_response.format_error(str(e))
+                return result
+            except asyncio.CancelledError:
+                # MCP notifications/cancelled: the client gave up on this call
+                cancelled = True
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                size = len(result.encode("utf-8")) if isinstance(result, str) else 0
+                metrics_registry.record(tool_name, elapsed, size, error)
+                if profiled is not None:
+                    profiler.finish(profiled, elapsed)
+                if request_id is not None:
+                    request_log.record(request_id, tool_name, elapsed, size, error, kwargs)
+                if deadline is not None:
+                    deadlines.finish(deadline, cancelled)
+                if ticket is not None:
+                    admission.release(ticket)
+
+        _tools.append(wrapper)
+        return wrapper
+    return decorator
+
+
+def _serialized(fn):
+    """``fn`` running with the session's API lock held, waiting for it at most until the deadline"""
+    @functools.wraps(fn)
+    async def serialized(*args, **kwargs):
+        deadline = current_deadline()
+        async with api_lock.hold(fn.__name__, deadline.remaining() if deadline is not None else None):
+            return await fn(*args, **kwargs)
+    return serialized
+
+
+async def prometheus_metrics(request):
+    """Prometheus scrape endpoint (only served by the sse/streamable-http transports)"""
+    from starlette.responses import PlainTextResponse
+
+    return PlainTextResponse(
+        metrics_registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def _client_key() -> Any:
+    """Identity of the MCP client session making the current request ('local' outside a request)"""
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+        return id(request_ctx.get().session)
+    except (ImportError, LookupError):
+        return "local"
+
+
+def _progress_sender():
+    """``send(progress, total, message)`` for the MCP request being served
+
+    None outside a request or when the client did not ask for progress
+    (no progress token).
+    """
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+        ctx = request_ctx.get()
+    except (ImportError, LookupError):
+        return None
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+    return functools.partial(ctx.session.send_progress_notification, token, related_request_id=ctx.request_id)
 
 
 # === Session Management Tools ===
 
-@mcp.tool()
+@instrumented_tool()
 async def knowledge_connect(
     local_root: Optional[str] = None,
     global_root: Optional[str] = None,
@@ -117,9 +306,8 @@ async def knowledge_connect(
         RuntimeError: If session cannot be established.
     """
     session_id = 0
-    local_root_str = f", local_root={local_root}" if local_root else ""
-    global_root_str = f", global_root={global_root}" if global_root else ""
-    logger.info(f"knowledge_connect: Establishing session, session_id={session_id}{local_root_str}{global_root_str}")
+    logger.info("knowledge_connect: Establishing session, session_id=%s, local_root=%s, global_root=%s",
+                session_id, local_root, global_root)
 
     # Create or update session
     api = session_manager.create_session(
@@ -128,6 +316,11 @@ async def knowledge_connect(
         global_root=global_root,
         lang=lang
     )
+    module_reloader.track_session(session_id, api)
+    # The new API instance may serve other module versions; diff on next use
+    index_store.invalidate()
+    prefetcher.invalidate()
+    catalog_key = (local_root, global_root)
 
     # If init_with parameter is present, load specified modules
     initialized_modules = []
@@ -135,14 +328,18 @@ async def knowledge_connect(
         modules = init_with.split()
         for module_name in modules:
             try:
-                result = api.load_module(module_name)
+                with phase("api"):
+                    result = archive_store.load_module(api, module_name)
                 if result.get("success"):
                     initialized_modules.append(module_name)
-                    logger.info(f"knowledge_connect: Successfully loaded module {module_name}")
+                    session_manager.mark_modules_loaded(session_id, [module_name])
+                    logger.info("knowledge_connect: Successfully loaded module %s", module_name)
                 else:
-                    logger.warning(f"knowledge_connect: Failed to load module {module_name}, error={result.get('error')}")
+                    logger.warning("knowledge_connect: Failed to load module %s, error=%s", module_name, result.get('error'))
             except Exception as e:
-                logger.error(f"knowledge_connect: Exception loading module {module_name}, error={str(e)}")
+                logger.error("knowledge_connect: Exception loading module %s, error=%s", module_name, e)
+
+        vector_store.warm(api, initialized_modules)
 
         # After loading modules, show loaded roots
         roots_res = api.get_loaded_roots()
@@ -153,65 +350,31 @@ async def knowledge_connect(
             roots_text = ""
     else:
         # If no modules specified, show all available modules
-        list_result = api.list_modules(scope="both")
+        list_result = module_catalog.list_modules(api, catalog_key, scope="both")
         if list_result.get("success"):
             data = list_result.get("data", {})
-            modules_data = data.get("modules", {})
-            loaded_modules = set(data.get("loaded_modules", []))
-
-            def format_table(modules_dict, title):
-                if not modules_dict:
-                    return []
-
-                rows = []
-                # Header - use Y/N format
-                rows.append(["Name", "Version", "Loaded (Y/N)", "Description"])
-
-                for name in sorted(modules_dict.keys()):
-                    info = modules_dict[name]
-                    is_loaded = "Y" if name in loaded_modules else "N"
-                    ver_str = info.get("version", "-") or "-"
-                    desc_str = info.get("description", "-") or "-"
-                    rows.append([name, ver_str, is_loaded, desc_str])
-
-                # Calculate widths
-                col_widths = [0, 0, 0, 0]
-                for row in rows:
-                    for i, col in enumerate(row):
-                        col_widths[i] = max(col_widths[i], len(str(col)))
-
-                # Add spacing
-                col_widths = [w + 4 for w in col_widths]
-
-                lines = [title]
-                # Header line
-                header = rows[0]
-                lines.append(f"{header[0]:<{col_widths[0]}}{header[1]:<{col_widths[1]}}{header[2]:<{col_widths[2]}}{header[3]}")
-
-                # Data lines
-                for row in rows[1:]:
-                     lines.append(f"{row[0]:<{col_widths[0]}}{row[1]:<{col_widths[1]}}{row[2]:<{col_widths[2]}}{row[3]}")
-
-                lines.append("")
-                return lines
-
-            output_lines = []
-            if "local" in modules_data and modules_data["local"]:
-                output_lines.extend(format_table(modules_data["local"], "Available Local Modules:"))
-
-            if "global" in modules_data and modules_data["global"]:
-                output_lines.extend(format_table(modules_data["global"], "Available Global Modules:"))
-
-            if output_lines:
-                roots_text = "\n".join(output_lines)
-            else:
-                roots_text = "\nNo modules found"
+            session_manager.mark_modules_loaded(session_id, data.get("loaded_modules", []))
+            loaded_modules = session_manager.get_loaded_modules(session_id)
+
+            def render():
+                modules_data = data.get("modules", {})
+                output_lines = []
+                output_lines.extend(format_response.format_module_table(
+                    modules_data.get("local"), loaded_modules, "Available Local Modules:"))
+                output_lines.extend(format_response.format_module_table(
+                    modules_data.get("global"), loaded_modules, "Available Global Modules:"))
+                return "\n".join(output_lines) if output_lines else "\nNo modules found"
+
+            roots_text = module_catalog.rendered(
+                catalog_key, ("connect", frozenset(loaded_modules)), render)
         else:
             roots_text = ""
         logger.info("knowledge_connect: No modules specified, displaying available modules")
 
     status_res = api.get_status()
-    logger.info(f"knowledge_connect: Session established successfully, loaded modules count={len(initialized_modules)}")
+    session_manager.get_history(session_id).visit(
+        (status_res.get("data") or {}).get("current_node") or "::ROOT")
+    logger.info("knowledge_connect: Session established successfully, loaded modules count=%d", len(initialized_modules))
 
     data = {
         "session_id": session_id,
@@ -234,8 +397,8 @@ async def knowledge_connect(
 
 # === Module Management Tools ===
 
-@mcp.tool()
-async def knowledge_list(scope: str = "both") -> str:
+@instrumented_tool()
+async def knowledge_list(scope: str = "both", format: str = "text") -> str:
     """
     List all available (installed) knowledge modules.
 
@@ -248,6 +411,9 @@ async def knowledge_list(scope: str = "both") -> str:
             - 'both': Local and global modules (default)
             - 'local': Only local modules (./.kerag_modules)
             - 'global': Only global modules (~/.kerag_modules)
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON: per scope one row per module (name, version, loaded, description),
+            the field names given once, and the local and global root paths.
 
     Returns:
         Formatted table with columns:
@@ -274,82 +440,55 @@ async def knowledge_list(scope: str = "both") -> str:
     """
     if not scope:
         scope = "both"
-    logger.info(f"knowledge_list: Listing all module info, scope={scope}")
+    logger.info("knowledge_list: Listing all module info, scope=%s", scope)
 
     api = session_manager.get_session(0)
     if not api:
         raise RuntimeError("Session not found, please call knowledge_connect first")
 
-    result = api.list_modules(scope=scope)
+    config = session_manager.get_session_metadata(0)["config"]
+    catalog_key = (config["local_root"], config["global_root"])
+    result = module_catalog.list_modules(api, catalog_key, scope=scope)
 
     if not result.get("success"):
         return format_response.format_error(f"Failed to get module list: {result.get('error')}")
 
     data = result.get("data", {})
-    modules_data = data.get("modules", {})
-    output_lines = []
+    session_manager.mark_modules_loaded(0, data.get("loaded_modules", []))
+    loaded_modules = session_manager.get_loaded_modules(0)
+    if format == compact.COMPACT:
+        return module_catalog.rendered(catalog_key, ("list-compact", scope, frozenset(loaded_modules)),
+                                       lambda: compact.module_list(data, loaded_modules))
 
-    loaded_modules = set(data.get("loaded_modules", []))
+    def render():
+        modules_data = data.get("modules", {})
+        output_lines = []
+        output_lines.extend(format_response.format_module_table(modules_data.get("local"), loaded_modules, "Local Modules:"))
+        output_lines.extend(format_response.format_module_table(modules_data.get("global"), loaded_modules, "Global Modules:"))
 
-    def format_table(modules_dict, title):
-        if not modules_dict:
-            return []
+        if not output_lines:
+            output_lines.append("No modules found")
 
-        rows = []
-        # Header - use Y/N format
-        rows.append(["Name", "Version", "Loaded (Y/N)", "Description"])
+        output_lines.append(f"Local Root: {data.get('local_root', 'N/A')}")
+        output_lines.append(f"Global Root: {data.get('global_root', 'N/A')}")
 
-        for name in sorted(modules_dict.keys()):
-            info = modules_dict[name]
-            is_loaded = "Y" if name in loaded_modules else "N"
-            ver_str = info.get("version", "-") or "-"
-            desc_str = info.get("description", "-") or "-"
-            rows.append([name, ver_str, is_loaded, desc_str])
+        return "\n".join(output_lines)
 
-        # Calculate widths
-        col_widths = [0, 0, 0, 0]
-        for row in rows:
-            for i, col in enumerate(row):
-                col_widths[i] = max(col_widths[i], len(str(col)))
+    return module_catalog.rendered(catalog_key, ("list", scope, frozenset(loaded_modules)), render)
 
-        # Add spacing
-        col_widths = [w + 4 for w in col_widths]
 
-        lines = [title]
-        # Header line
-        header = rows[0]
-        lines.append(f"{header[0]:<{col_widths[0]}}{header[1]:<{col_widths[1]}}{header[2]:<{col_widths[2]}}{header[3]}")
-
-        # Data lines
-        for row in rows[1:]:
-             lines.append(f"{row[0]:<{col_widths[0]}}{row[1]:<{col_widths[1]}}{row[2]:<{col_widths[2]}}{row[3]}")
-
-        lines.append("")
-        return lines
-
-    if "local" in modules_data and modules_data["local"]:
-        output_lines.extend(format_table(modules_data["local"], "Local Modules:"))
-
-    if "global" in modules_data and modules_data["global"]:
-        output_lines.extend(format_table(modules_data["global"], "Global Modules:"))
-
-    if not output_lines:
-        output_lines.append("No modules found")
-
-    output_lines.append(f"Local Root: {data.get('local_root', 'N/A')}")
-    output_lines.append(f"Global Root: {data.get('global_root', 'N/A')}")
-
-    return "\n".join(output_lines)
-
-
-@mcp.tool()
-async def knowledge_modules() -> str:
+@instrumented_tool()
+async def knowledge_modules(format: str = "text") -> str:
     """
     List all currently loaded modules with detailed information.
 
     Shows only modules that have been loaded into the current session
     via knowledge_connect(init_with=...) or knowledge_load().
 
+    Args:
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON list of the loaded modules with their file counts.
+
     Returns:
         Formatted list with detailed module information including:
         - Module name and version
@@ -379,20 +518,28 @@ async def knowledge_modules() -> str:
 
     res = api.get_all_modules()
     if not res.get("success"):
+        if format == compact.COMPACT:
+            return compact.error(f"Failed to get modules: {res.get('error')}")
         return format_response.format_error(f"Failed to get modules: {res.get('error')}")
 
     modules = [m for m in res["data"].get("modules", []) if m["loaded"]]
+    if format == compact.COMPACT:
+        return compact.loaded_modules(modules)
     return format_response.format_modules_list(modules)
 
 
-@mcp.tool()
-async def knowledge_roots() -> str:
+@instrumented_tool()
+async def knowledge_roots(format: str = "text") -> str:
     """
     Get root nodes of all currently loaded modules.
 
     Root nodes are the entry points (top-level nodes) of each loaded module.
     Use these to start exploring the knowledge base structure.
 
+    Args:
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON map of root node id to title.
+
     Returns:
         Formatted list of root nodes showing:
         - Node title (human-readable name)
@@ -419,13 +566,15 @@ async def knowledge_roots() -> str:
         raise RuntimeError("Session not found")
 
     res = api.get_loaded_roots()
+    if format == compact.COMPACT:
+        return compact.node_titles(res, "Failed to get root nodes")
     if not res.get("success"):
         return format_response.format_error(f"Failed to get root nodes: {res.get('error')}")
     return format_response.format_roots_list(res["data"])
 
 
-@mcp.tool()
-async def knowledge_load(module_name: str) -> str:
+@instrumented_tool()
+async def knowledge_load(module_name: str, format: str = "text", background: bool = False) -> str:
     """
     Load a knowledge module into the session.
 
@@ -435,11 +584,20 @@ async def knowledge_load(module_name: str) -> str:
     Args:
         module_name: Name of the module to load (e.g., 'python-guide').
             Use knowledge_list() to see available module names.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON with the module name, file and node counts and its root ids
+            (the job record with background=True).
+        background: Return a job id immediately and load (and index) the
+            module in the background (default: False). Other tools wait
+            while the module's files are parsed and are served while it is
+            indexed; follow the job with knowledge_load_status. Use this for
+            large modules that take longer than the client's tool timeout.
 
     Returns:
         Loading confirmation plus root nodes of the loaded module:
         - Success/error message
         - List of root node IDs for the newly loaded module
+        With background=True: the job id and its current state.
 
     Typical Workflow:
         1. knowledge_list()  # Find available modules
@@ -454,6 +612,7 @@ async def knowledge_load(module_name: str) -> str:
     See Also:
         knowledge_list - Find available modules to load
         knowledge_roots - View root nodes after loading
+        knowledge_load_status - Follow a background load
         knowledge_connect(init_with=...) - Load modules at startup
 
     Raises:
@@ -463,29 +622,119 @@ async def knowledge_load(module_name: str) -> str:
     if not api:
         raise RuntimeError("Session not found")
 
-    load_result = api.load_module(module_name)
-    result_text = format_response.format_load_result(load_result)
+    if background:
+        job = load_jobs.start(0, module_name)
+        if format == compact.COMPACT:
+            return compact.load_job(job.to_dict())
+        return format_response.format_load_job(job.to_dict())
 
+    with phase("api"):
+        load_result = archive_store.load_module(api, module_name)
+
+    module_roots = []
     if load_result.get("success"):
+        session_manager.mark_modules_loaded(0, [module_name])
+        index_store.invalidate([module_name])
+        prefetcher.invalidate()
+        vector_store.warm(api, [module_name])
         # After successful load, filter roots for this module
         roots_res = api.get_loaded_roots()
         if roots_res.get("success"):
-            # Filter roots that start with module_name/ or module_name::
-            module_roots = [
-                root for root in roots_res["data"]
-                if root.get("id", "").startswith(f"{module_name}/") or
-                   root.get("id", "").startswith(f"{module_name}::")
-            ]
-            if module_roots:
-                roots_text = format_response.format_roots_list(module_roots)
-                result_text += "\n" + roots_text
+            # Roots of this module: a handle range check, no id prefix scan
+            module_roots = filter_module_roots(roots_res["data"], module_name)
+
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.load_result(load_result, [root.get("id") for root in module_roots])
+        result_text = format_response.format_load_result(load_result)
+        if module_roots:
+            roots_text = format_response.format_roots_list(module_roots)
+            result_text += "\n" + roots_text
+
+    return result_text
+
+
+@instrumented_tool()
+async def knowledge_load_status(job_id: Optional[str] = None, wait_s: float = 0, format: str = "text") -> str:
+    """
+    Show the progress of background module loads.
+
+    Args:
+        job_id: Job id returned by knowledge_load(background=True). If not
+            provided, lists recent jobs.
+        wait_s: Wait up to this many seconds for the job to finish
+            (default: 0, return the current state). While waiting, progress
+            is sent as MCP progress notifications (files loaded, nodes
+            indexed) if the client requested them.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON job record (state and progress counters), with the module's
+            root ids once it is loaded.
+
+    Returns:
+        Job state and counters; once a job is done, the load result and the
+        root nodes of the loaded module as knowledge_load shows them.
+
+    Typical Workflow:
+        1. knowledge_load("big-module", background=True)  # -> job id
+        2. knowledge_search(...)  # Loaded modules keep working meanwhile
+        3. knowledge_load_status("load-1", wait_s=30)  # Wait for completion
 
+    See Also:
+        knowledge_load - Start a background load
+    """
+    if job_id is None:
+        jobs = [job.to_dict() for job in load_jobs.jobs()]
+        if format == compact.COMPACT:
+            return compact.dumps(jobs)
+        return format_response.format_load_jobs(jobs)
+
+    job = load_jobs.get(job_id)
+    if job is None:
+        if format == compact.COMPACT:
+            return compact.error(f"Load job not found: {job_id}")
+        return format_response.format_error(f"Load job not found: {job_id}")
+
+    if wait_s > 0 and not job.finished:
+        send = _progress_sender()
+        deadline = time.monotonic() + wait_s
+        last = -1.0
+        while True:
+            finished = job.finished
+            progress, total, message = job.progress()
+            # Progress notifications must increase (a retried job starts over)
+            if send is not None and progress > last:
+                await send(progress, total, message)
+                last = progress
+            if finished or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(LOAD_STATUS_POLL_S)
+
+    status = job.to_dict()
+    roots: List[Dict[str, Any]] = []
+    if job.finished and job.result is not None and job.result.get("success"):
+        # Not serialized by instrumented_tool: it waits for background work
+        deadline = current_deadline()
+        async with session_manager.get_api_lock(job.session_id).hold(
+                "knowledge_load_status", deadline.remaining() if deadline is not None else None):
+            api = session_manager.peek_session(job.session_id)
+            roots_res = api.get_loaded_roots() if api else {}
+        if roots_res.get("success"):
+            roots = filter_module_roots(roots_res["data"], job.module_name)
+
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.load_job(status, [root.get("id") for root in roots])
+        result_text = format_response.format_load_job(status)
+        if job.finished and job.result is not None:
+            result_text += "\n\n" + format_response.format_load_result(job.result)
+        if roots:
+            result_text += "\n" + format_response.format_roots_list(roots)
     return result_text
 
 
 # === Node Query Tools ===
 
-@mcp.tool()
+@instrumented_tool()
 async def knowledge_search(
     query: str,
     search_under: Optional[str] = None,
@@ -494,7 +743,9 @@ async def knowledge_search(
     whole_word: bool = False,
     case_sensitive: bool = False,
     use_regex: bool = False,
-    with_parents: bool = True
+    with_parents: bool = True,
+    mode: str = "lexical",
+    format: str = "text"
 ) -> str:
     """
     Search for nodes across all loaded modules.
@@ -514,6 +765,19 @@ async def knowledge_search(
         case_sensitive: Case-sensitive matching (default: False).
         use_regex: Treat query as regex pattern (default: False).
         with_parents: Include parent node info in results (default: True).
+        mode: How nodes are matched:
+            - 'lexical': Text or regex matching (default).
+            - 'semantic': Ranked by similarity of word and word-part vectors,
+              for concepts the nodes may phrase differently. whole_word,
+              case_sensitive, use_regex and order do not apply.
+            - 'hybrid': Both, one after the other, fused into one ranking
+              (nodes found by both first); each result shows its rank in
+              either list. If one of them fails, the other's results are
+              returned. whole_word, case_sensitive and use_regex apply to
+              the lexical part.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON with the query, the total and one record per match: id, parent
+            id and excerpt (title instead of excerpt for sections).
 
     Returns:
         Formatted search results showing:
@@ -522,12 +786,16 @@ async def knowledge_search(
           * Node type ([section] or [content])
           * Node ID in 'module::label' format
           * Parent node info (if with_parents=True)
-          * Content snippet with context
+          * Content snippet centred on the best matches, with matches in **bold**
+        - A "Truncated by deadline" marker if the search or the parent lookups
+          did not finish within the call's deadline (partial results)
 
     Typical Workflow:
         1. knowledge_search("API authentication")  # Broad search
         2. knowledge_search("config", search_under="docs::config") # Scoped search
-        3. knowledge_view(node_id="module::section")  # Read the found node
+        3. knowledge_search("how do users log in", mode="semantic")  # Paraphrased concept
+        4. knowledge_search("token refresh", mode="hybrid")  # Exact and related matches
+        5. knowledge_view(node_id="module::section")  # Read the found node
 
     See Also:
         knowledge_view - View full content of a found node
@@ -540,42 +808,335 @@ async def knowledge_search(
     if not api:
         raise RuntimeError("Session not found")
 
-    search_res = api.search(
-        keyword=query,
+    if mode not in SEARCH_MODES:
+        message = f"Invalid search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}"
+        if format == compact.COMPACT:
+            return compact.error(message)
+        return format_response.format_error(message)
+
+    try:
+        with phase("api"):
+            if mode == "hybrid":
+                search_res = await _hybrid_search(
+                    api, query, search_under, order, max_results, whole_word, case_sensitive, use_regex)
+            elif mode == "semantic":
+                search_res = await deadlines.call(
+                    vector_store.search,
+                    api, session_manager.get_loaded_modules(0), query,
+                    search_under=search_under,
+                    max_results=max_results
+                )
+            else:
+                search_res = await _lexical_search(
+                    api, query, search_under, order, max_results, whole_word, case_sensitive, use_regex)
+    except DeadlineExceeded:
+        # Index the modules, so the next searches return partial results past the deadline
+        for module_name in session_manager.get_loaded_modules(0):
+            index_store.schedule(api, module_name)
+        search_res = {"success": True, "data": [], "metadata": {
+            "query": query,
+            "truncated": truncate(f"the search did not finish within {deadlines.budget_ms:.0f} ms"),
+        }}
+
+    if not search_res.get("success"):
+        if format == compact.COMPACT:
+            return compact.search_results(search_res)
+        return format_response.format_search_results(search_res)
+
+    # Post-process results if parent info is requested
+    if with_parents and search_res.get("data"):
+        with phase("enrich"):
+            results = search_res["data"]
+            for i, item in enumerate(results):
+                if expired():
+                    search_res.setdefault("metadata", {})["truncated"] = truncate(
+                        f"parents shown for the first {i} of {len(results)} results")
+                    break
+                try:
+                    # Get immediate parent info instead of full breadcrumb
+                    parent_res = api.get_parent(item["node_id"])
+                    if parent_res.get("success"):
+                        p_data = parent_res["data"]
+                        # Skip ROOT as parent for a cleaner look
+                        if p_data["node_id"] != "::ROOT":
+                            item["parent"] = {
+                                "node_id": p_data["node_id"],
+                                "title": p_data.get("title", ""),
+                                "label": p_data.get("label", "")
+                            }
+                except Exception as e:
+                    item["parent_error"] = str(e)
+
+    if search_res.get("data"):
+        with phase("snippets"):
+            results = search_res["data"]
+            if mode == "hybrid":
+                lexical = [item for item in results if "lexical" in item["ranks"]]
+                results = [item for item in results if "lexical" not in item["ranks"]]
+                snippet_engine.annotate(
+                    lexical, index_store, api, query,
+                    whole_word=whole_word, case_sensitive=case_sensitive, use_regex=use_regex
+                )
+            if mode == "lexical":
+                snippet_engine.annotate(
+                    results, index_store, api, query,
+                    whole_word=whole_word, case_sensitive=case_sensitive, use_regex=use_regex
+                )
+            else:
+                # Highlight the query words the nodes contain
+                snippet_engine.annotate(results, index_store, api, query, whole_word=True)
+
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.search_results(search_res)
+        return format_response.format_search_results(search_res)
+
+
+async def _lexical_search(
+    api,
+    query: str,
+    search_under: Optional[str],
+    order: str,
+    max_results: int,
+    whole_word: bool,
+    case_sensitive: bool,
+    use_regex: bool
+) -> Dict[str, Any]:
+    """``api.search``, or the same search over the module indexes once they are all built
+
+    The indexed search checks the deadline as it walks the nodes and returns
+    the matches found so far, marked truncated; a KERAGAPI search past the
+    deadline can only be abandoned, with nothing to show.
+    """
+    modules = session_manager.get_loaded_modules(0)
+    if not modules or any(index_store.ready(module_name) is None for module_name in modules):
+        return await deadlines.call(
+            api.search,
+            keyword=query,
+            search_under=search_under,
+            order=order,
+            max_results=max_results,
+            whole_word=whole_word,
+            case_sensitive=case_sensitive,
+            use_regex=use_regex
+        )
+    res = await deadlines.call(
+        multi_searcher.search,
+        api, modules, [query],
         search_under=search_under,
         order=order,
         max_results=max_results,
         whole_word=whole_word,
         case_sensitive=case_sensitive,
-        use_regex=use_regex
+        use_regex=use_regex,
+        with_parents=False
     )
+    if not res.get("success"):
+        return res
+    entry = res["data"]["queries"][0]
+    if "error" in entry:
+        return {"success": False, "error": entry["error"]}
+    metadata: Dict[str, Any] = {"query": query, "total": entry["total"]}
+    if res["metadata"].get("truncated"):
+        metadata["truncated"] = res["metadata"]["truncated"]
+    return {"success": True, "data": entry["results"], "metadata": metadata}
+
+
+async def _hybrid_search(
+    api,
+    query: str,
+    search_under: Optional[str],
+    order: str,
+    max_results: int,
+    whole_word: bool,
+    case_sensitive: bool,
+    use_regex: bool
+) -> Dict[str, Any]:
+    """Run the lexical and semantic searches one after the other and fuse their rankings
+
+    A retriever that fails leaves the results of the other one, with the
+    failure reported in the metadata; only an invalid pattern or scope, which
+    fails both, fails the search.
+    """
+    if use_regex:
+        # The semantic retriever ignores the pattern, so check it up front as the lexical mode would
+        try:
+            re.compile(query)
+        except re.error as e:
+            return {"success": False, "error": f"Invalid regex: {e}"}
+
+    retrievers = {
+        "lexical": functools.partial(
+            _lexical_search, api, query, search_under, order, max_results, whole_word, case_sensitive, use_regex),
+        "semantic": functools.partial(
+            deadlines.call, vector_store.search,
+            api, session_manager.get_loaded_modules(0), query,
+            search_under=search_under,
+            max_results=max_results
+        ),
+    }
+    # One after the other: both use the session's KERAGAPI instance
+    outcomes: List[Any] = []
+    for retrieve in retrievers.values():
+        started = time.perf_counter()
+        try:
+            outcomes.append((await retrieve(), (time.perf_counter() - started) * 1000))
+        except Exception as e:
+            outcomes.append(e)
+
+    start = time.perf_counter()
+    rankings: Dict[str, List[Dict[str, Any]]] = {}
+    timings: Dict[str, Any] = {}
+    late = []
+    failures: Dict[str, Dict[str, Any]] = {}
+    for name, outcome in zip(retrievers, outcomes):
+        if isinstance(outcome, DeadlineExceeded):
+            late.append(name)
+            timings[name] = {"total": 0, "returned": 0, "ms": None}
+            continue
+        if isinstance(outcome, Exception):
+            logger.warning("hybrid search: %s retriever failed: %s", name, outcome)
+            failures[name] = {"success": False, "error": str(outcome) or type(outcome).__name__}
+        else:
+            res, ms = outcome
+            if not res.get("success"):
+                failures[name] = res
+        if name in failures:
+            timings[name] = {"total": 0, "returned": 0, "ms": None,
+                             "error": failures[name].get("error") or "failed"}
+            continue
+        rankings[name] = res.get("data") or []
+        meta = res.get("metadata") or {}
+        timings[name] = {"total": meta.get("total", len(rankings[name])), "returned": len(rankings[name]),
+                         "ms": round(ms, 3)}
+        if meta.get("truncated"):
+            late.append(name)
+
+    if failures and not rankings and not late:
+        # Neither retriever answered (e.g. the scope does not exist): fail as the lexical mode would
+        return failures.get("lexical") or next(iter(failures.values()))
+
+    results, fused = reciprocal_rank_fusion(rankings, max_results)
+    metadata: Dict[str, Any] = {
+        "query": query,
+        "mode": "hybrid",
+        "total": fused,
+        "retrievers": timings,
+        "fusion_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+    if failures:
+        metadata["failed"] = sorted(failures)
+    if late:
+        metadata["truncated"] = truncate(f"{' and '.join(late)} results incomplete within the deadline")
+    return {"success": True, "data": results, "metadata": metadata}
 
-    if not search_res.get("success"):
-        return format_response.format_search_results(search_res)
 
-    # Post-process results if parent info is requested
-    if with_parents and search_res.get("data"):
-        results = search_res["data"]
-        for item in results:
-            try:
-                # Get immediate parent info instead of full breadcrumb
-                parent_res = api.get_parent(item["node_id"])
-                if parent_res.get("success"):
-                    p_data = parent_res["data"]
-                    # Skip ROOT as parent for a cleaner look
-                    if p_data["node_id"] != "::ROOT":
-                        item["parent"] = {
-                            "node_id": p_data["node_id"],
-                            "title": p_data.get("title", ""),
-                            "label": p_data.get("label", "")
-                        }
-            except Exception as e:
-                item["parent_error"] = str(e)
+@instrumented_tool()
+async def knowledge_search_many(
+    queries: List[str],
+    search_under: Optional[str] = None,
+    order: str = "priority",
+    max_results: int = 20,
+    whole_word: bool = False,
+    case_sensitive: bool = False,
+    use_regex: bool = False,
+    with_parents: bool = True,
+    format: str = "text"
+) -> str:
+    """
+    Run several searches at once (synonyms, singular/plural, related terms).
 
-    return format_response.format_search_results(search_res)
+    All queries are evaluated in one pass over the search indexes of the
+    loaded modules, so the call takes about as long as a single
+    knowledge_search. Matching follows knowledge_search (titles, content and
+    labels; Title > Content > Label).
 
+    Args:
+        queries: Search keywords or regular expression patterns (at most 16).
+        search_under: Optional root node ID (e.g. 'module::label' or 'module' being short for 'module::module') to restrict all queries to a specific subtree.
+        order: 'priority' (default, Title > Content > Label) or 'dfs' (document
+            order) for the per-query results and ties in the merged ranking.
+        max_results: Maximum matches per query and in the merged ranking (default: 20).
+        whole_word: Match whole words only (default: False).
+        case_sensitive: Case-sensitive matching (default: False).
+        use_regex: Treat queries as regex patterns (default: False).
+        with_parents: Include parent node info in results (default: True).
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON with per-query ids and merged records.
+
+    Returns:
+        Formatted search results showing:
+        - For each query: match count and the matching nodes (type, title, id)
+        - Merged results: every matching node once, nodes matched by more
+          queries first, with parent info, a content snippet and the queries
+          that matched it
+        - A "Truncated by deadline" marker if the pass did not finish within
+          the call's deadline (partial results)
+
+    Typical Workflow:
+        1. knowledge_search_many(["auth", "authentication", "login"])  # Related terms at once
+        2. knowledge_view(node_id="module::section")  # Read the best merged match
+
+    See Also:
+        knowledge_search - Single query
+
+    Raises:
+        RuntimeError: If session not found.
+    """
+    api = session_manager.get_session(0)
+    if not api:
+        raise RuntimeError("Session not found")
 
-@mcp.tool()
+    try:
+        with phase("api"):
+            search_res = await deadlines.call(
+                multi_searcher.search,
+                api, session_manager.get_loaded_modules(0), queries,
+                search_under=search_under,
+                order=order,
+                max_results=max_results,
+                whole_word=whole_word,
+                case_sensitive=case_sensitive,
+                use_regex=use_regex,
+                with_parents=with_parents
+            )
+    except DeadlineExceeded:
+        queries = list(dict.fromkeys(query for query in queries if query))
+        search_res = {"success": True, "data": {
+            "queries": [{"query": query, "total": 0, "results": []} for query in queries],
+            "merged": [],
+        }, "metadata": {
+            "queries": queries,
+            "total": 0,
+            "truncated": truncate(f"the search did not finish within {deadlines.budget_ms:.0f} ms"),
+        }}
+
+    if search_res.get("success"):
+        data = search_res["data"]
+        with phase("snippets"):
+            # One snippet per node, centred on the first query that matched it
+            first: Dict[int, Any] = {}
+            for item in data["merged"]:
+                first.setdefault(id(item), (item["queries"][0], item))
+            for qi, entry in enumerate(data["queries"]):
+                for item in entry.get("results", []):
+                    first.setdefault(id(item), (qi, item))
+            by_query: Dict[int, List[Dict[str, Any]]] = {}
+            for qi, item in first.values():
+                by_query.setdefault(qi, []).append(item)
+            for qi, items in by_query.items():
+                snippet_engine.annotate(
+                    items, index_store, api, data["queries"][qi]["query"],
+                    whole_word=whole_word, case_sensitive=case_sensitive, use_regex=use_regex
+                )
+
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.search_many_results(search_res)
+        return format_response.format_search_many_results(search_res)
+
+
+@instrumented_tool()
 async def knowledge_view(
     node_id: Optional[str] = None,
     depth: int = 1,
@@ -603,7 +1164,9 @@ async def knowledge_view(
             - Section node: Displays section title with [section] tag, plus content
               preview if available. Format: [section] {title} [@{node_id}]
               with optional Preview line
-        format: Output style - 'markdown' (default), 'text', 'tree', or 'json'.
+        format: Output style - 'markdown' (default), 'text', 'tree', or 'json';
+            or 'compact' for minified JSON with the node id, type, title,
+            content, see_also ids and children records.
         include_content: Include node body text (default: True).
         include_see_also: Include cross-reference links (@node_id) (default: True).
 
@@ -613,6 +1176,8 @@ async def knowledge_view(
         - Body content (if include_content=True)
         - Child structure preview (if depth > 0)
         - Cross-references (if include_see_also=True)
+        If a deep view does not finish within the call's deadline, the node
+        is shown at depth 0 with a "Truncated by deadline" marker.
 
     Depth Selection Guide:
         - depth=0: Read only this node's content, no context
@@ -636,19 +1201,153 @@ async def knowledge_view(
     if not api:
         raise RuntimeError("Session not found")
 
-    result = api.get_node_view(
+    key_node = node_id or prefetcher.cursor(api)
+    key = (key_node, depth, format, include_content, include_see_also)
+    if key_node:
+        cached = prefetcher.lookup(api, key)
+        if cached is not None:
+            return cached
+
+    request = _view_request(node_id, depth, format, include_content, include_see_also)
+    truncated = None
+    try:
+        with phase("api"):
+            result = await deadlines.call(api.get_node_view, **request)
+    except DeadlineExceeded as e:
+        # A view still running in a worker holds the API instance: no inline fallback then
+        if depth == 0 or e.running:
+            message = f"Truncated by deadline: the view did not finish within {deadlines.budget_ms:.0f} ms"
+            if format == compact.COMPACT:
+                return compact.error(message)
+            return format_response.format_error(message)
+        # The node itself without its subtree is cheap: return that much
+        truncated = truncate(f"the depth={depth} view did not finish within {deadlines.budget_ms:.0f} ms; "
+                             f"showing depth 0")
+        with phase("api"):
+            result = api.get_node_view(**dict(request, depth=0))
+        if result.get("success"):
+            result.setdefault("metadata", {})["truncated"] = truncated
+
+    text = _format_view(result, format)
+    if key_node and truncated is None and not format_response.is_error(text):
+        prefetcher.store(api, key, text)
+    return text
+
+
+def _view_request(
+    node_id: Optional[str],
+    depth: int = 1,
+    format: str = "markdown",
+    include_content: bool = True,
+    include_see_also: bool = True
+) -> Dict[str, Any]:
+    """api.get_node_view arguments of a knowledge_view call"""
+    return dict(
         node_id=node_id,
         depth=depth,
-        format=format,
+        # The compact record is built from the node data; the API renders JSON for it
+        format="json" if format == compact.COMPACT else format,
         include_content=include_content,
         include_see_also=include_see_also
     )
+
+
+def _format_view(result: Dict[str, Any], format: str) -> str:
     # Directly pass to format_node_view without pre-unpacking
-    return format_response.format_node_view(result)
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.node_view(result)
+        return format_response.format_node_view(result)
+
+
+def _render_view(
+    api,
+    node_id: Optional[str],
+    depth: int = 1,
+    format: str = "markdown",
+    include_content: bool = True,
+    include_see_also: bool = True
+) -> str:
+    """knowledge_view output for ``api``, without a deadline (used by the prefetcher)"""
+    with phase("api"):
+        result = api.get_node_view(**_view_request(node_id, depth, format, include_content, include_see_also))
+    return _format_view(result, format)
+
+
+prefetcher.set_renderer(_render_view)
+
+
+@instrumented_tool()
+async def knowledge_related(
+    node_id: Optional[str] = None,
+    hops: int = 1,
+    limit: int = 30,
+    direction: str = "both",
+    format: str = "text"
+) -> str:
+    """
+    Find the nodes connected to a node by cross-references (see-also links).
+
+    Follows see-also links in one call instead of one knowledge_view per link,
+    and also finds the nodes that reference a node, across all loaded modules.
+
+    Args:
+        node_id: Start node ID in 'module::label' format.
+            Uses current location if not provided.
+        hops: How many links away to go (default: 1, at most 4).
+        limit: Maximum nodes to return, nearest first (default: 30, at most 200).
+        direction: Which links to follow:
+            - 'out': Nodes this node refers to (its see-also links).
+            - 'in': Nodes that refer to this node.
+            - 'both': Both (default).
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON with ids, titles, hops and the node each one was reached from.
 
+    Returns:
+        The related nodes, nearest first, each with its type, title, hop count
+        and the node it was reached from ("referenced by" for links followed
+        forward, "references" for links followed backward).
+
+    Typical Workflow:
+        1. knowledge_view(node_id="docs::auth")  # Read a node
+        2. knowledge_related(node_id="docs::auth", direction="in")  # What refers to it
+        3. knowledge_related(node_id="docs::auth", hops=2)  # Its neighbourhood
 
-@mcp.tool()
-async def knowledge_children(node_id: Optional[str] = None) -> str:
+    See Also:
+        knowledge_view - Read a related node (include_see_also shows direct links)
+
+    Raises:
+        RuntimeError: If session not found.
+    """
+    api = session_manager.get_session(0)
+    if not api:
+        raise RuntimeError("Session not found")
+
+    if not node_id:
+        status = api.get_status()
+        node_id = (status.get("data") or {}).get("current_node") if status.get("success") else None
+    if not node_id:
+        res = {"success": False, "error": "No node given and no current location"}
+    else:
+        try:
+            with phase("api"):
+                res = await deadlines.call(
+                    related_finder.related,
+                    api, session_manager.get_loaded_modules(0), node_id,
+                    hops=hops, limit=limit, direction=direction
+                )
+        except DeadlineExceeded:
+            res = {"success": False, "error": f"Truncated by deadline: the cross-references of {node_id} "
+                                              f"were not indexed within {deadlines.budget_ms:.0f} ms"}
+
+    with phase("render"):
+        if format == compact.COMPACT:
+            return compact.related(res)
+        return format_response.format_related(res)
+
+
+@instrumented_tool()
+async def knowledge_children(node_id: Optional[str] = None, format: str = "text") -> str:
     """
     Get simple list of child node IDs.
 
@@ -658,6 +1357,8 @@ async def knowledge_children(node_id: Optional[str] = None) -> str:
     Args:
         node_id: Parent node ID in 'module::label' format.
             Uses current location if not provided.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON list of the child node ids.
 
     Returns:
         Simple list of child node IDs (e.g., ['module::child1', 'module::child2']).
@@ -682,13 +1383,15 @@ async def knowledge_children(node_id: Optional[str] = None) -> str:
         raise RuntimeError("Session not found")
 
     res = api.get_children(node_id)
+    if format == compact.COMPACT:
+        return compact.node_ids(res, "Failed to get children")
     if not res.get("success"):
         return format_response.format_error(f"Failed to get children: {res.get('error')}")
     return format_response.format_children_list(res["data"])
 
 
-@mcp.tool()
-async def knowledge_parent(node_id: Optional[str] = None) -> str:
+@instrumented_tool()
+async def knowledge_parent(node_id: Optional[str] = None, format: str = "text") -> str:
     """
     Get the parent node of a specified node.
 
@@ -698,6 +1401,9 @@ async def knowledge_parent(node_id: Optional[str] = None) -> str:
     Args:
         node_id: Child node ID in 'module::label' format.
             Uses current location if not provided.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON record of the parent: id, type, title, content, see_also ids
+            and children.
 
     Returns:
         Parent node details including:
@@ -721,14 +1427,17 @@ async def knowledge_parent(node_id: Optional[str] = None) -> str:
         raise RuntimeError("Session not found")
 
     res = api.get_parent(node_id)
+    if format == compact.COMPACT:
+        return compact.node_view(res)
     # Use format_node_view to format parent info
     return format_response.format_node_view(res)
 
 
-@mcp.tool()
+@instrumented_tool()
 async def knowledge_children_preview(
     node_id: Optional[str] = None,
-    node_type: str = "all"
+    node_type: str = "all",
+    format: str = "text"
 ) -> str:
     """
     Get detailed preview of child nodes for browsing.
@@ -743,6 +1452,9 @@ async def knowledge_children_preview(
             - 'all': Show all child types (default)
             - 'section': Show only section containers
             - 'content': Show only content nodes
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON list of child records (id, title of sections) with their
+            truncated previews.
 
     Returns:
         Formatted preview showing for each child:
@@ -773,20 +1485,31 @@ async def knowledge_children_preview(
     if not api:
         raise RuntimeError("Session not found")
 
-    res = api.preview_children(node_id, node_type, 'order')
+    with phase("api"):
+        res = api.preview_children(node_id, node_type, 'order')
+    if res.get("success"):
+        prefetcher.after_preview(api, node_id, res["data"])
+    if format == compact.COMPACT:
+        return compact.children_preview(res)
     if not res.get("success"):
         return format_response.format_error(f"Failed to get preview: {res.get('error')}")
-    return format_response.format_children_preview(res["data"])
+    with phase("render"):
+        return format_response.format_children_preview(res["data"])
 
 
-@mcp.tool()
-async def knowledge_breadcrumb() -> str:
+@instrumented_tool()
+async def knowledge_breadcrumb(format: str = "text") -> str:
     """
     Get full navigation path from root to current location.
 
     Shows the breadcrumb trail representing your current position in the
     knowledge hierarchy. Useful for understanding context and orientation.
 
+    Args:
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON list of the node ids from the module root down to the
+            current node.
+
     Returns:
         Formatted breadcrumb showing path like:
         ::ROOT > module::root > module::section > module::subsection
@@ -808,6 +1531,8 @@ async def knowledge_breadcrumb() -> str:
         raise RuntimeError("Session not found")
 
     res = api.get_breadcrumb()
+    if format == compact.COMPACT:
+        return compact.node_ids(res, "Failed to get breadcrumb")
     if not res.get("success"):
         return format_response.format_error(f"Failed to get breadcrumb: {res.get('error')}")
     return format_response.format_breadcrumb(res["data"])
@@ -815,8 +1540,36 @@ async def knowledge_breadcrumb() -> str:
 
 # === Navigation Tools ===
 
-@mcp.tool()
-async def knowledge_to(target: str) -> str:
+def _record_visit(response: Dict[str, Any]) -> None:
+    """Append the node a successful knowledge_to/knowledge_up moved to to the session history"""
+    if response.get("success") and not (response.get("data") or {}).get("already_at_target"):
+        data = response.get("data") or {}
+        node_id = data.get("node_id") or data.get("id") or response.get("metadata", {}).get("node_id")
+        if node_id:
+            session_manager.get_history(0).visit(node_id)
+
+
+def _navigate_history(api, offset: int, empty_error: str) -> Dict[str, Any]:
+    """Move ``offset`` entries through the session history (negative is back)
+
+    The response metadata gets ``steps``, the number of entries actually moved
+    (fewer than requested at either end of the history).
+    """
+    history = session_manager.get_history(0)
+    entry = history.step(offset)
+    if entry is None:
+        return {"success": False, "error": empty_error, "metadata": {}}
+    position, node_id = entry
+    steps = abs(position - history.position)
+    response = api.navigate_to(node_id)
+    if response.get("success"):
+        history.seek(position)
+        response = dict(response, metadata=dict(response.get("metadata") or {}, steps=steps))
+    return response
+
+
+@instrumented_tool()
+async def knowledge_to(target: str, format: str = "text") -> str:
     """
     Navigate to a specific node and update current location.
 
@@ -828,6 +1581,12 @@ async def knowledge_to(target: str) -> str:
             - Full node ID: 'module::label' (e.g., 'docs::intro')
             - Relative ID: '::label' relative to current module
             - Child index: '1', '2', etc. from knowledge_children_preview
+            - Label or title, or the start or end of one: resolved if a single
+              node matches best (exact > prefix > suffix), otherwise the
+              ranked candidates are listed
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON record of the new node: id, parent id, and its children
+            (sections) or content; candidate ids for an ambiguous target.
 
     Returns:
         Navigation confirmation with new location:
@@ -856,11 +1615,21 @@ async def knowledge_to(target: str) -> str:
     if not api:
         raise RuntimeError("Session not found")
 
-    return format_response.format_navigation_result(api.navigate_to(target))
-
-
-@mcp.tool()
-async def knowledge_back(steps: int = 1) -> str:
+    with phase("api"):
+        response = api.navigate_to(target)
+    if not response.get("success") and not target.strip().isdigit():
+        # Partial or ambiguous name: rank candidates from the module name indexes
+        with phase("resolve"):
+            response = target_resolver.navigate(api, session_manager.get_loaded_modules(0), target, response)
+    _record_visit(response)
+    prefetcher.after_navigation(api, response)
+    if format == compact.COMPACT:
+        return compact.navigation_result(response)
+    return format_response.format_navigation_result(response)
+
+
+@instrumented_tool()
+async def knowledge_back(steps: int = 1, format: str = "text") -> str:
     """
     Go back in browsing history (like browser back button).
 
@@ -869,11 +1638,15 @@ async def knowledge_back(steps: int = 1) -> str:
     Args:
         steps: Number of steps to go back (default: 1).
             Each step undoes one knowledge_to/knowledge_up/knowledge_down.
+            The history keeps the last 256 locations (KERAG_MCP_HISTORY_SIZE).
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON record of the node reached: id, parent id, its children
+            (sections) or content, and the steps moved.
 
     Returns:
         Navigation confirmation showing:
         - New current location
-        - How many steps were reversed
+        - How many steps were reversed (fewer than requested at the start of the history)
 
     Typical Use Cases:
         - Return after following a reference
@@ -891,11 +1664,15 @@ async def knowledge_back(steps: int = 1) -> str:
     if not api:
         raise RuntimeError("Session not found")
 
-    return format_response.format_navigation_result(api.navigate_back(steps))
+    response = _navigate_history(api, -max(steps, 1), "No history to go back")
+    prefetcher.after_navigation(api, response)
+    if format == compact.COMPACT:
+        return compact.navigation_result(response)
+    return format_response.format_navigation_result(response)
 
 
-@mcp.tool()
-async def knowledge_forward(steps: int = 1) -> str:
+@instrumented_tool()
+async def knowledge_forward(steps: int = 1, format: str = "text") -> str:
     """
     Go forward in browsing history (undo knowledge_back).
 
@@ -903,9 +1680,14 @@ async def knowledge_forward(steps: int = 1) -> str:
 
     Args:
         steps: Number of steps to go forward (default: 1).
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON record of the node reached: id, parent id, its children
+            (sections) or content, and the steps moved.
 
     Returns:
-        Navigation confirmation showing new current location.
+        Navigation confirmation showing:
+        - New current location
+        - How many steps were redone (fewer than requested at the end of the history)
 
     Typical Use Cases:
         - Undo a knowledge_back operation
@@ -921,11 +1703,15 @@ async def knowledge_forward(steps: int = 1) -> str:
     if not api:
         raise RuntimeError("Session not found")
 
-    return format_response.format_navigation_result(api.navigate_forward(steps))
+    response = _navigate_history(api, max(steps, 1), "No history to go forward")
+    prefetcher.after_navigation(api, response)
+    if format == compact.COMPACT:
+        return compact.navigation_result(response)
+    return format_response.format_navigation_result(response)
 
 
-@mcp.tool()
-async def knowledge_up(levels: int = 1) -> str:
+@instrumented_tool()
+async def knowledge_up(levels: int = 1, format: str = "text") -> str:
     """
     Move up in the hierarchy to parent node(s).
 
@@ -934,6 +1720,9 @@ async def knowledge_up(levels: int = 1) -> str:
     Args:
         levels: Number of levels to move up (default: 1).
             Use 1 for parent, 2 for grandparent, etc.
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON record of the node reached: id, parent id, and its children
+            (sections) or content.
 
     Returns:
         Navigation confirmation with new current location.
@@ -953,25 +1742,44 @@ async def knowledge_up(levels: int = 1) -> str:
     if not api:
         raise RuntimeError("Session not found")
 
-    return format_response.format_navigation_result(api.up(levels))
+    response = api.up(levels)
+    _record_visit(response)
+    prefetcher.after_navigation(api, response)
+    if format == compact.COMPACT:
+        return compact.navigation_result(response)
+    return format_response.format_navigation_result(response)
 
 
 # === System Tools ===
 
-@mcp.tool()
-async def knowledge_status() -> str:
+@instrumented_tool()
+async def knowledge_status(format: str = "text") -> str:
     """
     Get system status and knowledge base statistics.
 
     Shows current session status, loaded modules, path configuration,
     and overall knowledge base metrics.
 
+    Args:
+        format: 'text' (default) for readable output, or 'compact' for minified
+            JSON with the session status fields, plus the reload, index,
+            vector, archive, compression, view cache and history sections
+            that are not empty.
+
     Returns:
         Formatted status showing:
         - Session status
         - Number of loaded modules
         - Local and global root paths
         - Total nodes and files
+        - Hot reloads of modules updated on disk (if any)
+        - Per-module search indexes and their last incremental update (if any)
+        - Per-module vectors of semantic search and their size (if any)
+        - Module archives found in the module roots, which need `kerag install` (if any)
+        - Memory saved by compressed node content and the block cache hit rate
+          (if KERAG_MCP_COMPRESS is set)
+        - View cache hit rate and prefetched views (if prefetching is enabled)
+        - Navigation history entries and memory used
 
     Typical Use Cases:
         - Verify connection is active
@@ -992,14 +1800,156 @@ async def knowledge_status() -> str:
 
     res = api.get_status()
     if not res.get("success"):
+        if format == compact.COMPACT:
+            return compact.error(f"Failed to get status: {res.get('error')}")
         return format_response.format_error(f"Failed to get status: {res.get('error')}")
-    return format_response.format_status(res["data"])
+    history_stats = dict(session_manager.get_history(0).stats(),
+                         handles=len(handle_table), handle_bytes=handle_table.memory_bytes())
+    if format == compact.COMPACT:
+        reload_status = module_reloader.status()
+        if not (reload_status["reloads"] or reload_status["failures"] or reload_status["pending"]):
+            reload_status = None
+        prefetch_status = prefetcher.stats()
+        vector_status = vector_store.stats()
+        archive_status = archive_store.stats()
+        compression_status = index_store.compression_stats()
+        return compact.status(res["data"], reload=reload_status, indexes=index_store.stats(),
+                              vectors=vector_status if vector_status["modules"] else None,
+                              archives=archive_status if archive_status["archives"] else None,
+                              compression=compression_status if compression_status["modules"] else None,
+                              view_cache=prefetch_status if prefetch_status["enabled"] else None,
+                              history=history_stats)
+    return (format_response.format_status(res["data"])
+            + format_response.format_reload_status(module_reloader.status())
+            + format_response.format_index_status(index_store.stats())
+            + format_response.format_vector_status(vector_store.stats())
+            + format_response.format_archive_status(archive_store.stats())
+            + format_response.format_compression_status(index_store.compression_stats())
+            + format_response.format_prefetch_status(prefetcher.stats())
+            + format_response.format_history_status(history_stats))
+
+
+@instrumented_tool()
+async def knowledge_metrics(format: str = "text", reset: bool = False) -> str:
+    """
+    Get per-tool performance metrics of this server.
+
+    Reports, for every knowledge_* tool called since startup (or the last
+    reset): call count, error count, latency percentiles and response sizes.
+    Does not require a session.
+
+    Args:
+        format: Output style - 'text' (default) for a table, or 'prometheus'
+            for the Prometheus text exposition format.
+        reset: Clear all collected metrics after reporting (default: False).
+
+    Returns:
+        Table with columns Tool, Calls, Errors, p50/p95/p99/Max latency in
+        milliseconds and average response size in bytes.
+
+    Note:
+        With the sse/streamable-http transports the same metrics are also
+        served at GET /metrics for Prometheus scraping.
+
+    See Also:
+        knowledge_status - Knowledge base statistics
+    """
+    if format == "prometheus":
+        text = metrics_registry.render_prometheus()
+    else:
+        text = (format_response.format_metrics(metrics_registry.snapshot())
+                + format_response.format_coalescing_stats(single_flight.stats())
+                + format_response.format_deadline_stats(deadlines.stats())
+                + format_response.format_admission_stats(admission.stats()))
+
+    if reset:
+        metrics_registry.reset()
+    return text
+
+
+@instrumented_tool()
+async def knowledge_profile(
+    mode: Optional[str] = None,
+    threshold_ms: Optional[float] = None,
+    output_dir: Optional[str] = None
+) -> str:
+    """
+    Configure and inspect profiling of slow tool calls.
+
+    When enabled, every tool call is profiled and calls slower than the
+    threshold are written to the output directory as flamegraph-ready
+    collapsed stacks (sample mode) or pstats files (cprofile mode), each with a
+    JSON sidecar holding the tool arguments and the time split between
+    KERAGAPI work (api), parent enrichment (enrich) and rendering (render).
+    Does not require a session. Call without arguments to see the status.
+
+    Args:
+        mode: 'sample' (low-overhead stack sampling), 'cprofile'
+            (deterministic, higher overhead) or 'off'. None keeps the current mode.
+        threshold_ms: Only calls slower than this are dumped. None keeps the current value.
+        output_dir: Directory for the profile files. None keeps the current value.
+
+    Returns:
+        Current profiler settings and the most recent slow calls with their
+        phase breakdown and file paths.
+
+    Note:
+        The same settings can be given at startup with the environment
+        variables KERAG_MCP_PROFILE, KERAG_MCP_PROFILE_THRESHOLD_MS,
+        KERAG_MCP_PROFILE_INTERVAL_MS and KERAG_MCP_PROFILE_DIR.
+
+    See Also:
+        knowledge_metrics - Latency percentiles of all tools
+    """
+    try:
+        profiler.configure(mode=mode, threshold_ms=threshold_ms, output_dir=output_dir)
+    except ValueError as e:
+        return format_response.format_error(str(e))
+    return format_response.format_profile_status(profiler.status())
+
+
+def create_server(host: str = "0.0.0.0", port: int = 5669, log_level: str = "INFO"):
+    """Construct the FastMCP server and register all tools
+
+    Args:
+        host: Host for the sse/streamable-http transports
+        port: Port for the sse/streamable-http transports
+        log_level: Log level passed to FastMCP
+
+    Returns:
+        FastMCP server instance
+    """
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP(SERVER_NAME, port=port, host=host, log_level=log_level)
+    for tool_fn in _tools:
+        mcp.add_tool(tool_fn)
+    mcp.custom_route("/metrics", methods=["GET"])(prometheus_metrics)
+    return mcp
 
 
 def main():
     """Entry point"""
-    # MCP server is already initialized via command line arguments
-    print(f"Transport: {args.transport}")
+    parser = build_parser()
+    # Parse only known args, ignore unknown ones (used internally by mcp.run)
+    args, unknown = parser.parse_known_args()
+
+    # Show help message and exit
+    if args.help:
+        parser.print_help()
+        sys.exit(0)
+
+    # Keep stdio quiet by default: clients show stderr as server noise
+    log_level = args.log_level or ("WARNING" if args.transport == "stdio" else "INFO")
+    configure_logging(log_level)
+
+    # stdio serves a single client: nothing to share fairly
+    admission.configure_from_env(default_enabled=args.transport != "stdio")
+
+    mcp = create_server(host=args.host, port=args.port, log_level=log_level)
+
+    # stdout carries the protocol on stdio, so the banner goes to the log
+    logger.info("Starting KERAG MCP Server (transport=%s, host=%s, port=%s)", args.transport, args.host, args.port)
     mcp.run(args.transport)
 
 
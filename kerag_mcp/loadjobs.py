@@ -0,0 +1,223 @@
+"""
+Background module loading jobs.
+
+``knowledge_load(background=True)`` returns a job id right away. The job
+runs in a worker thread and loads the module into the session's own API
+instance, so the modules already loaded are neither parsed again nor held
+twice in memory. KERAGAPI calls against the instance must not overlap, so
+the job holds the session's API lock (see ``apilock.py``):
+
+- for the load itself: tool calls arriving meanwhile wait for it, at most
+  until their deadline;
+- for stretches of nodes while it indexes the new module: tool calls are
+  served between two stretches.
+
+Every job reports its stage and counts (files loaded, nodes indexed).
+``knowledge_load_status`` returns them and, while it waits for a job, sends
+them to the client as MCP progress notifications.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .archive import ArchiveStore, get_archive_store
+from .index import IndexStore, get_index_store
+from .session_manager import SessionManager, get_session_manager
+
+logger = logging.getLogger("kerag_mcp")
+
+QUEUED = "queued"
+LOADING = "loading"
+INDEXING = "indexing"
+DONE = "done"
+FAILED = "failed"
+
+
+class LoadJob:
+    """State and progress counters of one background load"""
+
+    def __init__(self, job_id: str, session_id: Any, module_name: str):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.module_name = module_name
+        self.state = QUEUED
+        self.files: Optional[int] = None
+        self.nodes_total: Optional[int] = None
+        self.nodes_indexed = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def progress(self) -> Tuple[float, Optional[float], str]:
+        """(progress, total, message) for an MCP progress notification
+
+        One unit for loading the module itself and one per indexed node;
+        ``total`` is None until the node count is known.
+        """
+        loaded = 1 if self.state in (INDEXING, DONE) else 0
+        progress = loaded + self.nodes_indexed
+        total = None
+        if self.nodes_total is not None:
+            total = 1 + self.nodes_total
+        if self.state == DONE and total is not None:
+            progress = total
+        return float(progress), (float(total) if total is not None else None), self.message()
+
+    def message(self) -> str:
+        if self.state == LOADING:
+            files = f" ({self.files} files)" if self.files is not None else ""
+            return f"loading {self.module_name}{files}"
+        if self.state == INDEXING:
+            total = f"/{self.nodes_total}" if self.nodes_total is not None else ""
+            return f"indexing {self.module_name} ({self.nodes_indexed}{total} nodes)"
+        if self.state == FAILED:
+            return f"failed: {self.error}"
+        return self.state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "module": self.module_name,
+            "state": self.state,
+            "message": self.message(),
+            "files": self.files,
+            "nodes_indexed": self.nodes_indexed,
+            "nodes_total": self.nodes_total,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
+
+
+class LoadJobManager:
+    """Runs background loads one at a time and keeps the most recent jobs
+
+    Args:
+        session_manager: Sessions the modules are loaded into.
+        index_store: Store the new module is indexed into.
+        keep: Finished jobs kept for knowledge_load_status.
+        archive_store: Reader of modules installed as archives (the global one by default).
+    """
+
+    def __init__(self, session_manager: SessionManager, index_store: IndexStore, keep: int = 32,
+                 archive_store: Optional[ArchiveStore] = None):
+        self.keep = keep
+        self._session_manager = session_manager
+        self._index_store = index_store
+        self._archive_store = archive_store or get_archive_store()
+        self._jobs: "OrderedDict[str, LoadJob]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._listeners: List[Callable[[Any, Set[str], Any], None]] = []
+        self._lock = threading.Lock()
+        # One load at a time: each one parses a module
+        self._run_lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Any, Set[str], Any], None]) -> None:
+        """Call ``listener(session_id, {module_name}, api)`` after a job loaded and indexed its module"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def start(self, session_id: Any, module_name: str) -> LoadJob:
+        """Start loading ``module_name`` in the background (or return the job already doing it)"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.session_id == session_id and job.module_name == module_name and not job.finished:
+                    return job
+            job = LoadJob(f"load-{next(self._ids)}", session_id, module_name)
+            self._jobs[job.job_id] = job
+            finished = [job_id for job_id, item in self._jobs.items() if item.finished]
+            for job_id in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[job_id]
+        threading.Thread(target=self._run, args=(job,), name=f"kerag-mcp-{job.job_id}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[LoadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[LoadJob]:
+        """Known jobs, most recent first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _run(self, job: LoadJob) -> None:
+        start = time.perf_counter()
+        try:
+            with self._run_lock:
+                self._load(job)
+        except Exception as e:
+            logger.exception("load job %s: loading %s failed", job.job_id, job.module_name)
+            job.state, job.error = FAILED, str(e)
+        finally:
+            job.duration_ms = (time.perf_counter() - start) * 1000
+            job.done.set()
+
+    def _load(self, job: LoadJob) -> None:
+        sm = self._session_manager
+        api_lock = sm.get_api_lock(job.session_id)
+        with api_lock.held(f"load job {job.job_id} ({job.module_name})"):
+            api = sm.peek_session(job.session_id)
+            if api is None:
+                job.state, job.error = FAILED, "Session not found"
+                return
+            job.state = LOADING
+            modules = api.get_all_modules()
+            listed = {mod.get("name"): mod for mod in (modules.get("data") or {}).get("modules", [])} \
+                if modules.get("success") else {}
+            if job.module_name in listed:
+                job.files = listed[job.module_name].get("file_count")
+            result = self._archive_store.load_module(api, job.module_name)
+            job.result = result
+            if not result.get("success"):
+                job.state, job.error = FAILED, result.get("error", "Unknown error")
+                return
+            sm.mark_modules_loaded(job.session_id, [job.module_name])
+        job.files = (result.get("data") or {}).get("file_count", job.files)
+        job.nodes_total = (result.get("metadata") or {}).get("loaded_nodes")
+
+        job.state, job.nodes_indexed = INDEXING, 0
+
+        def indexed(count: int) -> None:
+            job.nodes_indexed = count
+
+        delta = self._index_store.refresh(api, job.module_name, progress=indexed, api_lock=api_lock)
+        job.nodes_indexed = delta["added"] + delta["changed"] + delta["unchanged"]
+        if job.nodes_total is None:
+            job.nodes_total = job.nodes_indexed
+
+        job.state = DONE
+        logger.info("load job %s: %s loaded in the background (%d nodes indexed)",
+                    job.job_id, job.module_name, job.nodes_indexed)
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(job.session_id, {job.module_name}, api)
+            except Exception:
+                logger.exception("load job %s: listener failed", job.job_id)
+
+
+# Global load job manager instance
+_load_jobs: Optional[LoadJobManager] = None
+_load_jobs_lock = threading.Lock()
+
+
+def get_load_jobs() -> LoadJobManager:
+    """Get the global load job manager instance"""
+    global _load_jobs
+
+    if _load_jobs is None:
+        with _load_jobs_lock:
+            if _load_jobs is None:
+                _load_jobs = LoadJobManager(get_session_manager(), get_index_store())
+
+    return _load_jobs
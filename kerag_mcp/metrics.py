@@ -0,0 +1,208 @@
+"""
+Per-tool runtime metrics for the KERAG MCP server.
+
+Every tool call records its latency, response size and outcome into a
+``ToolMetrics`` entry of the global ``MetricsRegistry``. Latencies are kept in
+HDR-style log-linear histograms, so percentiles stay accurate across several
+orders of magnitude with a fixed, small memory footprint.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Quantiles reported by snapshots and the Prometheus exposition
+DEFAULT_QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """HDR-style histogram of non-negative integer values.
+
+    Values are grouped by power of two and each power of two is split into
+    ``2 ** precision_bits`` linear sub-buckets, bounding the relative error of
+    every recorded value to ``2 ** -precision_bits``. Recording is O(1).
+    """
+
+    def __init__(self, precision_bits: int = 5):
+        self._precision_bits = precision_bits
+        self._sub_buckets = 1 << precision_bits
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - self._precision_bits - 1
+        return ((shift + 1) << self._precision_bits) + ((value >> shift) - self._sub_buckets)
+
+    def _upper_bound(self, index: int) -> int:
+        if index < self._sub_buckets:
+            return index
+        shift = (index >> self._precision_bits) - 1
+        sub = (index & (self._sub_buckets - 1)) + self._sub_buckets
+        return ((sub + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """Record a single value (negative values are clamped to 0)"""
+        value = max(int(value), 0)
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, quantile: float) -> int:
+        """Return the value at the given quantile (0.0 - 1.0)"""
+        if not self.count:
+            return 0
+        target = max(1, int(round(quantile * self.count)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class ToolMetrics:
+    """Counters and histograms of a single tool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.latency_us = LatencyHistogram()
+        self.response_bytes = LatencyHistogram()
+
+    def snapshot(self, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ms": {
+                "mean": self.latency_us.mean() / 1000.0,
+                "max": (self.latency_us.max or 0) / 1000.0,
+                "quantiles": {q: self.latency_us.percentile(q) / 1000.0 for q in quantiles},
+            },
+            "response_bytes": {
+                "total": self.response_bytes.total,
+                "mean": self.response_bytes.mean(),
+                "max": self.response_bytes.max or 0,
+            },
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of per-tool metrics"""
+
+    def __init__(self):
+        self._tools: Dict[str, ToolMetrics] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, float]]]] = []
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def add_collector(self, collector: Callable[[], List[Tuple[str, str, str, float]]]) -> None:
+        """Export ``collector()`` samples, (name, type, help, value), with the tool metrics"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _get(self, tool_name: str) -> ToolMetrics:
+        metrics = self._tools.get(tool_name)
+        if metrics is None:
+            metrics = self._tools.setdefault(tool_name, ToolMetrics(tool_name))
+        return metrics
+
+    def record(self, tool_name: str, elapsed_s: float, response_bytes: int, error: bool) -> None:
+        """Record one finished tool call"""
+        with self._lock:
+            metrics = self._get(tool_name)
+            metrics.calls += 1
+            if error:
+                metrics.errors += 1
+            metrics.latency_us.record(elapsed_s * 1_000_000)
+            metrics.response_bytes.record(response_bytes)
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Return a point-in-time copy of all tool metrics, sorted by tool name"""
+        with self._lock:
+            return [self._tools[name].snapshot() for name in sorted(self._tools)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+            self.started_at = time.time()
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format (0.0.4)"""
+        lines = [
+            "# HELP kerag_mcp_tool_calls_total Number of tool calls.",
+            "# TYPE kerag_mcp_tool_calls_total counter",
+        ]
+        snapshots = self.snapshot()
+        for snap in snapshots:
+            lines.append(f'kerag_mcp_tool_calls_total{{tool="{snap["name"]}"}} {snap["calls"]}')
+
+        lines.append("# HELP kerag_mcp_tool_errors_total Number of failed tool calls.")
+        lines.append("# TYPE kerag_mcp_tool_errors_total counter")
+        for snap in snapshots:
+            lines.append(f'kerag_mcp_tool_errors_total{{tool="{snap["name"]}"}} {snap["errors"]}')
+
+        lines.append("# HELP kerag_mcp_tool_latency_seconds Tool call latency.")
+        lines.append("# TYPE kerag_mcp_tool_latency_seconds summary")
+        with self._lock:
+            tools = [self._tools[name] for name in sorted(self._tools)]
+            for metrics in tools:
+                hist = metrics.latency_us
+                for q in DEFAULT_QUANTILES:
+                    value = hist.percentile(q) / 1_000_000
+                    lines.append(f'kerag_mcp_tool_latency_seconds{{tool="{metrics.name}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'kerag_mcp_tool_latency_seconds_sum{{tool="{metrics.name}"}} {hist.total / 1_000_000:.6f}')
+                lines.append(f'kerag_mcp_tool_latency_seconds_count{{tool="{metrics.name}"}} {hist.count}')
+
+            lines.append("# HELP kerag_mcp_tool_response_bytes Size of tool responses in bytes.")
+            lines.append("# TYPE kerag_mcp_tool_response_bytes summary")
+            for metrics in tools:
+                hist = metrics.response_bytes
+                for q in DEFAULT_QUANTILES:
+                    lines.append(f'kerag_mcp_tool_response_bytes{{tool="{metrics.name}",quantile="{q}"}} {hist.percentile(q)}')
+                lines.append(f'kerag_mcp_tool_response_bytes_sum{{tool="{metrics.name}"}} {hist.total}')
+                lines.append(f'kerag_mcp_tool_response_bytes_count{{tool="{metrics.name}"}} {hist.count}')
+
+        lines.append("# HELP kerag_mcp_uptime_seconds Seconds since the metrics were last reset.")
+        lines.append("# TYPE kerag_mcp_uptime_seconds gauge")
+        lines.append(f"kerag_mcp_uptime_seconds {time.time() - self.started_at:.3f}")
+
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            for name, metric_type, help_text, value in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry instance
+_metrics_registry: Optional[MetricsRegistry] = None
+_metrics_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global metrics registry instance"""
+    global _metrics_registry
+
+    if _metrics_registry is None:
+        with _metrics_registry_lock:
+            if _metrics_registry is None:
+                _metrics_registry = MetricsRegistry()
+
+    return _metrics_registry
@@ -0,0 +1,313 @@
+"""
+Batched search: several queries evaluated in one pass over the module indexes.
+
+Agents often send a handful of related ``knowledge_search`` calls in a row
+(synonyms, singular and plural, related terms). Each of them walks every
+loaded node through KERAGAPI. ``MultiSearcher`` answers all of them at once
+from the module snapshots of ``index.py``:
+
+- candidate nodes of plain queries come from the trigram table (the
+  intersection of the posting arrays of the query's trigrams); trigram
+  lookups are shared between queries. Regex and very short queries have no
+  candidates and are tested on every node;
+- one walk over the nodes in document order tests each node against the
+  queries it is a candidate for, field by field with KERAGAPI's precedence
+  (title > content > label), so per-query results and totals match
+  ``knowledge_search``. Plain queries are substring tests on fields
+  lowercased once per node, shared by all queries;
+- matches are merged into one deduplicated ranking: nodes matched by more
+  queries first, then by field and document order. Parents come from the
+  snapshot, resolved once per node.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .deadline import expired, truncate
+from .handles import ROOT_ID, module_of
+from .index import NGRAM_SIZE, IndexStore, ModuleIndex, get_index_store, ngrams
+
+# Matched field of a result, in KERAGAPI's precedence order
+SEARCH_FIELDS = ("title", "content", "label")
+
+# Characters of context on each side of a match in the excerpt (as KERAGAPI)
+_EXCERPT_CONTEXT = 60
+
+# Nodes walked between two deadline checks
+_DEADLINE_CHECK_EVERY = 256
+
+
+class _Query:
+    """One query of a batch: compiled pattern, candidate handles and matches"""
+
+    __slots__ = ("text", "regex", "needle", "error", "candidates", "matches")
+
+    def __init__(self, text: str, whole_word: bool, case_sensitive: bool, use_regex: bool):
+        self.text = text
+        self.error: Optional[str] = None
+        self.regex = None
+        # None: test every node
+        self.candidates: Optional[Set[int]] = None
+        # (field priority, document position, handle)
+        self.matches: List[Tuple[int, int, int]] = []
+        # Plain substring queries are tested with ``in`` (on lowercased fields unless case sensitive)
+        self.needle: Optional[str] = None
+        if not use_regex and not whole_word and text.isascii():
+            self.needle = text if case_sensitive else text.lower()
+        pattern = text if use_regex else re.escape(text)
+        if whole_word:
+            pattern = rf"\b{pattern}\b"
+        try:
+            self.regex = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            self.error = f"Invalid regex: {e}"
+
+    def prunable(self, use_regex: bool) -> bool:
+        # Lowercased trigrams are a superset filter for plain ASCII substrings only
+        return not use_regex and len(self.text) >= NGRAM_SIZE and self.text.isascii()
+
+
+class MultiSearcher:
+    """Evaluates batches of queries against the module indexes
+
+    Args:
+        index_store: Store providing the module snapshots.
+        max_queries: Largest accepted batch.
+    """
+
+    def __init__(self, index_store: IndexStore, max_queries: int = 16):
+        self.max_queries = max_queries
+        self._index_store = index_store
+        # module -> (index version, handle -> document position)
+        self._position_cache: Dict[str, Tuple[int, Dict[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def search(
+        self,
+        api,
+        module_names: Set[str],
+        queries: List[str],
+        search_under: Optional[str] = None,
+        order: str = "priority",
+        max_results: int = 20,
+        whole_word: bool = False,
+        case_sensitive: bool = False,
+        use_regex: bool = False,
+        with_parents: bool = True
+    ) -> Dict[str, Any]:
+        """Run ``queries`` over the loaded modules
+
+        Returns:
+            A response whose data holds ``queries`` (per query: query, total,
+            results or error) and ``merged`` (deduplicated results, each with
+            the indexes of the queries that matched it)
+        """
+        queries = list(dict.fromkeys(query for query in queries if query))
+        if not queries:
+            return {"success": False, "error": "No queries given"}
+        if len(queries) > self.max_queries:
+            return {"success": False, "error": f"Too many queries: {len(queries)} (at most {self.max_queries})"}
+
+        batch = [_Query(query, whole_word, case_sensitive, use_regex) for query in queries]
+        modules = self._module_order(api, module_names)
+        start_handle: Optional[int] = None
+        if search_under:
+            start_id = search_under if "::" in search_under else f"{search_under}::{search_under}"
+            modules = [name for name in modules if name == module_of(start_id)]
+            index = self._index_store.get(api, modules[0]) if modules else None
+            record = index.record(start_id) if index is not None else None
+            if record is None:
+                return {"success": False, "error": f"Node not found: {search_under}"}
+            start_handle = record.handle
+
+        indexes = [self._index_store.get(api, module_name) for module_name in modules]
+        truncated = None
+        base = 0
+        walked = candidates = 0
+        for index in indexes:
+            with index.lock:
+                positions = self._positions(index)
+                per_node = self._candidates(index, batch, use_regex)
+                candidates += sum(len(query_ids) for query_ids in per_node.values())
+                scan_all = [qi for qi, query in enumerate(batch) if query.regex is not None and query.candidates is None]
+                # Without a query that must see every node, only the candidates are walked
+                handles = index.order if scan_all else sorted(per_node, key=positions.__getitem__)
+                for i, handle in enumerate(handles):
+                    if i % _DEADLINE_CHECK_EVERY == 0 and expired():
+                        truncated = truncate(f"searched {walked} nodes before the deadline")
+                        break
+                    if start_handle is not None and handle != start_handle \
+                            and start_handle not in index.ancestors.get(handle, ()):
+                        continue
+                    walked += 1
+                    query_ids = per_node.get(handle)
+                    if not scan_all and not query_ids:
+                        continue
+                    position = base + positions[handle]
+                    record = index.nodes[handle]
+                    fields = (record.title, record.content, record.label)
+                    lowered = None
+                    for qi in (scan_all + query_ids if query_ids else scan_all):
+                        query = batch[qi]
+                        if query.needle is not None:
+                            # Fields are lowercased once per node and shared by the queries
+                            if not case_sensitive and lowered is None:
+                                lowered = tuple(text.lower() for text in fields)
+                            texts = fields if case_sensitive else lowered
+                            for priority, text in enumerate(texts):
+                                if query.needle in text:
+                                    query.matches.append((priority, position, handle))
+                                    break
+                            continue
+                        for priority, text in enumerate(fields):
+                            if query.regex.search(text):
+                                query.matches.append((priority, position, handle))
+                                break
+            base += len(index.order)
+            if truncated:
+                break
+
+        items: Dict[int, Dict[str, Any]] = {}
+        per_query = []
+        hits: Dict[int, List[Any]] = {}
+        for qi, query in enumerate(batch):
+            if query.error:
+                per_query.append({"query": query.text, "error": query.error})
+                continue
+            matches = query.matches
+            if order == "priority":
+                matches = sorted(matches)
+            for priority, position, handle in matches:
+                best = hits.get(handle)
+                if best is None:
+                    hits[handle] = [[qi], priority, position]
+                else:
+                    best[0].append(qi)
+                    best[1] = min(best[1], priority)
+            results = [self._item(indexes, items, handle, query, priority)
+                       for priority, position, handle in matches[:max_results]]
+            per_query.append({"query": query.text, "total": len(matches), "results": results})
+
+        if order == "priority":
+            ranked = sorted(hits.items(), key=lambda hit: (-len(hit[1][0]), hit[1][1], hit[1][2]))
+        else:
+            ranked = sorted(hits.items(), key=lambda hit: (-len(hit[1][0]), hit[1][2]))
+        merged = []
+        for handle, (query_ids, priority, _) in ranked[:max_results]:
+            item = self._item(indexes, items, handle, batch[query_ids[0]], priority)
+            item["queries"] = query_ids
+            merged.append(item)
+
+        if with_parents:
+            for handle, item in items.items():
+                self._parent(indexes, handle, item)
+
+        metadata: Dict[str, Any] = {"queries": queries, "total": len(hits), "nodes_walked": walked,
+                                    "candidates": candidates}
+        if truncated:
+            metadata["truncated"] = truncated
+        return {"success": True, "data": {"queries": per_query, "merged": merged}, "metadata": metadata}
+
+    @staticmethod
+    def _module_order(api, module_names: Set[str]) -> List[str]:
+        """Loaded modules in the order of their roots (KERAGAPI's document order)"""
+        order: List[str] = []
+        res = api.get_loaded_roots()
+        for root in (res.get("data") or []) if res.get("success") else []:
+            root_id = root.get("id")
+            if root_id and root_id != ROOT_ID:
+                module_name = module_of(root_id)
+                if module_name in module_names and module_name not in order:
+                    order.append(module_name)
+        return order + sorted(set(module_names) - set(order))
+
+    def _positions(self, index: ModuleIndex) -> Dict[int, int]:
+        """Document positions of the nodes of a module (called with the index lock held)"""
+        with self._lock:
+            cached = self._position_cache.get(index.module_name)
+        if cached is not None and cached[0] == index.version:
+            return cached[1]
+        positions = {handle: i for i, handle in enumerate(index.order)}
+        with self._lock:
+            self._position_cache[index.module_name] = (index.version, positions)
+        return positions
+
+    @staticmethod
+    def _candidates(index: ModuleIndex, batch: List[_Query], use_regex: bool) -> Dict[int, List[int]]:
+        """handle -> indexes of the prunable queries the node may match"""
+        postings: Dict[str, Any] = {}
+        per_node: Dict[int, List[int]] = {}
+        for qi, query in enumerate(batch):
+            query.candidates = None
+            if query.regex is None or not query.prunable(use_regex):
+                continue
+            arrays = []
+            for gram in ngrams(query.text):
+                if gram not in postings:
+                    postings[gram] = index.ngrams.get(gram, ())
+                arrays.append(postings[gram])
+            arrays.sort(key=len)
+            candidates = set(arrays[0]) if arrays else set()
+            for handles in arrays[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(handles)
+            query.candidates = candidates
+            for handle in candidates:
+                per_node.setdefault(handle, []).append(qi)
+        return per_node
+
+    @staticmethod
+    def _find(indexes: List[ModuleIndex], handle: int):
+        for index in indexes:
+            record = index.nodes.get(handle)
+            if record is not None:
+                return record
+        return None
+
+    def _item(self, indexes: List[ModuleIndex], items: Dict[int, Dict[str, Any]], handle: int,
+              query: _Query, priority: int) -> Dict[str, Any]:
+        """Result record of a node (shared by every list it appears in)"""
+        item = items.get(handle)
+        if item is not None:
+            return item
+        record = self._find(indexes, handle)
+        item = {
+            "node_id": record.node_id,
+            "id": record.node_id,
+            "type": record.type,
+            "title": record.title,
+            "label": record.label,
+        }
+        text = getattr(record, SEARCH_FIELDS[priority])
+        found = query.regex.search(text)
+        if found:
+            start = max(found.start() - _EXCERPT_CONTEXT, 0)
+            item["excerpt"] = text[start:found.end() + _EXCERPT_CONTEXT]
+        items[handle] = item
+        return item
+
+    def _parent(self, indexes: List[ModuleIndex], handle: int, item: Dict[str, Any]) -> None:
+        record = self._find(indexes, handle)
+        parent = self._find(indexes, record.parent) if record.parent >= 0 else None
+        # Module roots hang below ROOT, which is skipped as in knowledge_search
+        if parent is not None:
+            item["parent"] = {"node_id": parent.node_id, "title": parent.title, "label": parent.label}
+
+
+# Global multi-searcher instance
+_multi_searcher: Optional[MultiSearcher] = None
+_multi_searcher_lock = threading.Lock()
+
+
+def get_multi_searcher() -> MultiSearcher:
+    """Get the global multi-searcher instance"""
+    global _multi_searcher
+
+    if _multi_searcher is None:
+        with _multi_searcher_lock:
+            if _multi_searcher is None:
+                _multi_searcher = MultiSearcher(get_index_store())
+
+    return _multi_searcher
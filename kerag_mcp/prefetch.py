@@ -0,0 +1,283 @@
+"""
+View cache and speculative prefetching of likely-next nodes.
+
+Navigation is predictable: after ``knowledge_to`` an agent usually views the
+node it moved to, then opens its first children or the next sibling. When
+enabled, the ``Prefetcher`` renders those views after every navigation,
+bounded by a per-navigation budget, into an LRU ``knowledge_view`` cache.
+
+The rendering calls the session's KERAGAPI instance, so it is serialized
+with the tool calls by the session's API lock (see ``apilock.py``): a task
+of the event loop takes the lock for one KERAGAPI call at a time and runs
+the call in a thread. A single task does the rendering; while it is busy
+only the latest batch waits, and a batch is abandoned as soon as the agent
+navigates again or a tool call waits for the lock.
+
+Cached views belong to the API instance that rendered them; a reconnect or
+hot reload swaps the instance and with it the cache contents.
+
+Configured by ``KERAG_MCP_PREFETCH`` (default 0), ``KERAG_MCP_PREFETCH_BUDGET``
+(default 3) and ``KERAG_MCP_VIEW_CACHE_SIZE`` (default 256).
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .apilock import ApiLock
+from .session_manager import get_session_manager
+
+logger = logging.getLogger("kerag_mcp")
+
+# (node_id, depth, format, include_content, include_see_also) of a knowledge_view call
+ViewKey = Tuple[str, int, str, bool, bool]
+
+# Arguments of the views rendered ahead of time: knowledge_view defaults
+DEFAULT_VIEW = (1, "markdown", True, True)
+
+
+def _node_id(item: Any) -> Optional[str]:
+    if isinstance(item, str):
+        return item
+    return item.get("node_id") or item.get("id")
+
+
+class _CachedView:
+    __slots__ = ("api", "text", "prefetched", "used")
+
+    def __init__(self, api, text: str, prefetched: bool):
+        self.api = api
+        self.text = text
+        self.prefetched = prefetched
+        self.used = False
+
+
+class Prefetcher:
+    """LRU cache of rendered node views, filled ahead of navigation
+
+    Args:
+        render: ``render(api, node_id)`` returning the default knowledge_view text.
+        budget: Views rendered ahead per navigation.
+        cache_size: Views kept in the cache.
+        api_lock: Lock serializing the calls against the session's API instance.
+    """
+
+    def __init__(self, render: Optional[Callable[[Any, str], str]] = None, budget: int = 3, cache_size: int = 256,
+                 api_lock: Optional[ApiLock] = None):
+        self.enabled = False
+        self.budget = budget
+        self.cache_size = cache_size
+        self._render = render
+        self._api_lock = api_lock or ApiLock()
+        self._views: "OrderedDict[ViewKey, _CachedView]" = OrderedDict()
+        self._cursor: Optional[Tuple[Any, str]] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Latest batch waiting for the task, and the task working through batches
+        self._batch: Optional[Tuple[int, Any, str, Optional[List[str]]]] = None
+        self._task: Optional["asyncio.Task"] = None
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self.dropped = 0
+        self.abandoned = 0
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_PREFETCH, KERAG_MCP_PREFETCH_BUDGET and KERAG_MCP_VIEW_CACHE_SIZE"""
+        self.enabled = os.environ.get("KERAG_MCP_PREFETCH", "0") not in ("0", "false", "no", "")
+        self.budget = int(os.environ.get("KERAG_MCP_PREFETCH_BUDGET") or self.budget)
+        self.cache_size = int(os.environ.get("KERAG_MCP_VIEW_CACHE_SIZE") or self.cache_size)
+
+    def set_renderer(self, render: Callable[[Any, str], str]) -> None:
+        self._render = render
+
+    # --- view cache ---
+
+    def cursor(self, api) -> Optional[str]:
+        """Current node of ``api`` as last reported by a navigation, if known"""
+        with self._lock:
+            if self._cursor is not None and self._cursor[0] is api:
+                return self._cursor[1]
+        return None
+
+    def lookup(self, api, key: ViewKey) -> Optional[str]:
+        """Cached view text for ``key`` rendered by ``api``, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._views.get(key)
+            if entry is None or entry.api is not api:
+                self.misses += 1
+                return None
+            self._views.move_to_end(key)
+            self.hits += 1
+            if entry.prefetched and not entry.used:
+                self.prefetch_hits += 1
+            entry.used = True
+            return entry.text
+
+    def store(self, api, key: ViewKey, text: str, prefetched: bool = False) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._views[key] = _CachedView(api, text, prefetched)
+            self._views.move_to_end(key)
+            while len(self._views) > self.cache_size:
+                self._views.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Drop all cached views and the known cursor (modules loaded or swapped)"""
+        with self._lock:
+            self._views.clear()
+            self._cursor = None
+            self._generation += 1
+
+    def on_module_reload(self, session_id: Any, module_names: Iterable[str], api) -> None:
+        """ModuleReloader listener"""
+        self.invalidate()
+
+    # --- prefetching ---
+
+    def after_navigation(self, api, response: Dict[str, Any]) -> None:
+        """Record the node a navigation tool moved to and prefetch what is likely viewed next"""
+        if not self.enabled or not response.get("success"):
+            return
+        data = response.get("data") or {}
+        node_id = _node_id(data) or response.get("metadata", {}).get("node_id")
+        if not node_id:
+            return
+        with self._lock:
+            self._cursor = (api, node_id)
+        self._submit(api, node_id, None)
+
+    def after_preview(self, api, node_id: Optional[str], children: List[Any]) -> None:
+        """Prefetch the first children listed by knowledge_children_preview"""
+        if not self.enabled:
+            return
+        parent = node_id or self.cursor(api)
+        if parent:
+            self._submit(api, parent, [cid for cid in (_node_id(child) for child in children) if cid])
+
+    def _submit(self, api, node_id: str, children: Optional[List[str]]) -> None:
+        """Queue a batch (called by the tools, on the event loop)"""
+        with self._lock:
+            self._generation += 1
+            # At most one batch waits for the task; a newer navigation replaces it
+            if self._batch is not None:
+                self.dropped += 1
+            self._batch = (self._generation, api, node_id, children)
+            if self._task is not None and not self._task.done():
+                return
+            self._task = asyncio.get_running_loop().create_task(self._work())
+
+    async def _work(self) -> None:
+        while True:
+            with self._lock:
+                batch, self._batch = self._batch, None
+            if batch is None:
+                return
+            try:
+                await self._prefetch(*batch)
+            except Exception:
+                logger.debug("prefetch: batch for %s failed", batch[2], exc_info=True)
+
+    def _current(self, generation: int) -> bool:
+        """Whether a batch is still worth rendering: no newer navigation, no tool call waiting"""
+        with self._lock:
+            if generation != self._generation or self._api_lock.waiting:
+                return False
+            return True
+
+    def predict(self, api, node_id: str, children: Optional[List[str]] = None) -> List[str]:
+        """Likely-next views after arriving at ``node_id``: itself, its first children, its next sibling
+
+        With ``children`` (a listing the agent just saw), the first of them.
+        """
+        if children is not None:
+            # Listed by knowledge_children_preview: the agent picks among them
+            return children[:self.budget]
+
+        res = api.preview_children(node_id)
+        children = [cid for cid in (_node_id(child) for child in res.get("data") or []) if cid] \
+            if res.get("success") else []
+        candidates = [node_id] + children[:self.budget]
+
+        parent = api.get_parent(node_id)
+        parent_id = _node_id(parent.get("data") or {}) if parent.get("success") else None
+        if parent_id and parent_id != node_id:
+            siblings = api.preview_children(parent_id)
+            ids = [_node_id(child) for child in siblings.get("data") or []] if siblings.get("success") else []
+            if node_id in ids and ids.index(node_id) + 1 < len(ids):
+                candidates.insert(min(len(candidates), 2), ids[ids.index(node_id) + 1])
+        return list(dict.fromkeys(candidates))[:self.budget]
+
+    async def _prefetch(self, generation: int, api, node_id: str, children: Optional[List[str]]) -> None:
+        if self._render is None or not self._current(generation):
+            return
+        candidates = await self._api_lock.run("prefetch", self.predict, api, node_id, children)
+        for candidate in candidates:
+            if not self._current(generation):
+                # The agent moved on; predictions for the old node are worthless now
+                with self._lock:
+                    self.abandoned += 1
+                return
+            key = (candidate,) + DEFAULT_VIEW
+            with self._lock:
+                entry = self._views.get(key)
+                if entry is not None and entry.api is api:
+                    continue
+            text = await self._api_lock.run("prefetch", self._render, api, candidate)
+            if text is not None:
+                self.store(api, key, text, prefetched=True)
+                with self._lock:
+                    self.prefetched += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "budget": self.budget,
+                "cached": len(self._views),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "prefetched": self.prefetched,
+                "prefetch_hits": self.prefetch_hits,
+                "dropped": self.dropped,
+                "abandoned": self.abandoned,
+            }
+
+    def prometheus_samples(self) -> List[Tuple[str, str, str, float]]:
+        """(name, type, help, value) samples for MetricsRegistry.add_collector"""
+        stats = self.stats()
+        return [
+            ("kerag_mcp_view_cache_hits_total", "counter", "knowledge_view calls served from the view cache.", stats["hits"]),
+            ("kerag_mcp_view_cache_misses_total", "counter", "knowledge_view calls not in the view cache.", stats["misses"]),
+            ("kerag_mcp_view_cache_hit_ratio", "gauge", "Fraction of knowledge_view calls served from the view cache.", stats["hit_rate"]),
+            ("kerag_mcp_prefetched_views_total", "counter", "Views rendered ahead of navigation.", stats["prefetched"]),
+            ("kerag_mcp_prefetch_hits_total", "counter", "Prefetched views that were requested.", stats["prefetch_hits"]),
+        ]
+
+
+# Global prefetcher instance
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Get the global prefetcher of session 0 (configured from the environment on first use)"""
+    global _prefetcher
+
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                prefetcher = Prefetcher(api_lock=get_session_manager().get_api_lock(0))
+                prefetcher.configure_from_env()
+                _prefetcher = prefetcher
+
+    return _prefetcher
@@ -0,0 +1,291 @@
+"""
+Opt-in profiling of slow tool calls.
+
+When enabled (``KERAG_MCP_PROFILE=sample|cprofile`` or the
+``knowledge_profile`` tool), every tool call is profiled and, if it ran longer
+than the latency threshold, dumped to the profile directory:
+
+- ``sample`` mode: a background thread samples the stack of the calling
+  thread and writes collapsed stacks (``<name>.folded``), ready for
+  flamegraph.pl, speedscope or inferno.
+- ``cprofile`` mode: the call runs under ``cProfile`` and is written as
+  ``<name>.pstats`` (one call at a time).
+
+Each dump has a ``<name>.json`` sidecar with the tool arguments, total
+duration and the wall-clock split between the phases marked with
+``phase()`` (``api`` for KERAGAPI work, ``enrich`` for parent enrichment,
+``render`` for format_response).
+"""
+
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Any
+
+PROFILE_MODES = ("off", "sample", "cprofile")
+
+_current_call: contextvars.ContextVar = contextvars.ContextVar("kerag_mcp_profiled_call", default=None)
+
+
+class _NullPhase:
+    """No-op context manager returned by phase() when nothing is profiled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Context manager attributing wall-clock time to a phase of a profiled call"""
+
+    __slots__ = ("_call", "_name", "_previous", "_start")
+
+    def __init__(self, call: "ProfiledCall", name: str):
+        self._call = call
+        self._name = name
+
+    def __enter__(self):
+        self._previous = self._call.phase
+        self._call.phase = self._name
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        phases = self._call.phases
+        phases[self._name] = phases.get(self._name, 0.0) + elapsed
+        self._call.phase = self._previous
+        return False
+
+
+class ProfiledCall:
+    """State of one tool call while it is being profiled"""
+
+    def __init__(self, tool_name: str, arguments: Dict[str, Any], frame, thread_id: int):
+        self.tool_name = tool_name
+        self.arguments = arguments
+        self.frame = frame
+        self.thread_id = thread_id
+        self.phase = "tool"
+        self.phases: Dict[str, float] = {}
+        self.samples: Counter = Counter()
+        self.profile: Optional[cProfile.Profile] = None
+        self.token: Optional[contextvars.Token] = None
+        self.started_at = time.time()
+
+
+def phase(name: str):
+    """Mark a phase of the current tool call (no-op unless the call is profiled)"""
+    call = _current_call.get()
+    if call is None:
+        return _NULL_PHASE
+    return _Phase(call, name)
+
+
+def is_profiled() -> bool:
+    """True while the current tool call is being profiled"""
+    return _current_call.get() is not None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """Profiles tool calls and dumps the ones slower than a threshold"""
+
+    def __init__(self):
+        self.mode = "off"
+        self.threshold_ms = 500.0
+        self.interval_ms = 5.0
+        self.output_dir = os.path.join(tempfile.gettempdir(), "kerag_mcp_profiles")
+        self.recent: deque = deque(maxlen=20)
+        self._active: List[ProfiledCall] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._cprofile_busy = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def configure(
+        self,
+        mode: Optional[str] = None,
+        threshold_ms: Optional[float] = None,
+        interval_ms: Optional[float] = None,
+        output_dir: Optional[str] = None
+    ) -> None:
+        """Update the profiler settings; arguments left as None are unchanged"""
+        if mode is not None:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"Invalid profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+            self.mode = mode
+        if threshold_ms is not None:
+            self.threshold_ms = float(threshold_ms)
+        if interval_ms is not None:
+            self.interval_ms = max(float(interval_ms), 0.5)
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if self.mode == "sample":
+            self._ensure_sampler()
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_PROFILE* environment variables"""
+        self.configure(
+            mode=os.environ.get("KERAG_MCP_PROFILE") or None,
+            threshold_ms=os.environ.get("KERAG_MCP_PROFILE_THRESHOLD_MS") or None,
+            interval_ms=os.environ.get("KERAG_MCP_PROFILE_INTERVAL_MS") or None,
+            output_dir=os.environ.get("KERAG_MCP_PROFILE_DIR") or None,
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "threshold_ms": self.threshold_ms,
+            "interval_ms": self.interval_ms,
+            "output_dir": self.output_dir,
+            "recent": list(self.recent),
+        }
+
+    # --- call lifecycle ---
+
+    def start(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[ProfiledCall]:
+        """Begin profiling a tool call; returns None when profiling is off
+
+        Must be called from the tool wrapper itself: its frame delimits the
+        sampled stacks of this call.
+        """
+        if self.mode == "off":
+            return None
+        call = ProfiledCall(tool_name, arguments, sys._getframe(1), threading.get_ident())
+        call.token = _current_call.set(call)
+        if self.mode == "cprofile" and not self._cprofile_busy:
+            self._cprofile_busy = True
+            call.profile = cProfile.Profile()
+            call.profile.enable()
+        with self._lock:
+            self._active.append(call)
+        return call
+
+    def finish(self, call: ProfiledCall, elapsed_s: float) -> Optional[str]:
+        """End profiling a call; dumps it when slower than the threshold
+
+        Returns:
+            Base path of the written files, or None if nothing was written
+        """
+        if call.profile is not None:
+            call.profile.disable()
+            self._cprofile_busy = False
+        with self._lock:
+            self._active.remove(call)
+        _current_call.reset(call.token)
+
+        elapsed_ms = elapsed_s * 1000
+        if elapsed_ms < self.threshold_ms:
+            return None
+        try:
+            return self._dump(call, elapsed_ms)
+        except OSError:
+            return None
+
+    def _dump(self, call: ProfiledCall, elapsed_ms: float) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(call.started_at))
+        base = os.path.join(self.output_dir, f"{stamp}-{call.tool_name}-{int(elapsed_ms)}ms-{id(call) & 0xffff:04x}")
+
+        files = []
+        if call.samples:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in call.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            files.append(base + ".folded")
+        if call.profile is not None:
+            call.profile.dump_stats(base + ".pstats")
+            files.append(base + ".pstats")
+
+        phases = dict(call.phases)
+        phases["other"] = max(elapsed_ms / 1000 - sum(phases.values()), 0.0)
+        sidecar = {
+            "tool": call.tool_name,
+            "arguments": call.arguments,
+            "started_at": call.started_at,
+            "duration_ms": elapsed_ms,
+            "phases_ms": {name: seconds * 1000 for name, seconds in phases.items()},
+            "mode": self.mode,
+            "samples": sum(call.samples.values()),
+            "files": files,
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, indent=2, ensure_ascii=False, default=str)
+
+        self.recent.append({
+            "tool": call.tool_name,
+            "duration_ms": elapsed_ms,
+            "phases_ms": sidecar["phases_ms"],
+            "path": base,
+        })
+        return base
+
+    # --- sampling ---
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample_loop, name="kerag-mcp-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while self.mode == "sample":
+            time.sleep(self.interval_ms / 1000)
+            with self._lock:
+                active = list(self._active)
+            if active:
+                self._take_sample(active)
+        self._sampler = None
+
+    def _take_sample(self, active: List[ProfiledCall]) -> None:
+        frames = sys._current_frames()
+        for call in active:
+            frame = frames.get(call.thread_id)
+            stack = []
+            while frame is not None and frame is not call.frame:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if frame is None:
+                # The thread is not inside this call right now (e.g. another
+                # interleaved call is running on the event loop)
+                continue
+            stack.append(f"phase:{call.phase}")
+            stack.append(call.tool_name)
+            call.samples[";".join(reversed(stack))] += 1
+
+
+# Global profiler instance
+_profiler: Optional[Profiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    """Get the global profiler instance (configured from the environment on first use)"""
+    global _profiler
+
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                profiler = Profiler()
+                profiler.configure_from_env()
+                _profiler = profiler
+
+    return _profiler
@@ -0,0 +1,322 @@
+"""
+Hot reload of modules updated on disk.
+
+``ModuleCatalog`` reports which entries of the watched module roots changed.
+For every session that has one of those modules loaded, ``ModuleReloader``
+waits for the files to settle, then reloads them in a background thread:
+
+- when the KERAG version can unload modules, only the changed modules are
+  unloaded and loaded again in the session's own instance; the other
+  modules stay as they are;
+- otherwise a fresh API instance is built with all of the session's
+  modules, and swapped into the session once ready.
+
+Both hold the session's API lock (see apilock.py) while they touch the
+session's instance, so the cursor is read and moved back to the same node
+(or the nearest ancestor that still exists) between two tool calls, never
+during one.
+
+Configured by ``KERAG_MCP_HOT_RELOAD`` (default 1) and
+``KERAG_MCP_RELOAD_SETTLE_S`` (default 1.0).
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .archive import ArchiveStore, get_archive_store, module_name_of
+from .catalog import ModuleCatalog, get_module_catalog
+from .session_manager import SessionManager, get_session_manager
+
+logger = logging.getLogger("kerag_mcp")
+
+# Upper bound on parents walked when the cursor node no longer exists
+_MAX_REMAP_DEPTH = 64
+
+
+def current_node(api) -> Optional[str]:
+    """Node the API instance is positioned at, if known"""
+    res = api.get_status()
+    if not res.get("success"):
+        return None
+    return (res.get("data") or {}).get("current_node")
+
+
+def _parent_id(api, node_id: str) -> Optional[str]:
+    res = api.get_parent(node_id)
+    if not res.get("success"):
+        return None
+    parent = res.get("data") or {}
+    parent_id = parent.get("node_id") or parent.get("id")
+    return parent_id if parent_id != node_id else None
+
+
+def ancestry(api, node_id: str) -> List[str]:
+    """``node_id`` followed by its ancestors, nearest first"""
+    chain: List[str] = []
+    current: Optional[str] = node_id
+    while current and len(chain) < _MAX_REMAP_DEPTH:
+        chain.append(current)
+        current = _parent_id(api, current)
+    return chain
+
+
+def remap_cursor(api, chain: List[str]) -> Optional[str]:
+    """Move ``api`` to the first node of ``chain`` (see ``ancestry``) that exists in it"""
+    for node_id in chain:
+        if api.navigate_to(node_id).get("success"):
+            return node_id
+    return None
+
+
+class ModuleReloader:
+    """Swaps updated modules into live sessions
+
+    Args:
+        session_manager: Sessions to keep up to date.
+        catalog: Catalog whose change notifications trigger reloads.
+        settle_s: Seconds without further changes before a reload starts.
+        archive_store: Reader of modules installed as archives (the global one by default).
+    """
+
+    def __init__(self, session_manager: SessionManager, catalog: ModuleCatalog, settle_s: float = 1.0,
+                 archive_store: Optional[ArchiveStore] = None):
+        self.enabled = True
+        self.settle_s = settle_s
+        self._session_manager = session_manager
+        self._catalog = catalog
+        self._archive_store = archive_store or get_archive_store()
+        self._session_roots: Dict[Any, Set[str]] = {}
+        self._pending: Dict[Any, Set[str]] = {}
+        self._timers: Dict[Any, threading.Timer] = {}
+        self._listeners: List[Callable[[Any, Set[str], Any], None]] = []
+        self._lock = threading.Lock()
+        # One reload at a time: reloads are rare and each one parses modules
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+        catalog.add_listener(self._on_change)
+        # Edits anywhere in a loaded module must be seen, not just its top level
+        catalog.watch_modules(self._loaded_modules)
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_HOT_RELOAD and KERAG_MCP_RELOAD_SETTLE_S"""
+        self.enabled = os.environ.get("KERAG_MCP_HOT_RELOAD", "1") not in ("0", "false", "no")
+        self.settle_s = float(os.environ.get("KERAG_MCP_RELOAD_SETTLE_S") or self.settle_s)
+
+    def add_listener(self, listener: Callable[[Any, Set[str], Any], None]) -> None:
+        """Call ``listener(session_id, module_names, new_api)`` after a session's modules were swapped"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def track_session(self, session_id: Any, api) -> None:
+        """Watch the module roots of a (new) session"""
+        if not self.enabled:
+            return
+        res = api.get_status()
+        data = (res.get("data") or {}) if res.get("success") else {}
+        roots = {os.path.abspath(r) for r in (data.get("local_root"), data.get("global_root")) if r}
+        with self._lock:
+            self._session_roots[session_id] = roots
+        for root in roots:
+            self._catalog.watch(root)
+
+    def _loaded_modules(self) -> Set[str]:
+        """Modules loaded in the watched sessions"""
+        if not self.enabled:
+            return set()
+        with self._lock:
+            session_ids = list(self._session_roots)
+        modules: Set[str] = set()
+        for session_id in session_ids:
+            modules |= self._session_manager.get_loaded_modules(session_id)
+        return modules
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "pending": sorted(name for names in self._pending.values() for name in names),
+                "last_reload": dict(self.last_reload) if self.last_reload else None,
+            }
+
+    # --- scheduling ---
+
+    def _on_change(self, root: str, changed: Set[str]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            session_ids = [sid for sid, roots in self._session_roots.items() if root in roots]
+        for session_id in session_ids:
+            # Entries are module directories or module archives ('name.tar')
+            affected = {module_name_of(name) for name in changed}
+            affected &= self._session_manager.get_loaded_modules(session_id)
+            if affected:
+                self._schedule(session_id, affected)
+
+    def _schedule(self, session_id: Any, module_names: Iterable[str]) -> None:
+        # Restart the settle timer on every change so a module is not parsed mid-install
+        with self._lock:
+            self._pending.setdefault(session_id, set()).update(module_names)
+            timer = self._timers.get(session_id)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.settle_s, self._run, args=(session_id,))
+            timer.daemon = True
+            self._timers[session_id] = timer
+        timer.start()
+
+    def _run(self, session_id: Any) -> None:
+        with self._reload_lock:
+            with self._lock:
+                module_names = self._pending.pop(session_id, set())
+                self._timers.pop(session_id, None)
+            if module_names:
+                try:
+                    self.reload_session(session_id, module_names)
+                except Exception:
+                    logger.exception("reload: reloading %s failed", ", ".join(sorted(module_names)))
+                    with self._lock:
+                        self.failures += 1
+
+    # --- reloading ---
+
+    def reload_session(self, session_id: Any, changed: Set[str]) -> bool:
+        """Reload a session's changed modules from their current files
+
+        Returns:
+            True if at least one module was reloaded
+        """
+        sm = self._session_manager
+        api = sm.peek_session(session_id)
+        if api is None or sm.get_session_metadata(session_id) is None:
+            return False
+
+        start = time.perf_counter()
+        if hasattr(api, "unload_module"):
+            outcome = self._reload_in_place(session_id, api, changed)
+        else:
+            outcome = self._rebuild(session_id, api, changed)
+        if outcome is None:
+            return False
+        new_api, reloaded, cursor, remapped = outcome
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info("reload: reloaded %s (%.0f ms, cursor %s -> %s)",
+                    ", ".join(sorted(reloaded)), elapsed_ms, cursor, remapped)
+        with self._lock:
+            self.reloads += 1
+            self.last_reload = {
+                "at": time.time(),
+                "session_id": session_id,
+                "modules": sorted(reloaded),
+                "duration_ms": elapsed_ms,
+                "cursor": cursor,
+                "remapped_to": remapped,
+            }
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(session_id, set(reloaded), new_api)
+            except Exception:
+                logger.exception("reload: listener failed")
+        return True
+
+    def _reload_in_place(self, session_id: Any, api, changed: Set[str]):
+        """Unload and load the changed modules in the session's instance
+
+        A module that fails to load again is no longer loaded in the session.
+        """
+        sm = self._session_manager
+        with sm.get_api_lock(session_id).held(f"reloading {', '.join(sorted(changed))}"):
+            if sm.peek_session(session_id) is not api:
+                return None
+            modules = changed & sm.get_loaded_modules(session_id)
+            if not modules:
+                return None
+            cursor = current_node(api)
+            chain = ancestry(api, cursor) if cursor else []
+            reloaded: Set[str] = set()
+            for module_name in sorted(modules):
+                api.unload_module(module_name)
+                result = self._archive_store.load_module(api, module_name)
+                if result.get("success"):
+                    reloaded.add(module_name)
+                    continue
+                logger.warning("reload: module %s failed to load and was unloaded: %s",
+                               module_name, result.get("error"))
+                sm.unmark_modules_loaded(session_id, [module_name])
+                with self._lock:
+                    self.failures += 1
+            remapped = cursor
+            if cursor and current_node(api) != cursor:
+                remapped = remap_cursor(api, chain)
+        if not reloaded:
+            return None
+        return api, reloaded, cursor, remapped
+
+    def _rebuild(self, session_id: Any, old_api, changed: Set[str]):
+        """Build a new instance with all of the session's modules and swap it in"""
+        sm = self._session_manager
+        if not changed & sm.get_loaded_modules(session_id):
+            return None
+        new_api = sm.build_api(**sm.get_session_metadata(session_id)["config"])
+        lock = sm.get_api_lock(session_id)
+        modules: Set[str] = set()
+        # Modules loaded into the old instance while this one is built are
+        # loaded too before the swap, which holds the lock so none can be added
+        while True:
+            if not self._restore(session_id, new_api, modules):
+                return None
+            with lock.held(f"reloading {', '.join(sorted(changed))}"):
+                if sm.peek_session(session_id) is not old_api:
+                    logger.info("reload: session %s was reconnected during reload, discarding", session_id)
+                    return None
+                if not sm.get_loaded_modules(session_id) <= modules:
+                    continue
+                cursor = current_node(old_api)
+                remapped = remap_cursor(new_api, ancestry(old_api, cursor)) if cursor else None
+                sm.swap_session_api(session_id, old_api, new_api, modules)
+                return new_api, changed & modules, cursor, remapped
+
+    def _restore(self, session_id: Any, new_api, modules: Set[str]) -> bool:
+        """Load the session's modules missing from ``modules`` into ``new_api``; False if one failed"""
+        # Modules loaded by the session while this reload runs are picked up on the next pass
+        while True:
+            missing = self._session_manager.get_loaded_modules(session_id) - modules
+            if not missing:
+                return True
+            for module_name in sorted(missing):
+                result = self._archive_store.load_module(new_api, module_name)
+                if not result.get("success"):
+                    # Keep serving the old version rather than dropping a module
+                    logger.warning("reload: module %s failed to load, keeping the previous version: %s",
+                                   module_name, result.get("error"))
+                    with self._lock:
+                        self.failures += 1
+                    return False
+            modules |= missing
+
+
+# Global module reloader instance
+_module_reloader: Optional[ModuleReloader] = None
+_module_reloader_lock = threading.Lock()
+
+
+def get_module_reloader() -> ModuleReloader:
+    """Get the global module reloader (configured from the environment on first use)"""
+    global _module_reloader
+
+    if _module_reloader is None:
+        with _module_reloader_lock:
+            if _module_reloader is None:
+                reloader = ModuleReloader(get_session_manager(), get_module_catalog())
+                reloader.configure_from_env()
+                _module_reloader = reloader
+
+    return _module_reloader
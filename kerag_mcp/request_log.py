@@ -0,0 +1,184 @@
+"""
+Logging setup and structured request log for the KERAG MCP server.
+
+All ``kerag_mcp`` log records are handed to a ``QueueHandler`` and written to
+stderr by a background ``QueueListener``, so tool handlers never block on I/O.
+
+The request log is a separate, opt-in stream of JSON lines (one per tool call,
+with request id, duration, result size and error flag), configured by:
+
+- ``KERAG_MCP_REQUEST_LOG``: ``stderr`` or a file path (unset: disabled)
+- ``KERAG_MCP_REQUEST_LOG_SAMPLE``: fraction of calls to log (default 1.0)
+- ``KERAG_MCP_REQUEST_LOG_SLOW_MS``: always log calls slower than this
+- ``KERAG_MCP_REQUEST_LOG_ARGS``: include tool arguments (default 1)
+
+When disabled, the tool wrapper only checks ``RequestLog.enabled``.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Any
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+_listeners: List[QueueListener] = []
+_listeners_lock = threading.Lock()
+
+
+class _PassthroughQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    """Serialize the dict payload of a request log record as one JSON line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def _attach_queue(logger: logging.Logger, handler: logging.Handler) -> None:
+    """Route ``logger`` through a queue to ``handler`` running on a listener thread"""
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    with _listeners_lock:
+        if not _listeners:
+            atexit.register(_stop_listeners)
+        _listeners.append(listener)
+
+    for old in list(logger.handlers):
+        if isinstance(old, QueueHandler):
+            logger.removeHandler(old)
+    logger.addHandler(_PassthroughQueueHandler(log_queue))
+    logger.propagate = False
+
+
+def _stop_listeners() -> None:
+    with _listeners_lock:
+        for listener in _listeners:
+            listener.stop()
+        _listeners.clear()
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """Send ``kerag_mcp`` logs to stderr through a non-blocking queue"""
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+
+    logger = logging.getLogger("kerag_mcp")
+    logger.setLevel(level)
+    _attach_queue(logger, stream)
+
+
+class RequestLog:
+    """Sampled JSON-lines log of tool calls"""
+
+    def __init__(self):
+        self.enabled = False
+        self.destination: Optional[str] = None
+        self.sample_rate = 1.0
+        self.slow_ms: Optional[float] = None
+        self.include_args = True
+        self._logger = logging.getLogger("kerag_mcp.requests")
+        self._ids = itertools.count(1)
+        self._id_prefix = f"{os.getpid():x}"
+
+    def configure(
+        self,
+        destination: Optional[str],
+        sample_rate: float = 1.0,
+        slow_ms: Optional[float] = None,
+        include_args: bool = True
+    ) -> None:
+        """Enable the request log writing to ``destination`` ('stderr' or a path), or disable it with None"""
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.slow_ms = float(slow_ms) if slow_ms is not None else None
+        self.include_args = include_args
+        if not destination:
+            self.enabled = False
+            self.destination = None
+            return
+
+        if destination == "stderr":
+            handler = logging.StreamHandler(sys.stderr)
+        else:
+            handler = logging.FileHandler(destination, encoding="utf-8")
+        handler.setFormatter(_JsonLinesFormatter())
+        self._logger.setLevel(logging.INFO)
+        _attach_queue(self._logger, handler)
+        self.destination = destination
+        self.enabled = True
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_REQUEST_LOG* environment variables"""
+        slow_ms = os.environ.get("KERAG_MCP_REQUEST_LOG_SLOW_MS")
+        self.configure(
+            destination=os.environ.get("KERAG_MCP_REQUEST_LOG") or None,
+            sample_rate=float(os.environ.get("KERAG_MCP_REQUEST_LOG_SAMPLE") or 1.0),
+            slow_ms=float(slow_ms) if slow_ms else None,
+            include_args=os.environ.get("KERAG_MCP_REQUEST_LOG_ARGS", "1") not in ("0", "false", "no"),
+        )
+
+    def next_request_id(self) -> str:
+        return f"{self._id_prefix}-{next(self._ids):08x}"
+
+    def record(
+        self,
+        request_id: str,
+        tool_name: str,
+        elapsed_s: float,
+        response_bytes: int,
+        error: bool,
+        arguments: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Queue one request record, subject to sampling (slow calls are always kept)"""
+        elapsed_ms = elapsed_s * 1000
+        slow = self.slow_ms is not None and elapsed_ms >= self.slow_ms
+        if not slow and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        payload = {
+            "ts": time.time(),
+            "request_id": request_id,
+            "tool": tool_name,
+            "duration_ms": round(elapsed_ms, 3),
+            "bytes": response_bytes,
+            "error": error,
+        }
+        if slow:
+            payload["slow"] = True
+        if self.include_args and arguments:
+            payload["args"] = arguments
+        self._logger.info(payload)
+
+
+# Global request log instance
+_request_log: Optional[RequestLog] = None
+_request_log_lock = threading.Lock()
+
+
+def get_request_log() -> RequestLog:
+    """Get the global request log instance (configured from the environment on first use)"""
+    global _request_log
+
+    if _request_log is None:
+        with _request_log_lock:
+            if _request_log is None:
+                request_log = RequestLog()
+                request_log.configure_from_env()
+                _request_log = request_log
+
+    return _request_log
@@ -0,0 +1,150 @@
+"""
+Resolution of partial knowledge_to targets.
+
+When KERAGAPI cannot resolve a ``knowledge_to`` target by itself ("Node not
+found" or "Ambiguous target"), the target is looked up in a name index of
+each loaded module: sorted arrays of lowercased labels and titles, plus the
+same keys reversed for suffix matches. Exact, prefix and suffix lookups are
+binary searches, so resolution does not scan the nodes of the loaded modules.
+
+Candidates are ranked exact > prefix > suffix, then label before title,
+then shorter names, then document order. A single best candidate is
+navigated to; otherwise the ranked list is returned as an ambiguous target.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .handles import module_of
+from .index import IndexStore, ModuleIndex, get_index_store
+
+EXACT, PREFIX, SUFFIX = 0, 1, 2
+
+# Upper bound on candidates collected per module and match kind
+_SCAN_LIMIT = 200
+
+# (kind, field, name length, document position, node id)
+Candidate = Tuple[int, int, int, int, str]
+
+
+class NameIndex:
+    """Sorted label/title keys of one module snapshot"""
+
+    def __init__(self, index: ModuleIndex):
+        position = {handle: i for i, handle in enumerate(index.order)}
+        entries = []
+        for handle, record in index.nodes.items():
+            label = record.label or record.node_id.rsplit("::", 1)[-1]
+            for field, name in ((0, label), (1, record.title)):
+                if name:
+                    entries.append((name.lower(), field, position.get(handle, 0), record.node_id))
+        entries.sort()
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+        reversed_entries = sorted((entry[0][::-1],) + entry[1:] for entry in entries)
+        self.reversed_keys = [entry[0] for entry in reversed_entries]
+        self.reversed_entries = reversed_entries
+
+    @staticmethod
+    def _range(keys: List[str], prefix: str) -> Tuple[int, int]:
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + "\U0010ffff")
+
+    def lookup(self, target: str) -> List[Candidate]:
+        """Exact, prefix and suffix matches of a lowercased target"""
+        candidates: List[Candidate] = []
+        lo, hi = self._range(self.keys, target)
+        for key, field, position, node_id in self.entries[lo:min(hi, lo + _SCAN_LIMIT)]:
+            candidates.append((EXACT if key == target else PREFIX, field, len(key), position, node_id))
+        lo, hi = self._range(self.reversed_keys, target[::-1])
+        for key, field, position, node_id in self.reversed_entries[lo:min(hi, lo + _SCAN_LIMIT)]:
+            if key != target[::-1]:
+                candidates.append((SUFFIX, field, len(key), position, node_id))
+        return candidates
+
+
+class TargetResolver:
+    """Name indexes of the loaded modules, rebuilt when a module index changes
+
+    Args:
+        index_store: Store providing the module snapshots.
+        limit: Candidates returned for an ambiguous target.
+    """
+
+    def __init__(self, index_store: IndexStore, limit: int = 20):
+        self.limit = limit
+        self._index_store = index_store
+        self._names: Dict[str, Tuple[int, NameIndex]] = {}
+        self._lock = threading.Lock()
+        self.resolved = 0
+        self.ambiguous = 0
+
+    def _name_index(self, api, module_name: str) -> NameIndex:
+        index = self._index_store.get(api, module_name)
+        with self._lock:
+            cached = self._names.get(module_name)
+        if cached is not None and cached[0] == index.version:
+            return cached[1]
+        with index.lock:
+            version, names = index.version, NameIndex(index)
+        with self._lock:
+            self._names[module_name] = (version, names)
+        return names
+
+    def candidates(self, api, module_names: Iterable[str], target: str) -> List[str]:
+        """Ranked node ids matching ``target``; only the best match kind is kept"""
+        if "::" in target and not target.startswith("::"):
+            module_names = [module_of(target)]
+            target = target.split("::", 1)[1]
+        target = target.lstrip(":").strip().lower()
+        if not target:
+            return []
+
+        found: List[Candidate] = []
+        for module_name in module_names:
+            found.extend(self._name_index(api, module_name).lookup(target))
+        if not found:
+            return []
+        best_kind = min(candidate[0] for candidate in found)
+        ranked = sorted(candidate for candidate in found if candidate[0] == best_kind)
+        return list(dict.fromkeys(candidate[4] for candidate in ranked))
+
+    def navigate(self, api, module_names: Iterable[str], target: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Retry a failed ``navigate_to(target)`` through the name indexes
+
+        Returns:
+            The navigation response for a single best candidate, an
+            "Ambiguous target" response with ranked candidates, or the
+            original ``response`` when nothing matches.
+        """
+        candidates = self.candidates(api, module_names, target)
+        if len(candidates) == 1:
+            with self._lock:
+                self.resolved += 1
+            return api.navigate_to(candidates[0])
+        if candidates:
+            with self._lock:
+                self.ambiguous += 1
+            return {
+                "success": False,
+                "error": "Ambiguous target",
+                "metadata": {"candidates": candidates[:self.limit], "total": len(candidates)},
+            }
+        return response
+
+
+# Global target resolver instance
+_target_resolver: Optional[TargetResolver] = None
+_target_resolver_lock = threading.Lock()
+
+
+def get_target_resolver() -> TargetResolver:
+    """Get the global target resolver instance"""
+    global _target_resolver
+
+    if _target_resolver is None:
+        with _target_resolver_lock:
+            if _target_resolver is None:
+                _target_resolver = TargetResolver(get_index_store())
+
+    return _target_resolver
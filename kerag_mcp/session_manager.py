@@ -1,26 +1,32 @@
+import os
 import uuid
 import threading
 import logging
-from typing import Dict, Optional, Any
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Any, Set
 from datetime import datetime
-from kerag.api import KERAGAPI
 
-# 配置全局logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from .apilock import ApiLock
+from .handles import get_handle_table
+from .history import NavigationHistory
 
+if TYPE_CHECKING:
+    # kerag.api is imported on first session creation to keep server startup fast
+    from kerag.api import KERAGAPI
+
+# 日志输出由kerag_mcp.request_log.configure_logging()在main()中统一配置
 logger = logging.getLogger("kerag_mcp")
 
 
 class SessionManager:
     """管理基于会话的KERAG API实例"""
 
-    def __init__(self):
-        self._sessions: Dict[str, KERAGAPI] = {}
+    def __init__(self, api_factory: Optional[Callable[..., "KERAGAPI"]] = None, history_size: int = 256):
+        self._api_factory = api_factory
+        self.history_size = history_size
+        self._sessions: Dict[str, "KERAGAPI"] = {}
         self._session_metadata: Dict[str, Dict[str, Any]] = {}
+        # 每个会话一把API锁，重新连接后保持不变（后台任务可能仍持有它）
+        self._api_locks: Dict[str, ApiLock] = {}
         self._lock = threading.Lock()
         # self._logger = logging.getLogger("kerag_mcp.SessionManager")
         # self._logger.info("SessionManager initialized")
@@ -31,7 +37,7 @@ class SessionManager:
         local_root: Optional[str] = None,
         global_root: Optional[str] = None,
         lang: Optional[str] = None
-    ) -> KERAGAPI:
+    ) -> "KERAGAPI":
         """创建新会话，返回API实例
 
         如果提供了session_id且该会话已存在，则更新其配置。
@@ -49,11 +55,7 @@ class SessionManager:
         # if not session_id:
             # session_id = str(uuid.uuid4())
 
-        api = KERAGAPI(
-            local_root=local_root,
-            global_root=global_root,
-            lang=lang
-        )
+        api = self.build_api(local_root=local_root, global_root=global_root, lang=lang)
 
         with self._lock:
             self._sessions[session_id] = api
@@ -62,6 +64,8 @@ class SessionManager:
                 "created_at": datetime.now(),
                 "last_accessed": datetime.now(),
                 "request_count": 0,
+                "loaded_modules": set(),
+                "history": NavigationHistory(get_handle_table(), self.history_size),
                 "config": {
                     "local_root": local_root,
                     "global_root": global_root,
@@ -71,7 +75,44 @@ class SessionManager:
 
         return api
 
-    def get_session(self, session_id: str) -> Optional[KERAGAPI]:
+    def build_api(
+        self,
+        local_root: Optional[str] = None,
+        global_root: Optional[str] = None,
+        lang: Optional[str] = None
+    ) -> "KERAGAPI":
+        """创建一个不属于任何会话的API实例
+
+        Args:
+            local_root: 本地知识库根路径
+            global_root: 全局知识库根路径
+            lang: 语言偏好
+
+        Returns:
+            KERAGAPI实例
+        """
+        api_factory = self._api_factory
+        if api_factory is None:
+            from kerag.api import KERAGAPI
+            api_factory = KERAGAPI
+
+        return api_factory(
+            local_root=local_root,
+            global_root=global_root,
+            lang=lang
+        )
+
+    def set_api_factory(self, api_factory: Optional[Callable[..., "KERAGAPI"]]) -> None:
+        """设置创建API实例的工厂（例如基准测试使用的合成知识库）
+
+        Args:
+            api_factory: 接受local_root、global_root、lang关键字参数的可调用对象，
+                为None时恢复使用KERAGAPI
+        """
+        with self._lock:
+            self._api_factory = api_factory
+
+    def get_session(self, session_id: str) -> Optional["KERAGAPI"]:
         """获取会话的API实例
 
         Args:
@@ -90,6 +131,69 @@ class SessionManager:
                 self._session_metadata[session_id]["request_count"] += 1
             return api
 
+    def peek_session(self, session_id: str) -> Optional["KERAGAPI"]:
+        """获取会话的API实例，但不更新访问时间和请求计数（供后台任务使用）
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            KERAGAPI实例，如果会话不存在返回None
+        """
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def swap_session_api(
+        self,
+        session_id: str,
+        old_api: "KERAGAPI",
+        new_api: "KERAGAPI",
+        modules: Optional[Iterable[str]] = None
+    ) -> bool:
+        """原子地替换会话的API实例，会话其余状态保持不变
+
+        仅当会话当前仍使用old_api时才替换，避免覆盖期间重新连接创建的实例。
+        给出modules时，还要求会话记录的已加载模块都在modules中：否则说明在准备
+        new_api期间有模块被加载到old_api，替换会丢失该模块。检查与替换在同一把锁内完成。
+
+        Args:
+            session_id: 会话ID
+            old_api: 预期的当前API实例
+            new_api: 新的API实例
+            modules: new_api中已加载的模块名，替换成功后一并记为会话已加载的模块
+
+        Returns:
+            替换成功返回True，否则返回False（实例是否已被替换可通过peek_session区分）
+        """
+        with self._lock:
+            if self._sessions.get(session_id) is not old_api:
+                return False
+            metadata = self._session_metadata.get(session_id)
+            if modules is not None and metadata is not None:
+                modules = set(modules)
+                if not metadata["loaded_modules"] <= modules:
+                    return False
+                metadata["loaded_modules"].update(modules)
+            self._sessions[session_id] = new_api
+            return True
+
+    def get_api_lock(self, session_id: str) -> ApiLock:
+        """获取串行化会话API调用的锁（见apilock.py）
+
+        同一会话的API实例上的调用不能重叠：工具调用、预取、后台加载和热重载都先获取此锁。
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            ApiLock实例，会话尚不存在时也会创建
+        """
+        with self._lock:
+            api_lock = self._api_locks.get(session_id)
+            if api_lock is None:
+                api_lock = self._api_locks[session_id] = ApiLock()
+            return api_lock
+
     def get_session_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
         """获取会话元数据
 
@@ -102,6 +206,58 @@ class SessionManager:
         with self._lock:
             return self._session_metadata.get(session_id)
 
+    def mark_modules_loaded(self, session_id: str, module_names: Iterable[str]) -> None:
+        """记录会话中已加载的模块
+
+        Args:
+            session_id: 会话ID
+            module_names: 已加载的模块名
+        """
+        with self._lock:
+            metadata = self._session_metadata.get(session_id)
+            if metadata is not None:
+                metadata["loaded_modules"].update(module_names)
+
+    def unmark_modules_loaded(self, session_id: str, module_names: Iterable[str]) -> None:
+        """记录会话中已卸载的模块（如热重载失败后不再可用的模块）
+
+        Args:
+            session_id: 会话ID
+            module_names: 已卸载的模块名
+        """
+        with self._lock:
+            metadata = self._session_metadata.get(session_id)
+            if metadata is not None:
+                metadata["loaded_modules"].difference_update(module_names)
+
+    def get_loaded_modules(self, session_id: str) -> Set[str]:
+        """获取会话中已加载的模块名
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            模块名集合的副本，如果会话不存在返回空集合
+        """
+        with self._lock:
+            metadata = self._session_metadata.get(session_id)
+            return set(metadata["loaded_modules"]) if metadata else set()
+
+    def get_history(self, session_id: str) -> Optional[NavigationHistory]:
+        """获取会话的导航历史（后退/前进列表）
+
+        历史记录属于会话而非API实例，热重载替换API实例后仍然保留。
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            NavigationHistory实例，如果会话不存在返回None
+        """
+        with self._lock:
+            metadata = self._session_metadata.get(session_id)
+            return metadata["history"] if metadata else None
+
     def destroy_session(self, session_id: str) -> bool:
         """销毁会话
 
@@ -157,12 +313,13 @@ _session_manager_lock = threading.Lock()
 
 
 def get_session_manager() -> SessionManager:
-    """获取全局会话管理器实例"""
+    """获取全局会话管理器实例（导航历史容量取自KERAG_MCP_HISTORY_SIZE）"""
     global _session_manager
 
     if _session_manager is None:
         with _session_manager_lock:
             if _session_manager is None:
-                _session_manager = SessionManager()
+                _session_manager = SessionManager(
+                    history_size=int(os.environ.get("KERAG_MCP_HISTORY_SIZE") or 256))
 
     return _session_manager
@@ -0,0 +1,197 @@
+"""
+Single-flight coalescing of identical concurrent tool calls.
+
+When a team of agents starts at once, they typically all send the same
+``knowledge_load`` and the same opening ``knowledge_search``; without
+coalescing each copy repeats the work. ``SingleFlight`` keys calls of the
+coalesced tools by their normalized arguments (defaults filled in) and the
+session's API instance. The first call (the leader) starts the work as a
+task of its own, and every copy that arrives before the task finishes waits
+for the same task and receives its result (or exception).
+
+A caller that is cancelled (MCP ``notifications/cancelled``) only stops
+waiting: the shared task keeps running for the callers still waiting, and is
+cancelled once none is left.
+
+Configured by ``KERAG_MCP_COALESCE`` (default 1).
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from .session_manager import get_session_manager
+
+# Tools whose identical concurrent calls share one execution
+COALESCED_TOOLS = ("knowledge_load", "knowledge_search", "knowledge_view")
+
+
+class _Flight:
+    """A shared call in progress"""
+
+    __slots__ = ("task", "waiters", "duration_s")
+
+    def __init__(self):
+        self.task: Optional["asyncio.Task"] = None
+        # Callers (leader included) still waiting for the task
+        self.waiters = 0
+        self.duration_s = 0.0
+
+
+class _ToolCounters:
+    __slots__ = ("leaders", "followers", "saved_s")
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self.saved_s = 0.0
+
+
+class SingleFlight:
+    """In-flight registry of coalesced tool calls
+
+    Args:
+        tools: Names of the tools to coalesce.
+        scope: Returns an identity that is added to every key (e.g. the
+            session's API instance), so calls against different states never merge.
+    """
+
+    def __init__(self, tools: Iterable[str] = COALESCED_TOOLS, scope: Optional[Callable[[], Any]] = None):
+        self.enabled = True
+        self.tools = frozenset(tools)
+        self._scope = scope
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._signatures: Dict[Callable, inspect.Signature] = {}
+        self._counters: Dict[str, _ToolCounters] = {}
+        self._lock = threading.Lock()
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_COALESCE"""
+        self.enabled = os.environ.get("KERAG_MCP_COALESCE", "1") not in ("0", "false", "no")
+
+    def covers(self, tool_name: str) -> bool:
+        return self.enabled and tool_name in self.tools
+
+    def key(self, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+        """Normalized call key, or None if the arguments cannot be keyed"""
+        signature = self._signatures.get(fn)
+        if signature is None:
+            signature = self._signatures.setdefault(fn, inspect.signature(fn))
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        scope = id(self._scope()) if self._scope is not None else None
+        key = (fn.__name__, scope, tuple(sorted(bound.arguments.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run ``fn(*args, **kwargs)``, or join an identical call already in flight"""
+        tool_name = fn.__name__
+        key = self.key(fn, args, kwargs)
+        if key is None:
+            return await fn(*args, **kwargs)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            result = await self._wait(key, flight)
+            with self._lock:
+                counters = self._get(tool_name)
+                counters.followers += 1
+                counters.saved_s += flight.duration_s
+            return result
+
+        flight = _Flight()
+        flight.task = asyncio.get_running_loop().create_task(self._execute(flight, fn, args, kwargs))
+        flight.task.add_done_callback(lambda task: self._done(key, flight))
+        self._flights[key] = flight
+        with self._lock:
+            self._get(tool_name).leaders += 1
+        return await self._wait(key, flight)
+
+    @staticmethod
+    async def _execute(flight: _Flight, fn: Callable[..., Awaitable[Any]], args: Tuple,
+                       kwargs: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        result = await fn(*args, **kwargs)
+        flight.duration_s = time.perf_counter() - started
+        return result
+
+    async def _wait(self, key: Hashable, flight: _Flight) -> Any:
+        """Wait for the shared task; cancelling one caller does not cancel it for the others"""
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller gave up: stop the work, and let new calls start afresh
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _done(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # The callers may all be gone; do not log an exception nobody retrieved
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def _get(self, tool_name: str) -> _ToolCounters:
+        counters = self._counters.get(tool_name)
+        if counters is None:
+            counters = self._counters.setdefault(tool_name, _ToolCounters())
+        return counters
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per tool: executed (leader) calls, coalesced (follower) calls and work avoided"""
+        with self._lock:
+            return [
+                {
+                    "tool": tool_name,
+                    "executed": counters.leaders,
+                    "coalesced": counters.followers,
+                    "saved_ms": counters.saved_s * 1000,
+                }
+                for tool_name, counters in sorted(self._counters.items())
+            ]
+
+    def prometheus_samples(self) -> List[Tuple[str, str, str, float]]:
+        """(name, type, help, value) samples for MetricsRegistry.add_collector"""
+        stats = self.stats()
+        return [
+            ("kerag_mcp_coalesced_calls_total", "counter",
+             "Tool calls answered with the result of an identical call in flight.",
+             sum(item["coalesced"] for item in stats)),
+            ("kerag_mcp_coalesced_saved_seconds_total", "counter",
+             "Tool execution time avoided by coalescing identical calls.",
+             sum(item["saved_ms"] for item in stats) / 1000),
+        ]
+
+
+# Global single-flight instance
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the global single-flight registry (scoped to the API instance of session 0)"""
+    global _single_flight
+
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                session_manager = get_session_manager()
+                single_flight = SingleFlight(scope=lambda: session_manager.peek_session(0))
+                single_flight.configure_from_env()
+                _single_flight = single_flight
+
+    return _single_flight
@@ -0,0 +1,260 @@
+"""
+Search snippets centred on the matches.
+
+KERAGAPI search results carry an excerpt that starts at a fixed distance
+before the first hit, so it often cuts the match context short. The
+``SnippetEngine`` rebuilds the excerpt of each result from the module index:
+match offsets of plain keyword queries come straight from the postings
+(recorded when the node was indexed), and only regex, case-sensitive or
+partial-word queries scan the node text, once. The ``k`` windows of
+``window`` characters covering the most distinct query terms are cut out,
+widened to word boundaries and the matches highlighted with ``**``.
+
+Indexes are never built on the search path: until a module's index is up to
+date, its results keep the API excerpts while the index is built in the
+background.
+
+Configured by ``KERAG_MCP_SNIPPET_WINDOW`` (default 160) and
+``KERAG_MCP_SNIPPET_K`` (default 2, ``0`` keeps the API excerpts).
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .deadline import expired
+from .handles import module_of
+from .index import IndexStore, ModuleIndex, NodeRecord, tokenize
+
+# Upper bound on matches considered per node
+_MAX_SPANS = 256
+
+Span = Tuple[int, int, str]
+
+
+def match_spans(
+    index: ModuleIndex,
+    record: NodeRecord,
+    query: str,
+    whole_word: bool = False,
+    case_sensitive: bool = False,
+    use_regex: bool = False
+) -> Tuple[List[Span], bool]:
+    """(start, end, term) of the query matches in a node's text, in text order
+
+    Returns:
+        The matches, and whether they came from the postings (no text scan)
+    """
+    if not use_regex and not case_sensitive:
+        spans = []
+        for term in dict.fromkeys(tokenize(query)):
+            offsets = index.term_offsets(record.handle, term)
+            if not offsets and not whole_word:
+                # Partial word ('auth' in 'authentication'): not in the postings
+                break
+            spans.extend((offset, offset + len(term), term) for offset in offsets[:_MAX_SPANS])
+        else:
+            if spans:
+                spans.sort()
+                return spans, True
+
+    pattern = query if use_regex else re.escape(query)
+    if whole_word:
+        pattern = rf"\b{pattern}\b"
+    try:
+        regex = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+    except re.error:
+        return [], False
+    spans = []
+    for match in regex.finditer(record.text):
+        if match.end() > match.start():
+            spans.append((match.start(), match.end(), match.group().lower()))
+            if len(spans) >= _MAX_SPANS:
+                break
+    return spans, False
+
+
+def best_windows(spans: List[Span], window: int, k: int) -> List[Tuple[int, int]]:
+    """Up to ``k`` non-overlapping windows covering the most distinct terms, then the most matches
+
+    Returns:
+        (first match start, last match end) of every window, in text order
+    """
+    remaining = list(spans)
+    windows: List[Tuple[int, int]] = []
+    while remaining and len(windows) < k:
+        best: Optional[Tuple[Tuple[int, int], int, int]] = None
+        end = 0
+        for begin in range(len(remaining)):
+            # Two pointers: extend while the matches still fit in the window
+            end = max(end, begin)
+            while end + 1 < len(remaining) and remaining[end + 1][1] - remaining[begin][0] <= window:
+                end += 1
+            score = (len({span[2] for span in remaining[begin:end + 1]}), end - begin + 1)
+            if best is None or score > best[0]:
+                best = (score, begin, end)
+        _, begin, end = best
+        windows.append((remaining[begin][0], remaining[end][1]))
+        del remaining[begin:end + 1]
+        # Drop matches the chosen window will show anyway
+        lo, hi = windows[-1][0] - window, windows[-1][1] + window
+        remaining = [span for span in remaining if span[1] <= lo or span[0] >= hi]
+    return sorted(windows)
+
+
+def _widen(text: str, start: int, end: int, window: int) -> Tuple[int, int]:
+    """Pad a match range to ``window`` characters, snapped to word boundaries"""
+    pad = max(window - (end - start), 0)
+    lo = max(start - pad // 2, 0)
+    hi = min(lo + max(window, end - start), len(text))
+    lo = max(min(lo, hi - window), 0)
+    if lo > 0:
+        space = text.rfind(" ", lo - 12, lo)
+        lo = space + 1 if space != -1 else lo
+    if hi < len(text):
+        space = text.find(" ", hi, hi + 12)
+        hi = space if space != -1 else hi
+    return lo, hi
+
+
+def render_snippet(text: str, spans: List[Span], window: int, k: int, marker: str = "**") -> Optional[str]:
+    """Highlighted windows of ``text`` around the best matches, with '...' where text was cut"""
+    if not spans:
+        return None
+    parts = []
+    previous_end = 0
+    for start, end in best_windows(spans, window, k):
+        lo, hi = _widen(text, start, end, window)
+        lo = max(lo, previous_end)
+        if lo >= hi:
+            continue
+        previous_end = hi
+        pieces = []
+        cursor = lo
+        for span_start, span_end, _ in spans:
+            if span_start < cursor or span_end > hi:
+                continue
+            pieces.append(text[cursor:span_start])
+            pieces.append(f"{marker}{text[span_start:span_end]}{marker}")
+            cursor = span_end
+        pieces.append(text[cursor:hi])
+        snippet = " ".join("".join(pieces).split())
+        prefix = "..." if lo > 0 else ""
+        suffix = "..." if hi < len(text) else ""
+        parts.append(f"{prefix}{snippet}{suffix}")
+    return " ".join(parts) if parts else None
+
+
+class SnippetEngine:
+    """Replaces search result excerpts with snippets centred on the matches
+
+    Args:
+        window: Characters per snippet window.
+        k: Windows per node (0 disables the engine).
+    """
+
+    def __init__(self, window: int = 160, k: int = 2):
+        self.window = window
+        self.k = k
+        self._lock = threading.Lock()
+        self.snippets = 0
+        self.from_postings = 0
+        self.scanned = 0
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_SNIPPET_WINDOW and KERAG_MCP_SNIPPET_K"""
+        self.window = int(os.environ.get("KERAG_MCP_SNIPPET_WINDOW") or self.window)
+        self.k = int(os.environ.get("KERAG_MCP_SNIPPET_K") or self.k)
+
+    @property
+    def enabled(self) -> bool:
+        return self.k > 0 and self.window > 0
+
+    def annotate(
+        self,
+        results: List[Dict[str, Any]],
+        index_store: IndexStore,
+        api,
+        query: str,
+        whole_word: bool = False,
+        case_sensitive: bool = False,
+        use_regex: bool = False
+    ) -> int:
+        """Set the ``excerpt`` of every content match to a snippet built from the index
+
+        Results whose match is only in the title or label, or whose module
+        has no up-to-date index, keep the excerpt returned by the API, as do
+        the remaining results once the current call's deadline has passed.
+        A missing or stale index is built in the background (see
+        ``IndexStore.schedule``) for the next searches; must be called from
+        the event loop.
+
+        Returns:
+            Number of excerpts replaced
+        """
+        if not self.enabled:
+            return 0
+        replaced = from_postings = 0
+        indexes: Dict[str, Optional[ModuleIndex]] = {}
+        for item in results:
+            if expired():
+                break
+            node_id = item.get("node_id") or item.get("id")
+            if not node_id or item.get("type") == "section":
+                continue
+            module_name = module_of(node_id)
+            if module_name not in indexes:
+                indexes[module_name] = index_store.ready(module_name)
+                if indexes[module_name] is None:
+                    index_store.schedule(api, module_name)
+            index = indexes[module_name]
+            if index is None:
+                continue
+            with index.lock:
+                record = index.record(node_id)
+                if record is None:
+                    continue
+                spans, indexed = match_spans(index, record, query, whole_word, case_sensitive, use_regex)
+            # Only content matches make a snippet; offsets are shifted past title and label
+            base = record.content_offset
+            spans = [(start - base, end - base, term) for start, end, term in spans if start >= base]
+            snippet = render_snippet(record.content, spans, self.window, self.k)
+            if snippet:
+                item["excerpt"] = snippet
+                replaced += 1
+                from_postings += indexed
+        with self._lock:
+            self.snippets += replaced
+            self.from_postings += from_postings
+            self.scanned += replaced - from_postings
+        return replaced
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window": self.window,
+                "k": self.k,
+                "snippets": self.snippets,
+                "from_postings": self.from_postings,
+                "scanned": self.scanned,
+            }
+
+
+# Global snippet engine instance
+_snippet_engine: Optional[SnippetEngine] = None
+_snippet_engine_lock = threading.Lock()
+
+
+def get_snippet_engine() -> SnippetEngine:
+    """Get the global snippet engine (configured from the environment on first use)"""
+    global _snippet_engine
+
+    if _snippet_engine is None:
+        with _snippet_engine_lock:
+            if _snippet_engine is None:
+                engine = SnippetEngine()
+                engine.configure_from_env()
+                _snippet_engine = engine
+
+    return _snippet_engine
@@ -0,0 +1,454 @@
+"""
+Synthetic KERAG knowledge modules for benchmarking.
+
+``SyntheticForest`` deterministically generates modules of a configurable
+size, depth and fan-out, and ``SyntheticKERAGAPI`` serves them through the
+same response contract as ``kerag.api.KERAGAPI`` (``{"success", "data",
+"metadata"}`` dictionaries), so the real MCP tool functions can be driven
+without any modules installed on disk.
+"""
+
+import random
+import re
+from typing import Dict, List, Optional, Any
+
+ROOT_ID = "::ROOT"
+
+_SYLLABLES = [
+    "ka", "ne", "ro", "ti", "lu", "mo", "sa", "ve", "di", "pa",
+    "zu", "ha", "qi", "fe", "no", "gu", "be", "xi", "ta", "we",
+]
+
+
+def _make_vocabulary(rng: random.Random, size: int) -> List[str]:
+    """Generate ``size`` distinct pseudo-words"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+class SyntheticForest:
+    """Deterministic forest of synthetic knowledge modules
+
+    Args:
+        modules: Number of modules to generate.
+        depth: Depth of every module tree (the module root is depth 0).
+        fanout: Number of children of every section node.
+        words: Number of words in the body of every node.
+        vocabulary: Size of the vocabulary the bodies are drawn from.
+        see_also: Probability that a content node references another node.
+        seed: Random seed; identical arguments always yield identical forests.
+    """
+
+    def __init__(
+        self,
+        modules: int = 4,
+        depth: int = 3,
+        fanout: int = 6,
+        words: int = 120,
+        vocabulary: int = 2000,
+        see_also: float = 0.1,
+        seed: int = 0
+    ):
+        self.config = {
+            "modules": modules,
+            "depth": depth,
+            "fanout": fanout,
+            "words": words,
+            "vocabulary": vocabulary,
+            "see_also": see_also,
+            "seed": seed,
+        }
+        rng = random.Random(seed)
+        self.vocabulary = _make_vocabulary(rng, vocabulary)
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.parents: Dict[str, str] = {}
+        self.module_names: List[str] = [f"synth{i:02d}" for i in range(modules)]
+
+        for name in self.module_names:
+            self._build_module(rng, name, depth, fanout, words)
+
+        content_ids = [nid for nid, node in self.nodes.items() if node["type"] == "content"]
+        for nid in content_ids:
+            if rng.random() < see_also:
+                self.nodes[nid]["see_also"] = [rng.choice(content_ids)]
+
+    def _body(self, rng: random.Random, words: int) -> str:
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(6, 16))
+            sentence = " ".join(rng.choice(self.vocabulary) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            remaining -= length
+        return " ".join(sentences)
+
+    def _build_module(self, rng: random.Random, name: str, depth: int, fanout: int, words: int) -> None:
+        root_id = f"{name}::{name}"
+        self._add_node(rng, root_id, name, f"{name.capitalize()} Handbook", ROOT_ID, "section", words)
+        frontier = [(root_id, "")]
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for parent_id, prefix in frontier:
+                for i in range(1, fanout + 1):
+                    number = f"{prefix}.{i}" if prefix else str(i)
+                    is_leaf = level == depth
+                    label = f"c{number}" if is_leaf else f"s{number}"
+                    title = " ".join(rng.choice(self.vocabulary) for _ in range(3)).title()
+                    node_id = f"{name}::{label}"
+                    self._add_node(rng, node_id, label, title, parent_id,
+                                   "content" if is_leaf else "section", words)
+                    if not is_leaf:
+                        next_frontier.append((node_id, number))
+            frontier = next_frontier
+
+    def _add_node(self, rng, node_id, label, title, parent_id, node_type, words) -> None:
+        self.nodes[node_id] = {
+            "node_id": node_id,
+            "type": node_type,
+            "title": title,
+            "label": label,
+            "content": self._body(rng, words),
+            "children": [],
+            "see_also": [],
+        }
+        self.parents[node_id] = parent_id
+        if parent_id in self.nodes:
+            self.nodes[parent_id]["children"].append(node_id)
+
+    def module_of(self, node_id: str) -> str:
+        return node_id.split("::", 1)[0]
+
+    def module_node_ids(self, module_name: str) -> List[str]:
+        prefix = f"{module_name}::"
+        return [nid for nid in self.nodes if nid.startswith(prefix)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "modules": len(self.module_names),
+            "nodes": len(self.nodes),
+            "content_bytes": sum(len(node["content"]) for node in self.nodes.values()),
+        }
+
+
+class SyntheticKERAGAPI:
+    """In-memory stand-in for ``KERAGAPI`` serving a ``SyntheticForest``"""
+
+    def __init__(
+        self,
+        forest: SyntheticForest,
+        local_root: Optional[str] = None,
+        global_root: Optional[str] = None,
+        lang: Optional[str] = None
+    ):
+        self.forest = forest
+        self.local_root = local_root or "<synthetic-local>"
+        self.global_root = global_root or "<synthetic-global>"
+        self.lang = lang or "en"
+        self.loaded: List[str] = []
+        self.current = ROOT_ID
+        self.history: List[str] = [ROOT_ID]
+        self.history_pos = 0
+
+    # --- helpers ---
+
+    @staticmethod
+    def _ok(data: Any, **metadata) -> Dict[str, Any]:
+        return {"success": True, "data": data, "metadata": metadata}
+
+    @staticmethod
+    def _fail(error: str, **metadata) -> Dict[str, Any]:
+        return {"success": False, "error": error, "metadata": metadata}
+
+    def _node(self, node_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        node_id = node_id or self.current
+        if node_id in self.forest.nodes and self.forest.module_of(node_id) in self.loaded:
+            return self.forest.nodes[node_id]
+        return None
+
+    def _resolve(self, node_id: Optional[str]) -> Optional[str]:
+        if not node_id:
+            return self.current
+        if node_id == ROOT_ID:
+            return ROOT_ID
+        if "::" not in node_id:
+            node_id = f"{node_id}::{node_id}"
+        return node_id if self._node(node_id) else None
+
+    def _summary(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "node_id": node["node_id"],
+            "id": node["node_id"],
+            "type": node["type"],
+            "title": node["title"],
+            "label": node["label"],
+        }
+
+    def _breadcrumb(self, node_id: str) -> List[Dict[str, Any]]:
+        path = []
+        while node_id and node_id != ROOT_ID:
+            path.append({"id": node_id, "title": self.forest.nodes[node_id]["title"]})
+            node_id = self.forest.parents[node_id]
+        path.append({"id": ROOT_ID, "title": "ROOT"})
+        return list(reversed(path))
+
+    def _children(self, node_id: str) -> List[str]:
+        if node_id == ROOT_ID:
+            return [f"{name}::{name}" for name in self.loaded]
+        return list(self.forest.nodes[node_id]["children"])
+
+    def _go(self, node_id: str, record: bool = True) -> Dict[str, Any]:
+        if record and node_id != self.current:
+            del self.history[self.history_pos + 1:]
+            self.history.append(node_id)
+            self.history_pos = len(self.history) - 1
+        self.current = node_id
+        if node_id == ROOT_ID:
+            data = {"node_id": ROOT_ID, "type": "section", "title": "ROOT",
+                    "children_preview": [self._summary(self.forest.nodes[c]) for c in self._children(ROOT_ID)]}
+        else:
+            node = self.forest.nodes[node_id]
+            data = dict(self._summary(node), content=node["content"],
+                        children_preview=[self._summary(self.forest.nodes[c]) for c in node["children"]])
+        return self._ok(data, node_id=node_id, breadcrumb=self._breadcrumb(node_id))
+
+    # --- modules ---
+
+    def list_modules(self, scope: str = "both") -> Dict[str, Any]:
+        modules = {
+            name: {"version": "1.0.0", "description": f"Synthetic module {name}"}
+            for name in self.forest.module_names
+        }
+        data = {
+            "modules": {
+                "local": {} if scope in ("both", "local") else None,
+                "global": modules if scope in ("both", "global") else None,
+            },
+            "loaded_modules": list(self.loaded),
+            "local_root": self.local_root,
+            "global_root": self.global_root,
+        }
+        data["modules"] = {k: v for k, v in data["modules"].items() if v is not None}
+        return self._ok(data)
+
+    def get_all_modules(self) -> Dict[str, Any]:
+        modules = []
+        for name in self.forest.module_names:
+            modules.append({
+                "name": name,
+                "version": "1.0.0",
+                "file_count": len(self.forest.module_node_ids(name)),
+                "loaded": name in self.loaded,
+            })
+        return self._ok({"modules": modules})
+
+    def load_module(self, module_name: str) -> Dict[str, Any]:
+        if module_name not in self.forest.module_names:
+            return self._fail(f"Module not found: {module_name}")
+        if module_name not in self.loaded:
+            self.loaded.append(module_name)
+        count = len(self.forest.module_node_ids(module_name))
+        return self._ok({"name": module_name, "file_count": count}, loaded_nodes=count)
+
+    def unload_module(self, module_name: str) -> Dict[str, Any]:
+        if module_name not in self.loaded:
+            return self._fail(f"Module not loaded: {module_name}")
+        self.loaded.remove(module_name)
+        if self.current != ROOT_ID and self.forest.module_of(self.current) == module_name:
+            self.current = ROOT_ID
+        return self._ok({"name": module_name})
+
+    def get_loaded_roots(self) -> Dict[str, Any]:
+        roots = [{"id": ROOT_ID, "title": "ROOT"}]
+        for name in self.loaded:
+            root = self.forest.nodes[f"{name}::{name}"]
+            roots.append({"id": root["node_id"], "title": root["title"]})
+        return self._ok(roots)
+
+    def get_status(self) -> Dict[str, Any]:
+        total = sum(len(self.forest.module_node_ids(name)) for name in self.loaded)
+        return self._ok({
+            "total_nodes": total,
+            "loaded_modules": len(self.loaded),
+            "available_modules": len(self.forest.module_names),
+            "local_root": self.local_root,
+            "global_root": self.global_root,
+            "lang": self.lang,
+            "current_node": self.current,
+        })
+
+    # --- queries ---
+
+    def search(
+        self,
+        keyword: str,
+        search_under: Optional[str] = None,
+        order: str = "priority",
+        max_results: int = 50,
+        whole_word: bool = False,
+        case_sensitive: bool = False,
+        use_regex: bool = False
+    ) -> Dict[str, Any]:
+        pattern = keyword if use_regex else re.escape(keyword)
+        if whole_word:
+            pattern = rf"\b{pattern}\b"
+        try:
+            regex = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            return self._fail(f"Invalid regex: {e}")
+
+        if search_under:
+            start = self._resolve(search_under)
+            if not start:
+                return self._fail(f"Node not found: {search_under}")
+            starts = [start]
+        else:
+            starts = self._children(ROOT_ID)
+
+        matches = []
+        position = 0
+        stack = list(reversed(starts))
+        while stack:
+            node_id = stack.pop()
+            if node_id == ROOT_ID:
+                stack.extend(reversed(self._children(ROOT_ID)))
+                continue
+            node = self.forest.nodes[node_id]
+            stack.extend(reversed(node["children"]))
+            position += 1
+            for priority, field in enumerate(("title", "content", "label")):
+                found = regex.search(node[field])
+                if found:
+                    text = node[field]
+                    start = max(found.start() - 60, 0)
+                    result = self._summary(node)
+                    result["excerpt"] = text[start:found.end() + 60]
+                    matches.append((priority, position, result))
+                    break
+
+        if order == "priority":
+            matches.sort(key=lambda m: (m[0], m[1]))
+        results = [m[2] for m in matches[:max_results]]
+        return self._ok(results, total=len(matches), query=keyword)
+
+    def get_node_view(
+        self,
+        node_id: Optional[str] = None,
+        depth: int = 1,
+        format: str = "markdown",
+        include_content: bool = True,
+        include_see_also: bool = True
+    ) -> Dict[str, Any]:
+        resolved = self._resolve(node_id)
+        if not resolved or resolved == ROOT_ID:
+            return self._fail(f"Node not found: {node_id}")
+        node = self.forest.nodes[resolved]
+
+        lines = []
+
+        def render(nid: str, level: int) -> None:
+            n = self.forest.nodes[nid]
+            lines.append(f"{'#' * min(level + 1, 6)} {n['title']} [@{nid}]")
+            if include_content and level == 0:
+                lines.append(n["content"])
+            elif level > 0:
+                lines.append(f"[{n['type']}] {n['content'][:77]} ... ...")
+            if include_see_also and n["see_also"]:
+                lines.append("See also: " + ", ".join(f"@{ref}" for ref in n["see_also"]))
+            lines.append("")
+            if level < depth:
+                for child in n["children"]:
+                    render(child, level + 1)
+
+        render(resolved, 0)
+        text = "\n".join(lines)
+        node_data = dict(self._summary(node), content=node["content"], see_also=list(node["see_also"]))
+        return self._ok({"node": node_data, "formatted_content": {format: text}}, node_id=resolved)
+
+    def get_children(self, node_id: Optional[str] = None) -> Dict[str, Any]:
+        resolved = self._resolve(node_id)
+        if not resolved:
+            return self._fail(f"Node not found: {node_id}")
+        return self._ok(self._children(resolved))
+
+    def get_parent(self, node_id: Optional[str] = None) -> Dict[str, Any]:
+        resolved = self._resolve(node_id)
+        if not resolved or resolved == ROOT_ID:
+            return self._fail(f"Node not found: {node_id}")
+        parent_id = self.forest.parents[resolved]
+        if parent_id == ROOT_ID:
+            return self._ok({"node_id": ROOT_ID, "title": "ROOT", "label": "ROOT", "type": "section"})
+        return self._ok(self._summary(self.forest.nodes[parent_id]))
+
+    def preview_children(self, node_id: Optional[str] = None, node_type: str = "all", order: str = "order") -> Dict[str, Any]:
+        resolved = self._resolve(node_id)
+        if not resolved:
+            return self._fail(f"Node not found: {node_id}")
+        previews = []
+        for child_id in self._children(resolved):
+            child = self.forest.nodes[child_id]
+            if node_type != "all" and child["type"] != node_type:
+                continue
+            preview = self._summary(child)
+            preview["content_preview"] = child["content"][:120]
+            previews.append(preview)
+        return self._ok(previews)
+
+    def get_breadcrumb(self, node_id: Optional[str] = None) -> Dict[str, Any]:
+        resolved = self._resolve(node_id)
+        if not resolved:
+            return self._fail(f"Node not found: {node_id}")
+        return self._ok(self._breadcrumb(resolved))
+
+    # --- navigation ---
+
+    def navigate_to(self, target: str) -> Dict[str, Any]:
+        if target.isdigit():
+            children = self._children(self.current)
+            index = int(target) - 1
+            if not 0 <= index < len(children):
+                return self._fail(f"Child index out of range: {target}")
+            return self._go(children[index])
+
+        if target.startswith("::") and target != ROOT_ID and self.current != ROOT_ID:
+            target = f"{self.forest.module_of(self.current)}{target}"
+
+        resolved = self._resolve(target)
+        if resolved:
+            if resolved == self.current:
+                return self._ok({"already_at_target": True}, node_id=resolved,
+                                breadcrumb=self._breadcrumb(resolved))
+            return self._go(resolved)
+
+        candidates = [
+            nid for nid, node in self.forest.nodes.items()
+            if self.forest.module_of(nid) in self.loaded and target in (node["label"], node["title"])
+        ]
+        if len(candidates) == 1:
+            return self._go(candidates[0])
+        if candidates:
+            return self._fail("Ambiguous target", candidates=candidates[:20])
+        return self._fail(f"Node not found: {target}")
+
+    def navigate_back(self, steps: int = 1) -> Dict[str, Any]:
+        if self.history_pos == 0:
+            return self._fail("No history to go back")
+        self.history_pos = max(self.history_pos - steps, 0)
+        return self._go(self.history[self.history_pos], record=False)
+
+    def navigate_forward(self, steps: int = 1) -> Dict[str, Any]:
+        if self.history_pos >= len(self.history) - 1:
+            return self._fail("No history to go forward")
+        self.history_pos = min(self.history_pos + steps, len(self.history) - 1)
+        return self._go(self.history[self.history_pos], record=False)
+
+    def up(self, levels: int = 1) -> Dict[str, Any]:
+        node_id = self.current
+        if node_id == ROOT_ID:
+            return self._fail("Already at root")
+        for _ in range(levels):
+            if node_id == ROOT_ID:
+                break
+            node_id = self.forest.parents[node_id]
+        return self._go(node_id)
@@ -0,0 +1,623 @@
+"""
+Offline vector similarity search over node content.
+
+``knowledge_search(mode="semantic")`` ranks nodes by the cosine similarity
+of TF-IDF vectors instead of matching the query text, so a query phrased
+differently from a node (other word order, other word forms, only some of
+its words) still finds it. Nothing leaves the machine and no GPU is needed:
+
+- every node of a module snapshot (``index.py``) becomes a TF-IDF vector over
+  ``KERAG_MCP_VECTOR_DIM`` hashed features: its words, stemmed so that
+  'authenticate' and 'authentication' are one feature (title words count
+  twice), and the character pairs of unsegmented (CJK) text;
+- the vectors are stored feature-major as a sparse float32 matrix (per
+  feature: node numbers and weights) in a file under
+  ``KERAG_MCP_VECTOR_DIR`` and memory-mapped. A query reads only the rows of
+  the features it has, accumulates the scores of every node in one pass
+  (``numpy.bincount`` when NumPy is installed) and keeps the top k;
+- with NumPy and ``KERAG_MCP_VECTOR_LSA`` > 0, the matrix is reduced to that
+  many dimensions by latent semantic analysis (a randomized truncated SVD),
+  which also relates words that occur in the same nodes. The reduced node
+  vectors are a dense float32 matrix and a query is one matrix-vector
+  product.
+
+The file name carries a fingerprint of the snapshot (node ids and content
+hashes) and of the settings, so a restart or a reload of an unchanged
+module maps the existing file instead of recomputing it. The files live in
+a per-user cache directory; a file is checked (header, array bounds, node
+numbers) before it is used and rebuilt if damaged. A store only deletes
+the files it replaced itself.
+
+The vectors of a module are built on its first semantic search. With
+``KERAG_MCP_VECTORS=1`` they are built in a background thread as soon as
+the module is loaded, which walks the module through KERAGAPI alongside the
+tool calls: only for a KERAG whose API tolerates concurrent calls.
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .deadline import expired, truncate
+from .handles import module_of
+from .index import IndexStore, ModuleIndex, NodeRecord, get_index_store, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # Optional: vectorised scoring and LSA
+    np = None
+
+logger = logging.getLogger("kerag_mcp")
+
+# Bumped whenever feature extraction or the file layout changes
+FEATURE_VERSION = 1
+
+_MAGIC = b"KMCPVEC1"
+_HEADER = struct.Struct("<8sI")
+
+# Title words count this many times
+_TITLE_WEIGHT = 2.0
+
+# Suffixes stripped by stem(), longest first
+_SUFFIXES = ("ments", "ment", "ness", "ings", "ing", "ions", "ion", "ies", "ied",
+             "ers", "er", "ed", "es", "ly", "s", "e")
+_STEM_MIN = 3
+
+# Tokens with characters from here on (CJK and later blocks) are compared by character pairs
+_CJK_START = 0x2E80
+
+# Randomized SVD: extra sampled dimensions and power iterations
+_LSA_OVERSAMPLE = 10
+_LSA_ITERATIONS = 2
+
+# Length of the excerpt of a result whose content does not contain the query words
+_EXCERPT_CHARS = 160
+
+# Arrays of a vector file, in file order: (name, typecode)
+_ARRAYS = (("dims", "i"), ("idf", "f"), ("indptr", "i"), ("indices", "i"), ("weights", "f"),
+           ("projection", "f"), ("matrix", "f"))
+
+
+def default_directory() -> str:
+    """Per-user cache directory of the vector files (under $XDG_CACHE_HOME, or ~/.cache)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "kerag_mcp", "vectors")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def stem(token: str) -> str:
+    """Crude suffix stripping so that word forms share a feature ('authenticate', 'authentication')"""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _STEM_MIN:
+            token = token[:-len(suffix)]
+            break
+    if token.endswith("e") and len(token) > _STEM_MIN:
+        token = token[:-1]
+    return token
+
+
+def _in_order(values) -> bool:
+    """The values never decrease"""
+    if np is not None:
+        return bool((np.diff(values) >= 0).all())
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+def _in_range(values, stop: int) -> bool:
+    """Every value is in ``range(stop)``"""
+    if not len(values):
+        return True
+    if np is not None:
+        return bool(values.min() >= 0 and values.max() < stop)
+    return min(values) >= 0 and max(values) < stop
+
+
+class ModuleVectors:
+    """Memory-mapped vectors of one module snapshot
+
+    ``dims`` lists the hashed features that occur in the module (sorted),
+    with their ``idf``. The TF-IDF matrix is stored per feature:
+    ``indices[indptr[u]:indptr[u + 1]]`` are the nodes having feature
+    ``dims[u]`` and ``weights`` the matching (normalized) values. With LSA,
+    ``projection`` (features x lsa) maps a query into the reduced space and
+    ``matrix`` (lsa x nodes) holds the reduced node vectors.
+    """
+
+    def __init__(self, path: str, module_name: Optional[str] = None, fingerprint: Optional[str] = None):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"Truncated vector file: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._load(module_name, fingerprint)
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self, module_name: Optional[str], fingerprint: Optional[str]) -> None:
+        """Read the header and map the arrays, checking them against the file
+
+        Raises:
+            ValueError: If the file is not a complete vector file of this
+                feature version (and of ``module_name``/``fingerprint`` when given).
+        """
+        size = len(self._mmap)
+        magic, header_len = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or _HEADER.size + header_len > size:
+            raise ValueError(f"Not a vector file: {self.path}")
+        header = json.loads(self._mmap[_HEADER.size:_HEADER.size + header_len].decode("utf-8"))
+        if header.get("version") != FEATURE_VERSION:
+            raise ValueError(f"Vector file of another feature version: {self.path}")
+        if module_name is not None and header.get("module") != module_name \
+                or fingerprint is not None and header.get("fingerprint") != fingerprint:
+            raise ValueError(f"Vector file of another snapshot: {self.path}")
+        self.module_name: str = header["module"]
+        self.fingerprint: str = header["fingerprint"]
+        self.dim: int = header["dim"]
+        self.lsa: int = header["lsa"]
+        self.node_ids: List[str] = header["node_ids"]
+        arrays = {}
+        for name, typecode in _ARRAYS:
+            offset, count = header["arrays"][name]
+            if offset < _HEADER.size + header_len or offset % 4 or count < 0 or offset + 4 * count > size:
+                raise ValueError(f"Vector file array '{name}' out of bounds: {self.path}")
+            if np is not None:
+                arrays[name] = np.frombuffer(self._mmap, np.int32 if typecode == "i" else np.float32, count, offset)
+            else:
+                arrays[name] = memoryview(self._mmap)[offset:offset + 4 * count].cast(typecode)
+        self.dims = arrays["dims"]
+        self.idf = arrays["idf"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.weights = arrays["weights"]
+        # Scoring indexes the node list and the rows with these values: they must stay in range
+        nodes, features = len(self.node_ids), len(self.dims)
+        if (len(self.idf) != features or len(self.indptr) != features + 1
+                or len(self.weights) != len(self.indices) or self.indptr[0] != 0
+                or self.indptr[features] != len(self.indices)
+                or not _in_order(self.indptr) or not _in_range(self.indices, nodes)):
+            raise ValueError(f"Inconsistent vector file: {self.path}")
+        self.projection = self.matrix = None
+        if np is not None and self.lsa:
+            if len(arrays["projection"]) != features * self.lsa or len(arrays["matrix"]) != self.lsa * nodes:
+                raise ValueError(f"Inconsistent vector file: {self.path}")
+            self.projection = arrays["projection"].reshape(features, self.lsa)
+            self.matrix = arrays["matrix"].reshape(self.lsa, nodes)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mmap)
+
+    def query_vector(self, counts: Dict[int, float]) -> Dict[int, float]:
+        """Normalized TF-IDF weights of a query by feature number (features unknown to the module dropped)"""
+        weights = {}
+        for d, c in counts.items():
+            u = bisect_left(self.dims, d)
+            if u < len(self.dims) and self.dims[u] == d:
+                weights[u] = (1 + math.log(c)) * float(self.idf[u])
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {u: w / norm for u, w in weights.items()}
+
+    def top(self, counts: Dict[int, float], k: int,
+            accept: Optional[Callable[[str], bool]] = None) -> Tuple[List[Tuple[float, str]], int]:
+        """The ``k`` nodes most similar to a query, and the number of nodes with a positive score"""
+        query = self.query_vector(counts)
+        if not query:
+            return [], 0
+        if np is not None:
+            return self._top_numpy(query, k, accept)
+
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for u, w in query.items():
+            start, end = self.indptr[u], self.indptr[u + 1]
+            for i, v in zip(self.indices[start:end], self.weights[start:end]):
+                scores[i] = get(i, 0.0) + w * v
+        items = [(score, self.node_ids[i]) for i, score in scores.items() if score > 0]
+        if accept is not None:
+            items = [item for item in items if accept(item[1])]
+        return heapq.nlargest(k, items), len(items)
+
+    def _top_numpy(self, query: Dict[int, float], k: int,
+                   accept: Optional[Callable[[str], bool]]) -> Tuple[List[Tuple[float, str]], int]:
+        if self.lsa:
+            reduced = np.zeros(self.lsa, np.float32)
+            for u, w in query.items():
+                reduced += w * self.projection[u]
+            norm = float(np.linalg.norm(reduced))
+            if not norm:
+                return [], 0
+            scores = (reduced / norm) @ self.matrix
+        else:
+            spans = [(self.indptr[u], self.indptr[u + 1], w) for u, w in query.items()]
+            scores = np.bincount(np.concatenate([self.indices[start:end] for start, end, _ in spans]),
+                                 weights=np.concatenate([self.weights[start:end] * w for start, end, w in spans]),
+                                 minlength=len(self.node_ids))
+        candidates = np.flatnonzero(scores > 0)
+        if accept is not None:
+            candidates = np.array([i for i in candidates.tolist() if accept(self.node_ids[i])], np.int64)
+        total = len(candidates)
+        if total > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[i]), self.node_ids[i]) for i in best.tolist()], total
+
+    def close(self) -> None:
+        self.dims = self.idf = self.indptr = self.indices = self.weights = None
+        self.projection = self.matrix = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A search still holds a view; the map is released with it
+            pass
+
+
+class VectorStore:
+    """Builds, persists and searches the vectors of the loaded modules
+
+    Args:
+        index_store: Store providing the module snapshots.
+        dim: Size of the hashed feature space.
+        lsa: LSA dimensions (needs NumPy; 0 keeps the sparse TF-IDF vectors).
+        directory: Where vector files are written.
+    """
+
+    def __init__(self, index_store: IndexStore, dim: int = 1 << 20, lsa: int = 0, directory: Optional[str] = None):
+        self.prebuild = False
+        self.dim = dim
+        self.lsa = lsa
+        self.directory = directory or default_directory()
+        self._index_store = index_store
+        # module -> (index version, vectors)
+        self._vectors: Dict[str, Tuple[int, ModuleVectors]] = {}
+        self._features: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.built = 0
+        self.mapped = 0
+        self.build_ms = 0.0
+        self.searches = 0
+
+    def configure_from_env(self) -> None:
+        """Apply KERAG_MCP_VECTORS, KERAG_MCP_VECTOR_DIM, KERAG_MCP_VECTOR_LSA and KERAG_MCP_VECTOR_DIR"""
+        self.prebuild = os.environ.get("KERAG_MCP_VECTORS", "0") not in ("0", "false", "no")
+        self.dim = int(os.environ.get("KERAG_MCP_VECTOR_DIM") or self.dim)
+        self.lsa = int(os.environ.get("KERAG_MCP_VECTOR_LSA") or self.lsa)
+        self.directory = os.environ.get("KERAG_MCP_VECTOR_DIR") or self.directory
+
+    @property
+    def lsa_dims(self) -> int:
+        """LSA dimensions actually used (0 without NumPy)"""
+        return self.lsa if np is not None else 0
+
+    # --- features ---
+
+    def _token_features(self, token: str) -> Tuple[int, ...]:
+        dims = self._features.get(token)
+        if dims is None:
+            if any(ord(c) >= _CJK_START for c in token):
+                # Unsegmented scripts: one token per run of characters, compared by character pairs
+                features = [token[i:i + 2] for i in range(max(len(token) - 1, 1))]
+            else:
+                features = [stem(token)]
+            # crc32 rather than hash(): features must map to the same numbers after a restart
+            dims = tuple(zlib.crc32(feature.encode("utf-8")) % self.dim for feature in features)
+            if len(self._features) < 500000:
+                self._features[token] = dims
+        return dims
+
+    def features(self, text: str, weight: float = 1.0, counts: Optional[Dict[int, float]] = None) -> Dict[int, float]:
+        """Hashed feature counts of ``text`` (added to ``counts`` if given)"""
+        counts = {} if counts is None else counts
+        for token, tf in Counter(tokenize(text)).items():
+            for d in self._token_features(token):
+                counts[d] = counts.get(d, 0.0) + tf * weight
+        return counts
+
+    # --- building and persistence ---
+
+    def _fingerprint(self, index: ModuleIndex) -> str:
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(f"{FEATURE_VERSION}:{self.dim}:{self.lsa_dims}\x00".encode())
+        for handle in index.order:
+            record = index.nodes[handle]
+            digest.update(record.node_id.encode("utf-8", "surrogatepass"))
+            digest.update(record.content_hash)
+        return digest.hexdigest()
+
+    def _path(self, module_name: str, fingerprint: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in module_name)
+        return os.path.join(self.directory, f"{safe}-{fingerprint}.vec")
+
+    def get(self, api, module_name: str) -> ModuleVectors:
+        """Vectors of a loaded module: cached, mapped from disk, or built and written"""
+        return self._vectors_of(module_name, self._index_store.get(api, module_name))
+
+    def _vectors_of(self, module_name: str, index: ModuleIndex) -> ModuleVectors:
+        with self._lock:
+            cached = self._vectors.get(module_name)
+        if cached is not None and cached[0] == index.version:
+            return cached[1]
+        with self._build_lock:
+            with self._lock:
+                cached = self._vectors.get(module_name)
+            if cached is not None and cached[0] == index.version:
+                return cached[1]
+            with index.lock:
+                version = index.version
+                fingerprint = self._fingerprint(index)
+                records = [index.nodes[handle] for handle in index.order]
+            path = self._path(module_name, fingerprint)
+            vectors = self._map(path, module_name, fingerprint)
+            if vectors is not None:
+                with self._lock:
+                    self.mapped += 1
+            else:
+                self._build(module_name, records, fingerprint, path)
+                vectors = ModuleVectors(path, module_name, fingerprint)
+            with self._lock:
+                old = self._vectors.get(module_name)
+                self._vectors[module_name] = (version, vectors)
+            if old is not None:
+                old[1].close()
+                if old[1].path != path:
+                    # This process replaced the file; other snapshots' files are left alone
+                    _remove(old[1].path)
+        return vectors
+
+    @staticmethod
+    def _map(path: str, module_name: str, fingerprint: str) -> Optional[ModuleVectors]:
+        """Map an existing vector file, or None if there is none or it is damaged"""
+        if not os.path.exists(path):
+            return None
+        try:
+            return ModuleVectors(path, module_name, fingerprint)
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            logger.warning("vectors: rebuilding %s, unusable file %s: %s", module_name, path, e)
+            _remove(path)
+            return None
+
+    def _build(self, module_name: str, records: List[NodeRecord], fingerprint: str, path: str) -> None:
+        start = time.perf_counter()
+        count = len(records)
+
+        rows: List[Dict[int, float]] = []
+        df: Dict[int, int] = {}
+        for record in records:
+            counts = self.features(record.title, _TITLE_WEIGHT)
+            self.features(record.label, 1.0, counts)
+            self.features(record.content, 1.0, counts)
+            rows.append(counts)
+            for d in counts:
+                df[d] = df.get(d, 0) + 1
+        dims = sorted(df)
+        column = {d: u for u, d in enumerate(dims)}
+        idf = [math.log((1 + count) / (1 + df[d])) + 1 for d in dims]
+
+        # Feature-major sparse matrix of the normalized TF-IDF node vectors
+        postings: List[List[Tuple[int, float]]] = [[] for _ in dims]
+        for i, counts in enumerate(rows):
+            weights = {column[d]: (1 + math.log(c)) * idf[column[d]] for d, c in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for u, w in weights.items():
+                postings[u].append((i, w / norm))
+        indptr = array("i", [0])
+        indices, weights = array("i"), array("f")
+        for posting in postings:
+            for i, w in posting:
+                indices.append(i)
+                weights.append(w)
+            indptr.append(len(indices))
+
+        lsa = min(self.lsa_dims, len(dims), count)
+        projection, matrix = array("f"), array("f")
+        if lsa:
+            projection, matrix = self._lsa(indptr, indices, weights, len(dims), count, lsa)
+
+        arrays = {"dims": array("i", dims), "idf": array("f", idf), "indptr": indptr, "indices": indices,
+                  "weights": weights, "projection": projection, "matrix": matrix}
+        header = {
+            "module": module_name,
+            "fingerprint": fingerprint,
+            "version": FEATURE_VERSION,
+            "dim": self.dim,
+            "lsa": lsa,
+            "node_ids": [record.node_id for record in records],
+        }
+        # Array offsets depend on the header length: settle them before writing
+        offsets: Dict[str, Tuple[int, int]] = {}
+        while True:
+            encoded = json.dumps(dict(header, arrays=offsets), ensure_ascii=False).encode("utf-8")
+            position = -(-(_HEADER.size + len(encoded)) // 16) * 16
+            wanted = {}
+            for name, _ in _ARRAYS:
+                wanted[name] = [position, len(arrays[name])]
+                position += 4 * len(arrays[name])
+            if wanted == offsets:
+                break
+            offsets = wanted
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(encoded)))
+            f.write(encoded)
+            f.write(b"\x00" * (offsets["dims"][0] - _HEADER.size - len(encoded)))
+            for name, _ in _ARRAYS:
+                f.write(arrays[name].tobytes())
+        os.replace(tmp_path, path)
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.built += 1
+            self.build_ms += duration_ms
+        logger.info("vectors: %s built (%d nodes, %d features, %d weights, lsa %d) in %.1f ms",
+                    module_name, count, len(dims), len(weights), lsa, duration_ms)
+
+    @staticmethod
+    def _lsa(indptr: array, indices: array, weights: array, features: int, count: int,
+             lsa: int) -> Tuple[array, array]:
+        """Randomized truncated SVD of the (count x features) TF-IDF matrix
+
+        Returns:
+            The (features x lsa) projection and the (lsa x count) normalized reduced node vectors
+        """
+        nodes = np.frombuffer(indices, np.int32)
+        values = np.frombuffer(weights, np.float32).astype(np.float64)
+        cols = np.repeat(np.arange(features), np.diff(np.frombuffer(indptr, np.int32)))
+
+        def times(x):  # A @ x
+            return np.stack([np.bincount(nodes, weights=values * x[cols, j], minlength=count)
+                             for j in range(x.shape[1])], axis=1)
+
+        def times_t(y):  # A.T @ y
+            return np.stack([np.bincount(cols, weights=values * y[nodes, j], minlength=features)
+                             for j in range(y.shape[1])], axis=1)
+
+        rank = min(lsa + _LSA_OVERSAMPLE, features, count)
+        basis, _ = np.linalg.qr(times(np.random.default_rng(0).standard_normal((features, rank))))
+        for _ in range(_LSA_ITERATIONS):
+            basis, _ = np.linalg.qr(times(times_t(basis)))
+        # B = Q.T @ A is small (rank x features); its right singular vectors span the LSA subspace
+        _, _, vt = np.linalg.svd(times_t(basis).T, full_matrices=False)
+        projection = np.ascontiguousarray(vt[:lsa].T, np.float32)
+        reduced = times(projection.astype(np.float64))
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = np.ascontiguousarray((reduced / norms).T, np.float32)
+        return array("f", projection.tobytes()), array("f", matrix.tobytes())
+
+    def warm(self, api, module_names: Iterable[str]) -> None:
+        """Build (or map) the vectors of ``module_names`` in a background thread"""
+        if not self.prebuild:
+            return
+        module_names = list(module_names)
+
+        def run() -> None:
+            for module_name in module_names:
+                try:
+                    # A thread outside any tool call: the index walk takes the session's API lock
+                    self._vectors_of(module_name, self._index_store.prepare(api, module_name))
+                except Exception:
+                    logger.exception("vectors: building %s failed", module_name)
+
+        threading.Thread(target=run, name="kerag-mcp-vectors", daemon=True).start()
+
+    def on_module_reload(self, session_id: Any, module_names: Set[str], api) -> None:
+        """ModuleReloader / LoadJobManager listener: rebuild the vectors of changed modules"""
+        self.warm(api, module_names)
+
+    # --- search ---
+
+    def search(
+        self,
+        api,
+        module_names: Iterable[str],
+        query: str,
+        search_under: Optional[str] = None,
+        max_results: int = 50
+    ) -> Dict[str, Any]:
+        """Nodes most similar to ``query``, as a KERAGAPI-style search response"""
+        counts = self.features(query)
+        if not counts:
+            return {"success": False, "error": "Query has no words to compare"}
+
+        modules = sorted(module_names)
+        accept = None
+        if search_under:
+            under = search_under if "::" in search_under else f"{search_under}::{search_under}"
+            modules = [name for name in modules if name == module_of(under)]
+            index = self._index_store.get(api, modules[0]) if modules else None
+            if index is None or index.record(under) is None:
+                return {"success": False, "error": f"Node not found: {search_under}"}
+            accept = lambda node_id: index.is_under(node_id, under)
+
+        metadata: Dict[str, Any] = {"query": query, "mode": "semantic"}
+        best: List[Tuple[float, str, str]] = []
+        total = 0
+        for n, module_name in enumerate(modules):
+            if expired():
+                metadata["truncated"] = truncate(f"searched {n} of {len(modules)} modules")
+                break
+            top, matched = self.get(api, module_name).top(counts, max_results, accept)
+            total += matched
+            best.extend((score, module_name, node_id) for score, node_id in top)
+
+        results = []
+        for score, module_name, node_id in heapq.nlargest(max_results, best):
+            index = self._index_store.peek(module_name)
+            record = index.record(node_id) if index is not None else None
+            if record is None:
+                continue
+            results.append({
+                "node_id": node_id,
+                "id": node_id,
+                "type": record.type,
+                "title": record.title,
+                "label": record.label,
+                "score": round(score, 4),
+                "excerpt": record.content[:_EXCERPT_CHARS],
+            })
+        with self._lock:
+            self.searches += 1
+        metadata["total"] = total
+        return {"success": True, "data": results, "metadata": metadata}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            modules = [
+                {"module": module_name, "nodes": len(vectors.node_ids), "features": len(vectors.dims),
+                 "weights": len(vectors.indices), "lsa": vectors.lsa, "bytes": vectors.nbytes}
+                for module_name, (_, vectors) in sorted(self._vectors.items())
+            ]
+            return {
+                "prebuild": self.prebuild,
+                "backend": "numpy" if np is not None else "python",
+                "dim": self.dim,
+                "lsa": self.lsa_dims,
+                "directory": self.directory,
+                "built": self.built,
+                "mapped": self.mapped,
+                "build_ms": self.build_ms,
+                "searches": self.searches,
+                "modules": modules,
+            }
+
+
+# Global vector store instance
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Get the global vector store (configured from the environment on first use)"""
+    global _vector_store
+
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                vector_store = VectorStore(get_index_store())
+                vector_store.configure_from_env()
+                _vector_store = vector_store
+
+    return _vector_store
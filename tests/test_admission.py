@@ -0,0 +1,108 @@
+"""Token buckets and fair queueing of tool calls (kerag_mcp.admission)"""
+
+import asyncio
+
+import pytest
+
+from kerag_mcp.admission import AdmissionController, Overloaded
+
+
+def test_rate_limit_rejects_once_the_bucket_is_empty():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=8, rate=0.001, burst=8)
+        tickets = [await admission.admit("a", "knowledge_search") for _ in range(2)]
+        with pytest.raises(Overloaded, match="Rate limit"):
+            await admission.admit("a", "knowledge_search")
+        # Other clients have their own bucket
+        tickets.append(await admission.admit("b", "knowledge_search"))
+        for ticket in tickets:
+            admission.release(ticket)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 3 and stats["rate_limited"] == 1
+    assert stats["in_flight"] == 0 and stats["clients"] == 2
+
+
+def test_free_tools_bypass_admission():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, rate=0.001, burst=2)
+        ticket = await admission.admit("a", "knowledge_view")
+        assert await admission.admit("a", "knowledge_metrics") is None
+        admission.release(None)
+        admission.release(ticket)
+        return admission.stats()
+
+    assert asyncio.run(scenario())["admitted"] == 1
+
+
+def test_queue_serves_the_client_behind_its_share_first():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, rate=1000, burst=1000)
+        order = []
+
+        async def call(client, name):
+            ticket = await admission.admit(client, "knowledge_search")
+            order.append(name)
+            await asyncio.sleep(0)
+            admission.release(ticket)
+
+        first = await admission.admit("greedy", "knowledge_search")
+        queued = [asyncio.create_task(call("greedy", f"greedy-{i}")) for i in (2, 3)]
+        await asyncio.sleep(0)
+        queued.append(asyncio.create_task(call("polite", "polite-1")))
+        await asyncio.sleep(0)
+        assert admission.stats()["queue"] == 3
+        admission.release(first)
+        await asyncio.gather(*queued)
+        return order, admission.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["polite-1", "greedy-2", "greedy-3"]
+    assert stats["queued"] == 3 and stats["in_flight"] == 0
+
+
+def test_full_queue_sheds_the_call_furthest_ahead():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, rate=1000, burst=1000, max_queue=1)
+        running = await admission.admit("greedy", "knowledge_search")
+        waiting = asyncio.create_task(admission.admit("greedy", "knowledge_search"))
+        await asyncio.sleep(0)
+        # The polite client's tag is lower, so the greedy client's waiting call is shed
+        polite = asyncio.create_task(admission.admit("polite", "knowledge_search"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="shed"):
+            await waiting
+        # A newcomer with a higher tag than every waiting call is rejected itself
+        with pytest.raises(Overloaded, match="shed"):
+            await admission.admit("greedy", "knowledge_search")
+        admission.release(running)
+        admission.release(await polite)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["shed"] == 2 and stats["queue"] == 0 and stats["in_flight"] == 0
+
+
+def test_wait_for_a_slot_is_bounded():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, rate=1000, burst=1000, max_wait_ms=20)
+        running = await admission.admit("a", "knowledge_search")
+        with pytest.raises(Overloaded, match="waited 20 ms"):
+            await admission.admit("b", "knowledge_search")
+        admission.release(running)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["shed"] == 1 and stats["queue"] == 0
+
+
+def test_configure_from_env(monkeypatch):
+    monkeypatch.setenv("KERAG_MCP_MAX_CONCURRENT", "2")
+    monkeypatch.setenv("KERAG_MCP_CLIENT_BURST", "10")
+    admission = AdmissionController()
+    admission.configure_from_env(default_enabled=True)
+    assert admission.enabled and admission.max_concurrent == 2 and admission.burst == 10
+    monkeypatch.setenv("KERAG_MCP_ADMISSION", "0")
+    admission.configure_from_env(default_enabled=True)
+    assert not admission.enabled
@@ -0,0 +1,80 @@
+"""Serialized access to a session's KERAGAPI instance (kerag_mcp.apilock)"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from kerag_mcp.apilock import ApiLock, SessionBusy, defer_release
+
+
+def test_hold_times_out_while_a_thread_holds_the_lock():
+    lock = ApiLock()
+    lock.acquire("load job")
+
+    async def scenario():
+        async with lock.hold("knowledge_view", timeout=0.02):
+            pass
+
+    with pytest.raises(SessionBusy, match="load job"):
+        asyncio.run(scenario())
+    lock.release()
+    assert not lock.locked() and lock.waiting == 0
+
+
+def test_hold_is_reentrant_within_a_call():
+    lock = ApiLock()
+
+    async def scenario():
+        async with lock.hold("outer"):
+            async with lock.hold("inner", timeout=0):
+                return lock.holder
+
+    assert asyncio.run(scenario()) == "outer"
+    assert not lock.locked()
+
+
+def test_deferred_release_waits_for_the_abandoned_call():
+    lock = ApiLock()
+    abandoned = Future()
+
+    async def scenario():
+        async with lock.hold("knowledge_search"):
+            assert defer_release(abandoned)
+
+    asyncio.run(scenario())
+    assert lock.locked()
+    abandoned.set_result(None)
+    assert not lock.locked()
+
+
+def test_calls_never_overlap():
+    lock = ApiLock()
+    active = []
+    overlaps = []
+
+    def call():
+        active.append(1)
+        if len(active) > 1:
+            overlaps.append(1)
+        threading.Event().wait(0.002)
+        active.pop()
+
+    def background():
+        for _ in range(20):
+            with lock.held("reload"):
+                call()
+
+    async def scenario():
+        thread = threading.Thread(target=background)
+        thread.start()
+        for _ in range(20):
+            await lock.run("prefetch", call)
+            async with lock.hold("tool"):
+                call()
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(scenario())
+    assert not overlaps
+    assert not lock.locked()
@@ -0,0 +1,95 @@
+"""Offset tables of module archives (kerag_mcp.archive)"""
+
+import io
+import os
+import tarfile
+
+import pytest
+
+from kerag_mcp import archive as archive_module
+from kerag_mcp.archive import ArchiveStore, ModuleArchive
+
+
+def _write_tar(path, files, tar_format=tarfile.GNU_FORMAT):
+    with tarfile.open(path, "w", format=tar_format) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def headers_only(monkeypatch):
+    """Fail if an archive is read with tarfile instead of the header walk"""
+    def fail(path):
+        raise AssertionError(f"{path} fell back to tarfile")
+    monkeypatch.setattr(archive_module, "_scan_tarfile", fail)
+
+
+def test_gnu_long_names(tmp_path, headers_only):
+    long_name = "docs/" + "/".join(["a-rather-long-directory-name"] * 6) + "/node.md"
+    path = tmp_path / "docs.tar"
+    _write_tar(path, {long_name: b"long", "docs/short.md": b"short"})
+
+    archive = ModuleArchive(str(path))
+    member = long_name[len("docs/"):]
+    assert set(archive.members) == {member, "short.md"}
+    assert archive.read(member) == b"long"
+    assert archive.read("short.md") == b"short"
+    assert "a-rather-long-directory-name" in archive.directories
+    archive.close()
+
+
+def test_pax_headers(tmp_path, headers_only):
+    name = "manual/" + "é" * 120 + ".md"
+    path = tmp_path / "manual.tar"
+    _write_tar(path, {name: "contenu".encode(), "manual/index.md": b"index"}, tarfile.PAX_FORMAT)
+
+    archive = ModuleArchive(str(path))
+    assert archive.read(name[len("manual/"):]) == "contenu".encode()
+    assert archive.read("index.md") == b"index"
+    archive.close()
+
+
+def test_truncated_archive_is_rejected(tmp_path):
+    path = tmp_path / "cut.tar"
+    _write_tar(path, {"cut/big.md": b"x" * 5000, "cut/next.md": b"y"})
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        # Ends in the middle of the first member's data
+        f.write(data[:512 + 2048])
+
+    with pytest.raises(tarfile.ReadError, match="truncated"):
+        ModuleArchive(str(path))
+    entry = ArchiveStore().describe(str(path))
+    assert entry["needs_install"] and "unreadable" in entry["description"]
+
+
+def test_replaced_archive_stays_readable_while_referenced(tmp_path):
+    path = tmp_path / "guide.tar"
+    _write_tar(path, {"guide/page.md": b"first version"})
+    store = ArchiveStore()
+    old = store.open(str(path))
+
+    # Installers replace the file by renaming a new one over it
+    _write_tar(tmp_path / "guide.tar.new", {"guide/page.md": b"second, longer version"})
+    os.replace(tmp_path / "guide.tar.new", path)
+    new = store.open(str(path))
+    assert new is not old
+    assert store.open(str(path)) is new
+    assert new.read("page.md") == b"second, longer version"
+    assert old.read("page.md") == b"first version"
+    assert [item["members"] for item in store.stats()["archives"]] == [1]
+
+
+def test_archive_rewritten_in_place_fails_cleanly(tmp_path):
+    path = tmp_path / "guide.tar"
+    _write_tar(path, {"guide/page.md": b"x" * 4096})
+    archive = ModuleArchive(str(path))
+    with open(path, "wb") as f:
+        f.truncate(0)
+
+    with pytest.raises(tarfile.ReadError, match="changed"):
+        archive.read("page.md")
+    archive.close()
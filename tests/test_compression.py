@@ -0,0 +1,73 @@
+"""Block compression of node contents (kerag_mcp.compression)"""
+
+import random
+
+from kerag_mcp.compression import ContentCompression
+from kerag_mcp.handles import HandleTable
+from kerag_mcp.index import NodeRecord
+
+WORDS = [f"w{i}" for i in range(500)] + ["naïve", "日本語", "\U0001f600"]
+
+
+def _records(handles, count, changed=()):
+    records = []
+    for i in range(count):
+        rng = random.Random(i * 7 + (1000 if i in changed else 0))
+        content = " ".join(rng.choice(WORDS) for _ in range(60))
+        records.append(NodeRecord(f"m::n{i}", "m::root", "content", f"T{i}", f"L{i}", content, handles=handles))
+    return records
+
+
+def test_round_trip_across_blocks():
+    handles = HandleTable()
+    compression = ContentCompression("zlib", block_size=2048, cache_blocks=2)
+    records = _records(handles, 200)
+    expected = [record.content for record in records]
+    blocks = compression.pack("m", records)
+
+    stats = blocks.stats()
+    assert stats["blocks"] > 4
+    assert stats["compressed_bytes"] < stats["raw_bytes"]
+    # Contents are served from the blocks, in any order, through a cache smaller than the module
+    assert all(record._content is None for record in records)
+    for i in reversed(range(len(records))):
+        assert records[i].content == expected[i]
+    assert compression.cache.stats()["blocks"] <= 2
+
+
+def test_empty_content_and_disabled_codec():
+    handles = HandleTable()
+    records = [NodeRecord("m::empty", None, "content", "T", "L", "", handles=handles)]
+    assert ContentCompression(None).pack("m", records) is None
+    blocks = ContentCompression("zlib").pack("m", records)
+    assert blocks.stats()["blocks"] == 0
+    assert records[0].content == ""
+
+
+def test_unchanged_blocks_are_reused():
+    handles = HandleTable()
+    compression = ContentCompression("zlib", block_size=2048)
+    previous = compression.pack("m", _records(handles, 200))
+
+    records = _records(handles, 200, changed={150})
+    expected = [record.content for record in records]
+    blocks = compression.pack("m", records, previous)
+    previous.release()
+
+    stats = blocks.stats()
+    assert 0 < stats["reused_blocks"] < stats["blocks"]
+    assert [record.content for record in records] == expected
+    assert records[150]._blocks is blocks
+
+
+def test_block_of_a_removed_node_is_repacked():
+    handles = HandleTable()
+    compression = ContentCompression("zlib", block_size=2048)
+    previous = compression.pack("m", _records(handles, 50))
+
+    records = _records(handles, 50)
+    del records[0]
+    expected = [record.content for record in records]
+    blocks = compression.pack("m", records, previous)
+    assert blocks.stats()["reused_blocks"] == previous.stats()["blocks"] - 1
+    assert [record.content for record in records] == expected
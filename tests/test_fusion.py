@@ -0,0 +1,46 @@
+"""Reciprocal rank fusion of hybrid search results (kerag_mcp.fusion)"""
+
+from kerag_mcp.fusion import RRF_K, reciprocal_rank_fusion
+
+
+def _results(*node_ids, **fields):
+    return [dict(node_id=node_id, score=1.0 / rank, **fields) for rank, node_id in enumerate(node_ids, 1)]
+
+
+def test_nodes_found_by_both_retrievers_rank_first():
+    rankings = {
+        "lexical": _results("m::a", "m::b", "m::c", excerpt="lexical"),
+        "semantic": _results("m::d", "m::c", "m::a", excerpt="semantic"),
+    }
+    results, total = reciprocal_rank_fusion(rankings, max_results=10)
+    assert total == 4
+    assert [res["node_id"] for res in results] == ["m::a", "m::c", "m::d", "m::b"]
+    top = results[0]
+    assert top["ranks"] == {"lexical": 1, "semantic": 3}
+    assert top["fused_score"] == round(1 / (RRF_K + 1) + 1 / (RRF_K + 3), 6)
+    # The first retriever provides the record and scores are dropped
+    assert top["excerpt"] == "lexical" and "score" not in top
+    assert results[2]["excerpt"] == "semantic"
+
+
+def test_ties_keep_first_seen_order_and_cut_to_budget():
+    rankings = {"lexical": _results("m::a", "m::b"), "semantic": _results("m::c", "m::d")}
+    results, total = reciprocal_rank_fusion(rankings, max_results=3)
+    assert total == 4
+    assert [res["node_id"] for res in results] == ["m::a", "m::c", "m::b"]
+
+
+def test_single_retriever_and_missing_ids():
+    rankings = {"semantic": [{"id": "m::x"}, {"title": "no id"}, {"id": "m::y"}]}
+    results, total = reciprocal_rank_fusion(rankings, max_results=5, k=0)
+    assert total == 2
+    assert [res["ranks"] for res in results] == [{"semantic": 1}, {"semantic": 3}]
+    assert results[0]["fused_score"] == 1.0
+    assert reciprocal_rank_fusion({}, max_results=5) == ([], 0)
+
+
+def test_duplicates_within_one_ranking_count_once():
+    rankings = {"lexical": _results("m::a", "m::a", "m::b")}
+    results, _ = reciprocal_rank_fusion(rankings, max_results=5)
+    assert results[0]["ranks"] == {"lexical": 1}
+    assert results[0]["fused_score"] == round(1 / (RRF_K + 1), 6)
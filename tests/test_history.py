@@ -0,0 +1,68 @@
+"""Back/forward navigation history in a ring buffer (kerag_mcp.history)"""
+
+from kerag_mcp.handles import HandleTable
+from kerag_mcp.history import NavigationHistory
+
+
+def _history(capacity, visits):
+    history = NavigationHistory(HandleTable(), capacity)
+    for node_id in visits:
+        history.visit(node_id)
+    return history
+
+
+def test_full_ring_overwrites_the_oldest_entries():
+    history = _history(4, [f"m::n{i}" for i in range(7)])
+    assert len(history) == 4
+    assert history.dropped == 3
+    assert history.current() == "m::n6"
+    # Stepping back is clamped to the oldest entry still kept
+    position, node_id = history.step(-10)
+    assert node_id == "m::n3"
+    history.seek(position)
+    assert history.current() == "m::n3"
+    assert history.step(-1) is None
+    assert history.stats()["position"] == 0
+
+
+def test_step_does_not_move_until_seek():
+    history = _history(8, ["m::a", "m::b", "m::c"])
+    position, node_id = history.step(-2)
+    assert node_id == "m::a"
+    assert history.current() == "m::c"
+    history.seek(position)
+    assert history.current() == "m::a"
+    assert history.step(1)[1] == "m::b"
+    assert history.step(5)[1] == "m::c"
+    # Positions outside the live entries are ignored
+    history.seek(position + 10)
+    assert history.current() == "m::a"
+
+
+def test_visit_drops_forward_entries():
+    history = _history(8, ["m::a", "m::b", "m::c"])
+    history.seek(history.step(-2)[0])
+    history.visit("m::d")
+    assert len(history) == 2
+    assert history.current() == "m::d"
+    assert history.step(1) is None
+    assert history.step(-1)[1] == "m::a"
+    # Visiting the current node again is not a new entry
+    history.visit("m::d")
+    assert len(history) == 2
+
+
+def test_wraparound_after_going_back():
+    history = _history(3, ["m::a", "m::b", "m::c", "m::d"])
+    history.seek(history.step(-1)[0])
+    for node_id in ("m::e", "m::f", "m::g"):
+        history.visit(node_id)
+    assert len(history) == 3
+    assert [history.step(-i)[1] for i in (2, 1)] == ["m::e", "m::f"]
+    assert history.current() == "m::g"
+
+
+def test_empty_history():
+    history = NavigationHistory(HandleTable(), 4)
+    assert history.current() is None
+    assert history.step(-1) is None and history.step(1) is None
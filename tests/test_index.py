@@ -0,0 +1,92 @@
+"""Incremental maintenance of module indexes (kerag_mcp.index)"""
+
+import random
+
+from kerag_mcp.compression import ContentCompression
+from kerag_mcp.handles import HandleTable
+from kerag_mcp.index import ModuleIndex, NodeRecord
+
+WORDS = [f"w{i}" for i in range(300)]
+
+
+def _records(handles, count, changed=(), removed=(), parents=None):
+    """Nodes m::n0..n{count}; n0 is the root and every other node hangs under ``parents[i]`` (default n0)"""
+    parents = parents or {}
+    children = {}
+    for i in range(1, count):
+        if i not in removed:
+            children.setdefault(parents.get(i, 0), []).append(f"m::n{i}")
+    records = []
+    for i in range(count):
+        if i in removed:
+            continue
+        rng = random.Random(i * 7 + (1000 if i in changed else 0))
+        content = " ".join(rng.choice(WORDS) for _ in range(30))
+        parent = f"m::n{parents.get(i, 0)}" if i else None
+        see_also = (f"m::n{(i + 1) % count}",) if i % 10 == 0 else ()
+        records.append(NodeRecord(f"m::n{i}", parent, "content", f"T{i}", f"L{i}", content, see_also=see_also,
+                                  children=tuple(children.get(i, ())), handles=handles))
+    return records
+
+
+def _index(handles, records, codec=None):
+    index = ModuleIndex("m", handles=handles, compression=ContentCompression(codec, block_size=1024))
+    index.apply(records)
+    return index
+
+
+def _assert_same(index, fresh):
+    assert {gram: sorted(handles) for gram, handles in index.ngrams.items()} == \
+        {gram: sorted(handles) for gram, handles in fresh.ngrams.items()}
+    assert index.postings == fresh.postings
+    assert index.doc_lengths == fresh.doc_lengths
+    assert index.ancestors == fresh.ancestors
+    assert list(index.order) == list(fresh.order)
+    assert {handle: record.content for handle, record in index.nodes.items()} == \
+        {handle: record.content for handle, record in fresh.nodes.items()}
+
+
+def test_apply_reports_the_delta():
+    handles = HandleTable()
+    index = _index(handles, _records(handles, 100))
+    assert index.last_update["added"] == 100 and index.version == 1
+
+    delta = index.apply(_records(handles, 100, changed={5, 50}, removed={7, 8}, parents={60: 5}))
+    assert (delta["added"], delta["removed"], delta["changed"], delta["moved"]) == (0, 2, 2, 1)
+    assert delta["unchanged"] == 96
+    assert index.version == 2
+    assert index.record("m::n7") is None
+    assert index.is_under("m::n60", "m::n5") and not index.is_under("m::n60", "m::n6")
+
+
+def test_incremental_apply_matches_a_fresh_build():
+    handles = HandleTable()
+    index = _index(handles, _records(handles, 300), codec="zlib")
+    snapshot = dict(changed={3, 120, 299}, removed={10, 11, 200}, parents={150: 3, 151: 150})
+    index.apply(_records(handles, 300, **snapshot))
+    _assert_same(index, _index(handles, _records(handles, 300, **snapshot)))
+    assert index.content_blocks.stats()["reused_blocks"] > 0
+
+
+def test_removed_terms_leave_the_postings():
+    handles = HandleTable()
+    records = _records(handles, 3)
+    records.append(NodeRecord("m::unique", "m::n0", "content", "Zebra", "", "only here", handles=handles))
+    index = _index(handles, records)
+    assert "zebra" in index.postings and "zeb" in index.ngrams
+
+    index.apply(records[:-1])
+    assert "zebra" not in index.postings and "zeb" not in index.ngrams
+    _assert_same(index, _index(handles, records[:-1]))
+
+
+def test_links_and_backlinks_follow_the_snapshot():
+    handles = HandleTable()
+    index = _index(handles, _records(handles, 30))
+    source, target = handles.handle("m::n10"), handles.handle("m::n11")
+    assert list(index.links.neighbours(source)) == [target]
+    assert list(index.backlinks.neighbours(target)) == [source]
+
+    index.apply(_records(handles, 30, removed={10}))
+    assert len(index.links.neighbours(source)) == 0
+    assert len(index.backlinks.neighbours(target)) == 0
@@ -0,0 +1,65 @@
+"""HDR latency histograms and the Prometheus exposition (kerag_mcp.metrics)"""
+
+from kerag_mcp.metrics import LatencyHistogram, MetricsRegistry
+
+
+def test_small_values_are_exact():
+    hist = LatencyHistogram(precision_bits=5)
+    for value in range(32):
+        hist.record(value)
+    assert hist.percentile(0.5) == 15
+    assert hist.percentile(1.0) == 31
+    assert hist.min == 0 and hist.max == 31
+
+
+def test_large_values_stay_within_the_relative_error():
+    hist = LatencyHistogram(precision_bits=5)
+    for value in (1000, 123_456, 9_876_543):
+        single = LatencyHistogram(precision_bits=5)
+        single.record(value)
+        single.record(value * 4)
+        # The lower value's bucket bound is reported, never below the value itself
+        reported = single.percentile(0.5)
+        assert value <= reported <= value * (1 + 2 ** -5)
+        hist.record(value)
+    assert hist.percentile(1.0) == 9_876_543
+    assert hist.count == 3 and hist.total == 1000 + 123_456 + 9_876_543
+
+
+def test_buckets_are_monotonic():
+    hist = LatencyHistogram(precision_bits=3)
+    indexes = [hist._index(value) for value in range(5000)]
+    assert indexes == sorted(indexes)
+    for value in range(5000):
+        assert hist._upper_bound(hist._index(value)) >= value
+
+
+def test_negative_values_are_clamped():
+    hist = LatencyHistogram()
+    hist.record(-5)
+    assert hist.min == 0 and hist.percentile(0.99) == 0
+    assert LatencyHistogram().percentile(0.5) == 0
+
+
+def test_render_prometheus():
+    registry = MetricsRegistry()
+    registry.record("knowledge_search", 0.002, 512, error=False)
+    registry.record("knowledge_search", 0.004, 1024, error=True)
+    registry.record("knowledge_view", 0.001, 100, error=False)
+    registry.add_collector(lambda: [("kerag_mcp_test_gauge", "gauge", "A test gauge.", 7)])
+
+    text = registry.render_prometheus()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    assert 'kerag_mcp_tool_calls_total{tool="knowledge_search"} 2' in lines
+    assert 'kerag_mcp_tool_errors_total{tool="knowledge_search"} 1' in lines
+    assert 'kerag_mcp_tool_errors_total{tool="knowledge_view"} 0' in lines
+    assert 'kerag_mcp_tool_latency_seconds_count{tool="knowledge_search"} 2' in lines
+    assert 'kerag_mcp_tool_latency_seconds_sum{tool="knowledge_search"} 0.006000' in lines
+    assert 'kerag_mcp_tool_response_bytes_sum{tool="knowledge_search"} 1536' in lines
+    assert "# TYPE kerag_mcp_tool_latency_seconds summary" in lines
+    assert lines[-3:] == ["# HELP kerag_mcp_test_gauge A test gauge.", "# TYPE kerag_mcp_test_gauge gauge",
+                          "kerag_mcp_test_gauge 7"]
+    # Every sample follows the HELP and TYPE lines of its family
+    families = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    assert len(families) == len(set(families))
@@ -0,0 +1,82 @@
+"""Single-flight coalescing of identical concurrent tool calls (kerag_mcp.singleflight)"""
+
+import asyncio
+
+from kerag_mcp.singleflight import SingleFlight
+
+
+def _tool(calls, gate):
+    async def knowledge_search(query: str, max_results: int = 10) -> str:
+        calls.append(query)
+        await gate.wait()
+        return f"results for {query}"
+    return knowledge_search
+
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        calls = []
+        gate = asyncio.Event()
+        fn = _tool(calls, gate)
+        flight = SingleFlight(tools=[fn.__name__])
+        tasks = [asyncio.create_task(flight.run(fn, ("q",), {})) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        gate.set()
+        return calls, await asyncio.gather(*tasks), flight.stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert calls == ["q"]
+    assert results == ["results for q"] * 4
+    assert stats[0]["executed"] == 1 and stats[0]["coalesced"] == 3
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        calls = []
+        gate = asyncio.Event()
+        fn = _tool(calls, gate)
+        flight = SingleFlight(tools=[fn.__name__])
+        leader = asyncio.create_task(flight.run(fn, ("q",), {}))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run(fn, ("q",), {"max_results": 10}))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        result = await follower
+        try:
+            await leader
+        except asyncio.CancelledError:
+            leader_cancelled = True
+        else:
+            leader_cancelled = False
+        return calls, result, leader_cancelled
+
+    calls, result, leader_cancelled = asyncio.run(scenario())
+    assert leader_cancelled
+    assert result == "results for q"
+    assert calls == ["q"]
+
+
+def test_work_is_cancelled_when_every_caller_gives_up():
+    async def scenario():
+        calls = []
+        gate = asyncio.Event()
+        fn = _tool(calls, gate)
+        flight = SingleFlight(tools=[fn.__name__])
+        callers = [asyncio.create_task(flight.run(fn, ("q",), {})) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        shared = next(iter(flight._flights.values())).task
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A later identical call starts a fresh execution
+        gate.set()
+        result = await flight.run(fn, ("q",), {})
+        return calls, shared.cancelled(), result
+
+    calls, shared_cancelled, result = asyncio.run(scenario())
+    assert shared_cancelled
+    assert result == "results for q"
+    assert calls == ["q", "q"]